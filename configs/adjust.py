@@ -11,11 +11,13 @@ SOURCES = {
         "api_key": os.environ.get('ADJUST_API_KEY'),
         "json_path_nested": ["result_set.networks", "campaigns", "adgroups", "creatives"],
         "fields": ["name", "token"],
+        "stream": True,  # the response grows every day, parse it as a stream
         "cache_file": True,
         "date_format": "%Y-%m-%d",
         "file_format": "json",
         "load": True,
         "write_latest": True,
+        "latest_diff": True,  # also write new or changed trackers since yesterday
     },
 }
 
@@ -40,5 +42,8 @@ DESTINATIONS = {
         "prefix": "./data/",
         "file_format": "jsonl",
         "date_field": "execution_date",
-    }
+        "cache_max_age": 60,  # days, evict cached files not used since then
+        "compression": "gzip",  # raw cache files, gzip/zstd
+        "file_compression": "gzip",  # transformed files loaded to BigQuery
+    },
 }
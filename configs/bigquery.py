@@ -1,4 +1,6 @@
 
+from configs import adjust, revenue, rps
+
 BQ_PROJECT = {
     "project": "taipei-bi",
     "dataset": "mango_prod",
@@ -19,6 +21,7 @@ MANGO_CORE = {
     "udf": ["map_channels", "map_markets", "map_verticals", "match_target_countries", "match_verticals", "order_channels", "order_channel_levels", "order_markets", "order_target_countries", "order_verticals"],
     "query": "mango_core",
     "init_query": "init_mango_core",
+    "sample_field": "sample_id",
     "cleanup_query": "cleanup_mango_core",
 }
 
@@ -45,6 +48,8 @@ MANGO_EVENTS = {
     },
     "query": "mango_events",
     "init_query": "init_mango_events",
+    "sample_field": "sample_id",
+    "cluster_fields": ["client_id", "os"],
     "cleanup_query": "cleanup_mango_events",
 }
 
@@ -75,9 +80,20 @@ MANGO_CHANNEL_MAPPING = {
     "append": False,
     "latest_only": True,
     "filetype": "jsonl",
+    "schema": adjust.SCHEMA,
+    # merge new or changed trackers instead of reloading all of them
+    "merge_keys": [
+        "network_token",
+        "campaign_token",
+        "adgroup_token",
+        "creative_token",
+    ],
     "params": {
         **BQ_PROJECT,
         "src": "moz-taipei-bi/mango/staging-adjust-adjust_trackers/latest.jsonl",
+        "diff_src": (
+            "moz-taipei-bi/mango/staging-adjust-adjust_trackers/latest_diff.jsonl"
+        ),
         "dest": "mango_channel_mapping",
     },
 }
@@ -136,6 +152,7 @@ MANGO_USER_RFE = {
         "dest": "mango_user_rfe_28d",
     },
     "query": "mango_user_rfe_28d",
+    "cluster_fields": ["os", "country", "feature_type", "feature_name"],
     "cleanup_query": "cleanup_mango_user_rfe_28d",
 }
 
@@ -284,6 +301,7 @@ GOOGLE_RPS = {
     "type": "gcs",
     "append": False,
     "filetype": "csv",
+    "schema": rps.SCHEMA,
     "params": {
         **BQ_PROJECT,
         "src": "moz-taipei-bi/mango/staging-rps-google_search_rps/2018-01-01.csv",
@@ -311,6 +329,7 @@ MANGO_REVENUE_BUKALAPAK = {
     "type": "gcs",
     "append": True,
     "filetype": "jsonl",
+    "schema": revenue.SCHEMA,
     "backfill_days": [1, 2, 3, 4, 5, 6, 7],
     # "skip_not_found": True,
     "params": {
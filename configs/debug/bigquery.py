@@ -29,6 +29,7 @@ def set_debug_config():
 set_debug_config()
 
 globals()["MANGO_CHANNEL_MAPPING"]["params"]["src"] = "moz-taipei-bi-datasets/mango/staging-adjust-adjust_trackers/latest.jsonl"
+globals()["MANGO_CHANNEL_MAPPING"]["params"]["diff_src"] = "moz-taipei-bi-datasets/mango/staging-adjust-adjust_trackers/latest_diff.jsonl"
 globals()["GOOGLE_RPS"]["params"]["src"] = "moz-taipei-bi-datasets/mango/staging-rps-google_search_rps/2018-01-01.csv"
 globals()["MANGO_REVENUE_BUKALAPAK"]["params"]["src"] = "moz-taipei-bi-datasets/mango/staging-revenue-bukalapak/{start_date}.jsonl"
 globals()["MANGO_USER_CHANNELS"]["create_view_alt"] = True
@@ -12,3 +12,6 @@ DESTINATIONS["gcs"]["bucket"] = "moz-taipei-bi-datasets"
 DESTINATIONS["gcs"]["prefix"] = "mango/"
 
 DESTINATIONS["fs"]["prefix"] = "./debug-data/"
+
+DESTINATIONS["bq"]["project"] = "rocket-dev01"
+DESTINATIONS["bq"]["dataset"] = "mango_dev3"
@@ -13,6 +13,8 @@ SOURCES = {
         "request_interval": 1,
         "cache_file": True,
         "force_load_cache": False,
+        "daily_cache": True,  # request only missing or still mutable days
+        "mutable_days": 3,  # days conversions could still be updated
         "date_format": "%Y-%m-%d",
         "file_format": "json",
         "json_path": "response.data.data",
@@ -20,6 +22,22 @@ SOURCES = {
         "page_size": 100,
         "country_code": "ID",   # for detecting timezone,
         "date_fields": ["Stat.date", "Stat.datetime", "Stat.session_datetime"],
+        "date_field_formats": {
+            "Stat.date": "%Y-%m-%d",
+            "Stat.datetime": "%Y-%m-%d %H:%M:%S",
+            "Stat.session_datetime": "%Y-%m-%d %H:%M:%S",
+        },
+        "cleanup_query": "cleanup_revenue_bukalapak",  # for loading to BigQuery
+        "constraints": {  # validated after transform, see utils.schema
+            "source": {"nullable": False},
+            "country": {"nullable": False},
+            "os": {"nullable": False},
+            "utc_datetime": {"nullable": False},
+            "tz": {"nullable": False},
+            "currency": {"nullable": False},
+            "sales_amount": {"nullable": False},
+            "payout": {"nullable": False},
+        },
     },
     # "flipkart": {
     #     "type": "api",
@@ -64,5 +82,16 @@ DESTINATIONS = {
         "prefix": "./data/",
         "file_format": "jsonl",
         "date_field": "utc_datetime",
-    }
+        "cache_max_age": 60,  # days, evict cached files not used since then
+        "compression": "gzip",  # raw cache files, gzip/zstd
+        "file_compression": "gzip",  # transformed files loaded to BigQuery
+    },
+    "bq": {
+        "project": "taipei-bi",
+        "dataset": "mango_prod",
+        "location": "US",
+        "table": "mango_revenue",
+        "partition_field": "utc_date",
+        "append": True,
+    },
 }
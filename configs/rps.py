@@ -22,6 +22,7 @@ SOURCES = {
         "url": "https://crossborderinsightsfinder.com/wp-json/fb/v1/countries?vertical_id={iterator}&ad_objective_id=3&date_range={start_date}%2C{end_date}",
         "api_key": "",
         "iterator": range(1, 18),
+        "stack_iterators": True,  # extract iterators into one DataFrame
         "cache_file": True,
         "date_format": "%Y-%m-%d",
         "file_format": "json",
@@ -12,3 +12,5 @@ DESTINATIONS["gcs"]["bucket"] = "moz-taipei-bi"
 DESTINATIONS["gcs"]["prefix"] = "mango/"
 
 DESTINATIONS["fs"]["prefix"] = "./staging-data/"
+
+DESTINATIONS["bq"]["dataset"] = "mango_staging"
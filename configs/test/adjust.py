@@ -9,6 +9,7 @@ SOURCES = {
         "api_key": "xyz",
         "json_path_nested": ["result_set.networks", "campaigns", "adgroups", "creatives"],
         "fields": ["name", "token"],
+        "stream": True,
         "cache_file": False,
         "date_format": "%Y-%m-%d",
         "file_format": "json",
@@ -1,5 +1,7 @@
 from google.cloud import bigquery
 
+from configs.test import adjust
+
 BQ_PROJECT = {"dataset": "test", "location": "US", "project": "rocket-dev01"}
 
 
@@ -14,6 +16,7 @@ MANGO_EVENTS = {
     },
     "query": "mango_events",
     "cleanup_query": "cleanup_mango_events",
+    "sample_field": "sample_id",
 }
 
 MANGO_EVENTS_UNNESTED = {
@@ -38,6 +41,7 @@ MANGO_CHANNEL_MAPPING = {
     "type": "gcs",
     "append": False,
     "filetype": "jsonl",
+    "schema": adjust.SCHEMA,
     "days_behind": 0,
     "params": {
         **BQ_PROJECT,
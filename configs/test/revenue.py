@@ -53,6 +53,7 @@ SCHEMA = [
     ("fx_defined4", np.dtype(object).type),
     ("fx_defined5", np.dtype(object).type),
     ("conversion_status", np.dtype(object).type),
+    ("utc_date", np.datetime64),
 ]
 DESTINATIONS = {
     "gcs": {"bucket": "moz-fx-data", "prefix": "taipei/"},
@@ -61,4 +62,12 @@ DESTINATIONS = {
         "file_format": "jsonl",
         "date_field": "utc_datetime",
     },
+    "bq": {
+        "project": "rocket-dev01",
+        "dataset": "test",
+        "location": "US",
+        "table": "revenue",
+        "partition_field": "utc_date",
+        "append": False,
+    },
 }
@@ -21,6 +21,7 @@ SOURCES = {
         "url": "https://api.test.com/resource.json?api_key={api_key}&date_range={start_date}%2C{end_date}",
         "api_key": "",
         "iterator": range(1, 18),
+        "stack_iterators": True,
         "cache_file": True,
         "date_format": "%Y-%m-%d",
         "file_format": "json",
@@ -6,8 +6,55 @@ run all tasks in the correct sequence.
 """
 import utils.config
 from tasks import rps, revenue, bigquery, adjust
+from utils.cache import get_cache_manager, get_needed_dates
 import logging as log
 
+CACHED_TASKS = ["rps", "revenue", "adjust"]
+
+
+def cache(args):
+    """Show stats of or prune the file system cache of ETL tasks.
+
+    e.g. `./etl.py cache stats --task revenue` or
+    `./etl.py cache prune --max_cache_size 500 --max_cache_age 60`
+
+    :param args: args passed from command line, see `get_arg_parser()`
+    """
+    assert len(args.command) == 2 and args.command[0] == "cache", (
+        "Invalid command %s" % " ".join(args.command)
+    )
+    assert args.command[1] in ["stats", "prune"], (
+        "Invalid cache command %s" % args.command[1]
+    )
+    config_name = ""
+    if args.debug:
+        config_name = "debug"
+    if args.config:
+        config_name = args.config
+    for task in [args.task] if args.task else CACHED_TASKS:
+        configs = utils.config.get_configs(task, config_name)
+        if configs is None or "fs" not in getattr(configs, "DESTINATIONS", {}):
+            continue
+        manager = get_cache_manager(configs.DESTINATIONS["fs"], args)
+        if args.command[1] == "stats":
+            for folder, stats in manager.get_stats(task).items():
+                print(
+                    "%s%s\t%d files\t%.1f MB"
+                    % (
+                        manager.root,
+                        folder,
+                        stats["files"],
+                        stats["size"] / 1024 / 1024,
+                    )
+                )
+        else:
+            evicted = manager.prune(
+                task, keep_dates=get_needed_dates(args.date, args.period)
+            )
+            for f in evicted:
+                log.info("Evicted cached file: %s" % f)
+            print("%d cached files of %s evicted." % (len(evicted), task))
+
 
 def main():
     """Determine which task to run based on args.task."""
@@ -18,6 +65,9 @@ def main():
     if args.debug:
         if args.loglevel is None:
             log.basicConfig(level=log.DEBUG)
+    if args.command:
+        cache(args)
+        return
     task = None
     if args.task:
         if args.task == "bigquery":
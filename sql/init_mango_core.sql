@@ -32,3 +32,4 @@ SELECT
 FROM `{src}` WHERE app_name='Zerda'
   AND submission_date >= DATE '2018-11-01'
   AND submission_date <= DATE '{start_date}'
+  {sample_filter}
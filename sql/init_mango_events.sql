@@ -33,3 +33,4 @@ WHERE
   normalized_app_name='Zerda' AND
   DATE(submission_timestamp) >= DATE '2018-11-01' AND
   DATE(submission_timestamp) <= DATE '{start_date}'
+  {sample_filter}
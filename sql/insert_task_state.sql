@@ -0,0 +1,2 @@
+INSERT `{project}.{dataset}.{table}` (dest, run_date, fingerprint, updated_at)
+VALUES (@dest, @run_date, @fingerprint, CURRENT_TIMESTAMP())
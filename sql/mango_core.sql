@@ -31,3 +31,4 @@ SELECT
     bug_1501329_affected
 FROM `{src}` WHERE app_name='Zerda'
   AND submission_date = DATE '{start_date}'
+  {sample_filter}
@@ -32,3 +32,4 @@ FROM
 WHERE
   normalized_app_name='Zerda' AND
   DATE(submission_timestamp) = DATE '{start_date}'
+  {sample_filter}
@@ -38,6 +38,6 @@ SELECT
 FROM
   vol
 LEFT JOIN
-  `{project}.{dataset}.{src2}` AS rps
+  `{project}.{src_dataset}.{src2}` AS rps
 ON
   vol.country=rps.country
@@ -0,0 +1,7 @@
+MERGE `{project}.{dataset}.{dest}` T
+USING `{project}.{dataset}.{diff}` S
+ON {merge_condition}
+WHEN MATCHED THEN
+  UPDATE SET {update_columns}
+WHEN NOT MATCHED THEN
+  INSERT ({columns}) VALUES ({insert_values})
@@ -0,0 +1,10 @@
+SELECT
+  table_name,
+  COUNT(*) AS partitions,
+  SUM(total_rows) AS total_rows,
+  MAX(last_modified_time) AS last_modified_time
+FROM `{project}.{dataset}.INFORMATION_SCHEMA.PARTITIONS`
+WHERE table_name IN UNNEST(@tables)
+  AND (partition_id IS NULL
+    OR partition_id BETWEEN @start_partition AND @end_partition)
+GROUP BY table_name
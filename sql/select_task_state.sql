@@ -0,0 +1,4 @@
+SELECT fingerprint FROM `{project}.{dataset}.{table}`
+WHERE dest = @dest AND run_date = @run_date
+ORDER BY updated_at DESC
+LIMIT 1
@@ -2,32 +2,77 @@
 import errno
 import glob
 import inspect
+import json
 import time
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 import os
 import os.path
 from shutil import copyfile
 
 import requests
 import datetime
+import pandas as pd
 from pandas import DataFrame
 import pandas_gbq as pdbq
-from google.cloud import storage
+from google.cloud import bigquery, storage
+from google.cloud.exceptions import NotFound
 import numpy as np
-from typing import List, Tuple, Union, Dict, Any
-from pandas_schema import Column, Schema
-from pandas_schema.validation import IsDtypeValidation
-from utils.cache import check_extract_cache
-from utils.config import DEFAULT_DATE_FORMAT, DEFAULT_DATETIME_FORMAT
+from typing import Callable, Iterable, List, Optional, Tuple, Union, Dict, Any
+from utils.cache import (
+    CONVERTED_EXT,
+    CONVERTED_STAGE,
+    DAILY_CACHE_SUFFIX,
+    MANIFEST_EXT,
+    SPILL_STAGE,
+    CacheBackend,
+    FileIndex,
+    check_extract_cache,
+    get_cache_backend,
+    get_cache_manager,
+    get_converted_fingerprint,
+    get_file_index,
+    get_needed_dates,
+    mark_used,
+    get_request_fingerprint,
+    render_request,
+)
+from utils.config import (
+    DEFAULT_DATE_FORMAT,
+    DEFAULT_DATETIME_FORMAT,
+    DEFAULT_PATH_FORMAT,
+)
 from utils.file import (
+    RawFile,
+    compress,
+    decode_string,
     get_path_format,
+    get_file_compression,
     get_file_ext,
     get_path_prefix,
     read_string,
+    write_stream,
     write_string,
 )
-from utils.marshalling import lookback_dates, json_extract, convert_df, convert_format
+from utils.marshalling import (
+    lookback_dates,
+    json_extract,
+    convert_df,
+    convert_format,
+    SharedViews,
+    filter_date_window,
+    diff_rows,
+    stack_frames,
+    STREAM_CHUNK_SIZE,
+)
+from utils.memory import track_peak_memory
 from utils.query import build_query
+from utils.schema import (
+    SchemaValidator,
+    check_file_schema,
+    check_table_schema,
+    get_bq_schema,
+)
 import logging
 
 log = logging.getLogger(__name__)
@@ -59,27 +104,33 @@ class EtlTask:
         """
         # Clear cached files
         if args.rm:
+            index = get_file_index(destinations["fs"]["prefix"])
             for source in sources:
-                files = []
-                files += glob.glob(
-                    get_path_format(True).format(
-                        prefix=destinations["fs"]["prefix"],
-                        stage="raw",
-                        task=args.task,
-                        source=source,
-                    )
+                cache = get_cache_backend(
+                    sources[source], destinations["fs"]["prefix"]
                 )
-                files += glob.glob(
-                    get_path_format(True).format(
-                        prefix=destinations["fs"]["prefix"],
-                        stage=stage,
+                for folder_stage, folder_source in [
+                    ("raw", source),
+                    ("raw", source + DAILY_CACHE_SUFFIX),
+                    (stage, source),
+                    (CONVERTED_STAGE, source),
+                    (SPILL_STAGE, source),
+                ]:
+                    folder = DEFAULT_PATH_FORMAT.format(
+                        prefix="",
+                        stage=folder_stage,
                         task=args.task,
-                        source=source,
+                        source=folder_source,
                     )
-                )
-                for f in files:
-                    log.info("Removing cached file: %s" % f)
-                    os.remove(f)
+                    for f in index.list(folder):
+                        if os.path.isfile(f):
+                            log.info("Removing cached file: %s" % f)
+                            os.remove(f)
+                        index.remove(f)
+                    # cached keys of other cache backends
+                    for key in cache.keys(folder + "/*"):
+                        log.info("Removing cached key: %s" % key)
+                        cache.delete(key)
         self.task = task
         self.stage = stage
         self.args = args
@@ -87,16 +138,18 @@ class EtlTask:
         self.current_date = args.date
         self.last_month = lookback_dates(args.date, args.period)
         self.sources = sources
-        coltypes = []
-        for coltype in schema:
-            coltypes += [Column(coltype[0], [IsDtypeValidation(coltype[1])])]
-        self.schema = Schema(coltypes)
+        self.schema = SchemaValidator(schema)
         self.raw_schema = schema
         self.destinations = destinations
         self.raw = dict()
         self.extracted_base = dict()
         self.extracted = dict()
         self.transformed = dict()
+        self.caches = dict()
+        self.validators = dict()
+        self.peak_memory = dict()
+        self.spill_files = []
+        self.started_at = time.time()
         self.gcs = storage.Client()
 
     def get_filepaths(
@@ -126,17 +179,19 @@ class EtlTask:
                 prefix = config["prefix"]
             else:
                 prefix = self.destinations[dest]["prefix"]
-            return glob.glob(prefix + config["path"] + config["filename"])
+            pattern = prefix + config["path"] + config["filename"]
         else:
-            return glob.glob(
-                get_path_format().format(
-                    stage=stage,
-                    task=self.task,
-                    source=source,
-                    prefix=self.destinations[dest]["prefix"],
-                    filename=self.get_filename(source, config, stage, dest, "*", date),
-                )
+            pattern = get_path_format().format(
+                stage=stage,
+                task=self.task,
+                source=source,
+                prefix=self.destinations[dest]["prefix"],
+                filename=self.get_filename(source, config, stage, dest, "*", date),
             )
+        if dest == "fs":
+            fpaths = get_file_index(self.destinations["fs"]["prefix"]).find(pattern)
+            return [fpath for fpath in fpaths if os.path.isfile(fpath)]
+        return glob.glob(pattern)
 
     def get_filepath(
         self,
@@ -236,9 +291,16 @@ class EtlTask:
             )
 
     def get_latest_filepath(
-        self, source: str, config: Dict[str, Any], stage: str, dest: str
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str,
+        dest: str,
+        name: str = "latest",
     ) -> str:
-        filename = "latest.{ext}".format(ext=self.get_dest_ext(self.destinations))
+        filename = "{name}.{ext}".format(
+            name=name, ext=self.get_dest_ext(self.destinations)
+        )
         return get_path_format().format(
             stage=stage,
             task=self.task,
@@ -283,12 +345,315 @@ class EtlTask:
                     raise
         return filename
 
+    def get_cache(self, source: str, config: Dict[str, Any]) -> CacheBackend:
+        """Get the extract cache backend of a data source.
+
+        :rtype: CacheBackend
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :return: the cache backend, see `utils.cache.get_cache_backend()`
+        """
+        if source not in self.caches:
+            self.caches[source] = get_cache_backend(
+                config, self.destinations["fs"]["prefix"], self.get_compression()
+            )
+        return self.caches[source]
+
+    def upload_cached(self, blob: Any, cache: CacheBackend, key: str):
+        """Upload a cached raw data to GCS, from its file if file based.
+
+        :param blob: the GCS blob to upload to
+        :param cache: the cache backend of the data source
+        :param key: the cache key
+        """
+        if cache.get_path(key) is not None:
+            self.upload_file(blob, cache.get_path(key))
+        else:
+            blob.content_encoding = self.get_compression()
+            blob.upload_from_string(
+                compress(cache.get(key).encode("utf-8"), blob.content_encoding)
+            )
+
+    def get_compression(self, stage: str = "raw") -> Optional[str]:
+        """Get the compression of files written to file system and GCS.
+
+        Raw cache files are compressed by `compression` of fs destination config,
+        could be gzip/zstd, transformed files by `file_compression`,
+        which could only be gzip since they're loaded to BigQuery.
+        Compressed files are detected automatically when reading.
+
+        :param stage: the stage of the files, could be raw/staging/production
+        :return: gzip/zstd, None if not compressed
+        """
+        key = "compression" if stage == "raw" else "file_compression"
+        fs_config = self.destinations["fs"]
+        compression = None if key not in fs_config else fs_config[key]
+        assert stage == "raw" or compression in (None, "gzip"), (
+            "BigQuery only loads gzip compressed files, got %s" % compression
+        )
+        return compression
+
+    @staticmethod
+    def upload_file(blob: Any, fpath: str):
+        """Upload a file to GCS, with `Content-Encoding` if it's compressed.
+
+        :param blob: the GCS blob to upload to
+        :param fpath: the file path to upload
+        """
+        blob.content_encoding = get_file_compression(fpath)
+        blob.upload_from_filename(fpath)
+
+    def get_cache_key(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str,
+        page: Union[int, str] = None,
+        date: datetime.datetime = None,
+    ) -> str:
+        """Get the cache key of a data file.
+
+        The key is the data file path relative to the file system prefix.
+
+        :rtype: str
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param stage: the stage of the data, could be raw/staging/production.
+        :param page: the page part of the data file name
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: the cache key
+        """
+        fpath = self.get_filepath(source, config, stage, "fs", page, date)
+        prefix = self.destinations["fs"]["prefix"]
+        assert fpath.startswith(prefix)
+        return fpath.replace(prefix, "", 1)
+
+    def get_spill_folder(self, source: str) -> str:
+        """Get the folder of spill files of a data source.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :return: the folder relative to the file system prefix
+        """
+        return DEFAULT_PATH_FORMAT.format(
+            prefix="", stage=SPILL_STAGE, task=self.task, source=source
+        )
+
+    def spill_raw(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        page: Union[int, str, None],
+        raw: Union[str, Iterable[bytes]],
+        date: datetime.datetime = None,
+    ) -> RawFile:
+        """Write a raw payload to a spill file so it's not kept in memory.
+
+        Spill files are named as raw cache files prefixed by the process id,
+        `load_to_fs()` moves them into the file system cache,
+        and the rest are removed after the run, see `clean_spill()`.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param page: the page part of the data file name
+        :param raw: the raw payload, or chunks of bytes of it streamed to the file
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: the spill file
+        """
+        prefix = self.destinations["fs"]["prefix"]
+        key = self.get_cache_key(source, config, "raw", page, date)
+        fpath = "%s%s/%d.%s" % (
+            prefix,
+            self.get_spill_folder(source),
+            os.getpid(),
+            os.path.basename(key),
+        )
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        if isinstance(raw, str):
+            write_string(fpath, raw, self.get_compression())
+        else:
+            write_stream(fpath, raw, self.get_compression())
+        get_file_index(prefix).add(fpath)
+        self.spill_files += [fpath]
+        return RawFile(fpath)
+
+    def clean_spill(self):
+        """Remove spill files left by this run."""
+        index = get_file_index(self.destinations["fs"]["prefix"])
+        for fpath in self.spill_files:
+            if os.path.isfile(fpath):
+                os.remove(fpath)
+            index.remove(fpath)
+        self.spill_files = []
+
+    def get_request_window(
+        self, config: Dict[str, Any], date: datetime.datetime = None
+    ) -> Tuple[Any, Any]:
+        """Get the start/end date of the data window to request from a source.
+
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        :return: tuple of start date and end date
+        """
+        if date is None or config["type"] == "bq":
+            return (
+                self.last_month.strftime(config["date_format"]),
+                self.current_date.strftime(config["date_format"]),
+            )
+        return lookback_dates(date, self.period), date
+
+    def get_cache_request(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        date: datetime.datetime = None,
+        window: bool = True,
+    ) -> str:
+        """Get the rendered request of a data source to fingerprint its cache.
+
+        API keys are not rendered. Paging and iterator placeholders are kept,
+        and so are the date placeholders if `window` is False.
+
+        :rtype: str
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        :param window: whether to render the date window
+        :return: the rendered url/query
+        """
+        start_date, end_date = "{start_date}", "{end_date}"
+        if window and config["type"] in ("api", "bq"):
+            fmt = (
+                DEFAULT_DATE_FORMAT
+                if "date_format" not in config
+                else config["date_format"]
+            )
+            start_date, end_date = [
+                d.strftime(fmt) if isinstance(d, datetime.datetime) else d
+                for d in self.get_request_window(config, date)
+            ]
+        if config["type"] == "api":
+            request = render_request(
+                config["url"], api_key="", start_date=start_date, end_date=end_date
+            )
+            if "iterator" in config:
+                iterators = [str(i) for i in config["iterator"]]
+                request += "\niterator=" + ",".join(iterators)
+            if "page_size" in config:
+                request += "\npage_size=%d" % config["page_size"]
+        elif config["type"] == "bq":
+            request = build_query(config, start_date, end_date)
+        elif config["type"] == "gcs":
+            request = "gs://%s/%s%s%s" % (
+                config["bucket"],
+                config["prefix"],
+                config["path"],
+                config["filename"],
+            )
+        else:
+            request = source
+        return request
+
+    def get_cache_manifest_key(
+        self, source: str, config: Dict[str, Any], date: datetime.datetime = None
+    ) -> str:
+        """Get the cache key of the sidecar manifest of raw data.
+
+        :rtype: str
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: the cache key, e.g. `raw-revenue-bukalapak/2019-09-08.manifest`
+        """
+        key = self.get_cache_key(source, config, "raw", "*", date)
+        return get_path_prefix(key) + MANIFEST_EXT
+
+    def get_cache_manifest(
+        self, source: str, config: Dict[str, Any], date: datetime.datetime = None
+    ) -> Dict[str, Any]:
+        """Get the sidecar manifest of cached raw data.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: the manifest, None if not cached
+        """
+        manifest = self.get_cache(source, config).get(
+            self.get_cache_manifest_key(source, config, date)
+        )
+        return None if manifest is None else json.loads(manifest)
+
+    def save_cache_manifest(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        keys: List[str],
+        date: datetime.datetime = None,
+    ):
+        """Save the sidecar manifest of cached raw data.
+
+        The manifest records the fingerprint of the request with and without
+        the date window, so a request only differs in period could reuse it.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param keys: the cache keys of the raw data pages
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        """
+        date = self.current_date if date is None else date
+        manifest = {
+            "fingerprint": get_request_fingerprint(
+                self.get_cache_request(source, config, date)
+            ),
+            "request": get_request_fingerprint(
+                self.get_cache_request(source, config, date, False)
+            ),
+            "start_date": lookback_dates(date, self.period).strftime(
+                DEFAULT_DATE_FORMAT
+            ),
+            "end_date": date.strftime(DEFAULT_DATE_FORMAT),
+            "keys": keys,
+            "created_at": datetime.datetime.utcnow().strftime(DEFAULT_DATETIME_FORMAT),
+        }
+        self.get_cache(source, config).set(
+            self.get_cache_manifest_key(source, config, date), json.dumps(manifest)
+        )
+
     def is_cached(
-        self, source: str, config: Dict[str, Any], stage: str = "raw"
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str = "raw",
+        date: datetime.datetime = None,
     ) -> bool:
         """Check whether a raw data is cached.
 
         Note that this currently only used for raw data extracted from API.
+        The cache is valid if its manifest fingerprint matches the request,
+        or the request only differs in a narrower date window, which could be
+        filtered by `date_fields`, see `filter_cached_window()`.
 
         :rtype: bool
         :param source: name of the data source to be extracted,
@@ -296,10 +661,65 @@ class EtlTask:
         :param config: config of the data source to be extracted,
             specified in task config, see `configs/*.py`
         :param stage: the stage of the data, could be raw/staging/production.
-        :return: whether a data file is cached in local file system
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: whether a data file is cached in the cache backend
+        """
+        key = self.get_cache_key(source, config, stage, None, date)
+        if not self.get_cache(source, config).exists(key):
+            return False
+        manifest = self.get_cache_manifest(source, config, date)
+        if manifest is None:
+            log.info("Cache manifest of %s not found, refreshing cache." % key)
+            return False
+        request = self.get_cache_request(source, config, date)
+        if manifest["fingerprint"] == get_request_fingerprint(request):
+            return True
+        base_request = self.get_cache_request(source, config, date, False)
+        if (
+            manifest["request"] != get_request_fingerprint(base_request)
+            or "date_fields" not in config
+            or "iterator" in config
+        ):
+            log.info("Cache of %s is outdated, refreshing cache." % key)
+            return False
+        date = self.current_date if date is None else date
+        start_date = lookback_dates(date, self.period).strftime(DEFAULT_DATE_FORMAT)
+        return manifest["start_date"] <= start_date
+
+    def filter_cached_window(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        extracted: DataFrame,
+        date: datetime.datetime = None,
+    ) -> DataFrame:
+        """Filter data extracted from a cache with a wider date window.
+
+        :rtype: DataFrame
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param extracted: the DataFrame extracted from cache
+        :param date: the date part of the data file name,
+            will use `self.current_date` if not specified
+        :return: the DataFrame in the requested date window
         """
-        fpath = self.get_filepath(source, config, stage, "fs")
-        return os.path.isfile(fpath)
+        manifest = self.get_cache_manifest(source, config, date)
+        request = self.get_cache_request(source, config, date)
+        if manifest is None or manifest["fingerprint"] == get_request_fingerprint(
+            request
+        ):
+            return extracted
+        date = self.current_date if date is None else date
+        log.info(
+            "Filtering cached %s-%s/%s from %s to %d days"
+            % (self.task, source, date.date(), manifest["start_date"], self.period)
+        )
+        return filter_date_window(
+            extracted, config, lookback_dates(date, self.period), date
+        )
 
     def get_target_dataframe(
         self, schema: List[Tuple[str, np.generic]] = None
@@ -315,6 +735,47 @@ class EtlTask:
             np.empty(0, dtype=np.dtype(self.raw_schema if schema is None else schema))
         )
 
+    def convert_raw(self, source: str, config: Dict[str, Any], raw: str) -> DataFrame:
+        """Convert raw data into DataFrame through the converted DataFrame cache.
+
+        For cached sources, the converted DataFrame is stored as parquet
+        beside the raw cache, keyed by the raw data and the conversion configs,
+        see `utils.cache.get_converted_fingerprint()`.
+
+        :rtype: DataFrame
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param raw: the raw data to convert
+        :return: the converted DataFrame
+        """
+        if "cache_file" not in config or not config["cache_file"]:
+            return convert_df(raw, config)
+        fpath = get_path_format().format(
+            prefix=self.destinations["fs"]["prefix"],
+            stage=CONVERTED_STAGE,
+            task=self.task,
+            source=source,
+            filename="%s.%s" % (get_converted_fingerprint(raw, config), CONVERTED_EXT),
+        )
+        if os.path.isfile(fpath):
+            mark_used(fpath)
+            return pd.read_parquet(fpath)
+        df = convert_df(raw, config)
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        try:
+            # write to a temp file first so a partial file is never read
+            df.to_parquet(fpath + ".tmp", index=False)
+            os.replace(fpath + ".tmp", fpath)
+            get_file_index(self.destinations["fs"]["prefix"]).add(fpath)
+        except (ValueError, TypeError, NotImplementedError, ImportError) as e:
+            # e.g. columns of mixed types couldn't be stored as parquet
+            log.warning("Skip caching converted %s: %s" % (fpath, e))
+            if os.path.isfile(fpath + ".tmp"):
+                os.remove(fpath + ".tmp")
+        return df
+
     def extract_via_fs(
         self,
         source: str,
@@ -336,20 +797,29 @@ class EtlTask:
             will use `self.current_date` if not specified
         :return: the extracted DataFrame
         """
-        # extract paged raw files
+        # extract paged raw files, kept as file references instead of strings
+        cache = None
         if "paths" in config:
             fpaths = config["paths"]
         elif stage == "raw":
-            fpaths = self.get_filepaths(source, config, stage, "fs", date)
+            cache = self.get_cache(source, config)
+            if "daily_cache" in config and config["daily_cache"]:
+                # the window is assembled from day cells
+                fpaths = self.get_daily_cache_keys(source, config, date)
+            else:
+                fpaths = cache.keys(
+                    self.get_cache_key(source, config, stage, "*", date)
+                )
         else:
             fpaths = [self.get_filepath(source, config, stage, "fs", date)]
         if "iterator" in config:
             extracted = None if "iterator" not in config else dict()
             for fpath in fpaths:
-                raw = read_string(fpath)
-                it = get_file_ext(fpath)
+                raw = RawFile(fpath) if cache is None else cache.get_raw(fpath)
+                # same iterator as extracted via API, e.g. 1 of 2019-09-08.1.json
+                it = get_file_ext(fpath).split(".")[0]
                 self.raw[it] = raw
-                extracted[it] = convert_df(raw, config)
+                extracted[it] = self.convert_raw(source, config, raw)
             log.info(
                 "%s-%s-%s/%s x %d iterators extracted from file system"
                 % (
@@ -360,16 +830,18 @@ class EtlTask:
                     len(fpaths),
                 )
             )
+            if "stack_iterators" in config and config["stack_iterators"]:
+                extracted = stack_frames(extracted, "iterator")
         else:
             extracted = None
             for fpath in fpaths:
-                raw = read_string(fpath)
+                raw = RawFile(fpath) if cache is None else cache.get_raw(fpath)
                 if extracted is None:
                     self.raw[source] = [raw]
-                    extracted = convert_df(raw, config)
+                    extracted = self.convert_raw(source, config, raw)
                 else:
                     self.raw[source] += [raw]
-                    extracted = extracted.append(convert_df(raw, config))
+                    extracted = extracted.append(self.convert_raw(source, config, raw))
             extracted = extracted.reset_index(drop=True)
             log.info(
                 "%s-%s-%s/%s x %d pages extracted from file system"
@@ -405,7 +877,10 @@ class EtlTask:
             will use `self.current_date` if not specified
         :return: the extracted `DataFrame`
         """
-        if config["type"] == "gcs":
+        if "daily_cache" in config and config["daily_cache"]:
+            self.extract_daily_cache_via_gcs(source, config, date)
+            return self.extract_via_fs(source, config, stage, date)
+        elif config["type"] == "gcs":
             bucket = config["bucket"]
             prefix = self.get_filepath(source, config, stage, "gcs")
         else:
@@ -417,13 +892,15 @@ class EtlTask:
 
         i = 0
         is_empty = True
+        cache = self.get_cache(source, config)
         for i, blob in enumerate(blobs):
             is_empty = False
             page = get_file_ext(blob.name)
-            filepath = self.get_or_create_filepath(
-                source, config, stage, "fs", page, date
-            )
-            blob.download_to_filename(filepath)
+            key = self.get_cache_key(source, config, stage, page, date)
+            if cache.get_path(key) is not None:
+                blob.download_to_filename(cache.get_path(key))
+            else:
+                cache.set(key, decode_string(blob.download_as_string()))
 
         if not is_empty:
             if config["type"] == "gcs":
@@ -469,14 +946,7 @@ class EtlTask:
         :return: the extracted `DataFrame`
         """
         # API paging
-        start_date = (
-            self.last_month.strftime(config["date_format"])
-            if date is None
-            else lookback_dates(date, self.period)
-        )
-        end_date = (
-            self.current_date.strftime(config["date_format"]) if date is None else date
-        )
+        start_date, end_date = self.get_request_window(config, date)
         request_interval = (
             config["request_interval"] if "request_interval" in config else 1
         )
@@ -493,67 +963,349 @@ class EtlTask:
                     end_date=end_date,
                     iterator=it,
                 )
-                r = requests.get(url, allow_redirects=True)
-                raw[it] = r.text
-                extracted[it] = convert_df(raw[it], config)
+                text = requests.get(url, allow_redirects=True).text
+                raw[it] = self.spill_raw(source, config, it, text, date)
+                extracted[it] = convert_df(text, config)
             self.raw[source] = raw
             log.info(
                 "%s-%s-%s/%s x %d iterators extracted from API"
                 % (stage, self.task, source, self.current_date.date(), len(extracted))
             )
+            if "stack_iterators" in config and config["stack_iterators"]:
+                return stack_frames(extracted, "iterator")
             return extracted
+        elif "daily_cache" in config and config["daily_cache"]:
+            return self.extract_daily_via_api(source, config, stage, date)
         elif "page_size" in config:
-            limit = config["page_size"]
-            url = config["url"].format(
-                api_key=config["api_key"],
-                start_date=start_date,
-                end_date=end_date,
-                page=1,
-                limit=limit,
+            raw = self.request_api_pages(
+                source, config, start_date, end_date, date, True
             )
-            r = requests.get(url, allow_redirects=True)
-            raw = [r.text]
             extracted = convert_df(raw[0], config)
-            count = int(json_extract(raw[0], config["json_path_page_count"]))
-            if count is None or int(count) <= 1:
-                self.raw[source] = raw
-                log.info(
-                    "%s-%s-%s/%s x 1 page extracted from API"
-                    % (stage, self.task, source, self.current_date.date())
-                )
-                return extracted
-            for page in range(2, count):
-                log.debug("waiting for %s page %d" % (source, page))
-                time.sleep(request_interval)
-                url = config["url"].format(
-                    api_key=config["api_key"],
-                    start_date=start_date,
-                    end_date=end_date,
-                    page=page,
-                    limit=limit,
-                )
-                r = requests.get(url, allow_redirects=True)
-                raw += [r.text]
-                extracted = extracted.append(convert_df(raw[page - 1], config))
+            for r in raw[1:]:
+                extracted = extracted.append(convert_df(r, config))
             extracted = extracted.reset_index(drop=True)
             self.raw[source] = raw
             log.info(
                 "%s-%s-%s/%s x %d pages extracted from API"
-                % (stage, self.task, source, self.current_date.date(), count)
+                % (stage, self.task, source, self.current_date.date(), len(raw))
             )
             return extracted
         else:
             url = config["url"].format(
                 api_key=config["api_key"], start_date=start_date, end_date=end_date
             )
-            r = requests.get(url, allow_redirects=True)
-            raw = r.text
-            self.raw[source] = raw
+            if "stream" in config and config["stream"]:
+                # stream the response to a spill file, and parse from the file
+                r = requests.get(url, allow_redirects=True, stream=True)
+                raw = r.iter_content(STREAM_CHUNK_SIZE)
+            else:
+                r = requests.get(url, allow_redirects=True)
+                raw = r.text
+            self.raw[source] = self.spill_raw(source, config, None, raw, date)
             log.info(
                 "%s-%s-%s/%s extracted from API"
                 % ("raw", self.task, source, self.current_date.date())
             )
-            return convert_df(raw, config)
+            if isinstance(raw, str):
+                return convert_df(raw, config)
+            return convert_df(self.raw[source], config)
+
+    def request_api_pages(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        start_date: Any,
+        end_date: Any,
+        date: datetime.datetime = None,
+        spill: bool = False,
+    ) -> List[Union[str, RawFile]]:
+        """Request all pages of a date window from API.
+
+        :rtype: list[str]
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param start_date: the start date of the window
+        :param end_date: the end date of the window
+        :param date: the date part of the spill file names,
+            will use `self.current_date` if not specified
+        :param spill: whether to spill each page to file as it arrives,
+            see `spill_raw()`
+        :return: the raw responses of pages, or the spill files of them
+        """
+        request_interval = (
+            config["request_interval"] if "request_interval" in config else 1
+        )
+        limit = config["page_size"] if "page_size" in config else None
+        url = config["url"].format(
+            api_key=config["api_key"],
+            start_date=start_date,
+            end_date=end_date,
+            page=1,
+            limit=limit,
+        )
+        text = requests.get(url, allow_redirects=True).text
+        raw = [self.spill_raw(source, config, 1, text, date) if spill else text]
+        if "page_size" not in config:
+            return raw
+        count = int(json_extract(text, config["json_path_page_count"]))
+        if count is None or int(count) <= 1:
+            return raw
+        for page in range(2, count):
+            log.debug("waiting for %s page %d" % (source, page))
+            time.sleep(request_interval)
+            url = config["url"].format(
+                api_key=config["api_key"],
+                start_date=start_date,
+                end_date=end_date,
+                page=page,
+                limit=limit,
+            )
+            text = requests.get(url, allow_redirects=True).text
+            raw += [
+                self.spill_raw(source, config, len(raw) + 1, text, date)
+                if spill
+                else text
+            ]
+        return raw
+
+    def get_daily_cache(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        day: datetime.datetime,
+        date: datetime.datetime = None,
+    ) -> Optional[List[str]]:
+        """Get the cache keys of the raw pages of a day cell if it's settled.
+
+        A day within `mutable_days` before the window end is still mutable
+        (e.g. conversions could still be approved or rejected), so is a cell
+        fetched while its day was still mutable.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param day: the day of the cell
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        :return: the cache keys, None if the cell should be requested again
+        """
+        date = self.current_date if date is None else date
+        mutable_days = config["mutable_days"] if "mutable_days" in config else 0
+        if (date - day).days < mutable_days:
+            return None
+        manifest = self.get_daily_cache_manifest(source, config, day)
+        if manifest is None:
+            return None
+        request = self.get_cache_request(source, config, day, False)
+        if manifest["request"] != get_request_fingerprint(request):
+            return None
+        as_of = datetime.datetime.strptime(manifest["as_of"], DEFAULT_DATE_FORMAT)
+        if (as_of - day).days < mutable_days:
+            return None
+        cache = self.get_cache(source, config)
+        if not all(cache.exists(key) for key in manifest["keys"]):
+            return None
+        return manifest["keys"]
+
+    def get_daily_cache_manifest(
+        self, source: str, config: Dict[str, Any], day: datetime.datetime
+    ) -> Optional[Dict[str, Any]]:
+        """Get the manifest of a day cell.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param day: the day of the cell
+        :return: the manifest, None if not cached
+        """
+        manifest = self.get_cache(source, config).get(
+            self.get_cache_manifest_key(source + DAILY_CACHE_SUFFIX, config, day)
+        )
+        return None if manifest is None else json.loads(manifest)
+
+    def get_daily_cache_keys(
+        self, source: str, config: Dict[str, Any], date: datetime.datetime = None
+    ) -> List[str]:
+        """Get the cache keys of the raw pages of a window assembled by day cells.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        :return: the cache keys of cached pages in order of days
+        """
+        date = self.current_date if date is None else date
+        start_date = lookback_dates(date, self.period)
+        cache = self.get_cache(source, config)
+        keys = []
+        for i in range(self.period + 1):
+            day = start_date + datetime.timedelta(days=i)
+            manifest = self.get_daily_cache_manifest(source, config, day)
+            if manifest is not None:
+                keys += [key for key in manifest["keys"] if cache.exists(key)]
+        return keys
+
+    def save_daily_cache(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        day: datetime.datetime,
+        pages: List[str],
+        date: datetime.datetime = None,
+    ) -> List[str]:
+        """Save the raw pages of a day cell with its manifest.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param day: the day of the cell
+        :param pages: the raw pages of the day
+        :param date: the end date of the window the cell is requested in,
+            will use `self.current_date` if not specified
+        :return: the cache keys of the pages
+        """
+        date = self.current_date if date is None else date
+        cell = source + DAILY_CACHE_SUFFIX
+        cache = self.get_cache(source, config)
+        keys = []
+        for i, page in enumerate(pages):
+            keys += [self.get_cache_key(cell, config, "raw", i + 1, day)]
+            cache.set(keys[-1], page)
+        for key in cache.keys(self.get_cache_key(cell, config, "raw", "*", day)):
+            if key not in keys:
+                cache.delete(key)
+        manifest = {
+            "request": get_request_fingerprint(
+                self.get_cache_request(source, config, day, False)
+            ),
+            "as_of": date.strftime(DEFAULT_DATE_FORMAT),
+            "keys": keys,
+        }
+        cache.set(
+            self.get_cache_manifest_key(cell, config, day), json.dumps(manifest)
+        )
+        return keys
+
+    def load_daily_cache_to_gcs(
+        self, source: str, config: Dict[str, Any], day: datetime.datetime
+    ):
+        """Back up a day cell with its manifest to GCS.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param day: the day of the cell
+        """
+        bucket = self.gcs.bucket(self.destinations["gcs"]["bucket"])
+        cache = self.get_cache(source, config)
+        manifest_key = self.get_cache_manifest_key(
+            source + DAILY_CACHE_SUFFIX, config, day
+        )
+        keys = self.get_daily_cache_manifest(source, config, day)["keys"]
+        for key in keys + [manifest_key]:
+            blob = bucket.blob(self.destinations["gcs"]["prefix"] + key)
+            self.upload_cached(blob, cache, key)
+
+    def extract_daily_cache_via_gcs(
+        self, source: str, config: Dict[str, Any], date: datetime.datetime = None
+    ):
+        """Download day cells of a window missing in cache from GCS.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        """
+        date = self.current_date if date is None else date
+        start_date = lookback_dates(date, self.period)
+        bucket = self.destinations["gcs"]["bucket"]
+        prefix = self.destinations["gcs"]["prefix"]
+        cache = self.get_cache(source, config)
+        for i in range(self.period + 1):
+            day = start_date + datetime.timedelta(days=i)
+            if self.get_daily_cache_manifest(source, config, day) is not None:
+                continue
+            manifest_key = self.get_cache_manifest_key(
+                source + DAILY_CACHE_SUFFIX, config, day
+            )
+            blobs = self.gcs.list_blobs(
+                bucket, prefix=prefix + get_path_prefix(manifest_key)
+            )
+            for blob in blobs:
+                key = blob.name.replace(prefix, "", 1)
+                if cache.get_path(key) is not None:
+                    blob.download_to_filename(cache.get_path(key))
+                else:
+                    cache.set(key, decode_string(blob.download_as_string()))
+
+    def extract_daily_via_api(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str = "raw",
+        date: datetime.datetime = None,
+    ) -> DataFrame:
+        """Extract a date window from API by day cells and convert into DataFrame.
+
+        Only missing or still mutable days are requested from API,
+        the window is assembled from the day cells,
+        see `get_daily_cache()`.
+        The day cells are the only cache of the source, requested cells are
+        backed up to GCS instead of the pages of the whole window.
+
+        :rtype: DataFrame
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param stage: the stage of the loaded data, could be raw/staging/production.
+        :param date: the end date of the window,
+            will use `self.current_date` if not specified
+        :return: the extracted `DataFrame`
+        """
+        date = self.current_date if date is None else date
+        start_date = lookback_dates(date, self.period)
+        keys = []
+        requested = 0
+        for i in range(self.period + 1):
+            day = start_date + datetime.timedelta(days=i)
+            day_keys = self.get_daily_cache(source, config, day, date)
+            if day_keys is None:
+                day_str = day.strftime(config["date_format"])
+                pages = self.request_api_pages(source, config, day_str, day_str)
+                day_keys = self.save_daily_cache(source, config, day, pages, date)
+                if self.args.dest != "fs":
+                    self.load_daily_cache_to_gcs(source, config, day)
+                requested += 1
+            keys += day_keys
+        cache = self.get_cache(source, config)
+        self.raw[source] = [cache.get_raw(key) for key in keys]
+        extracted = self.convert_raw(source, config, self.raw[source][0])
+        for r in self.raw[source][1:]:
+            extracted = extracted.append(self.convert_raw(source, config, r))
+        extracted = extracted.reset_index(drop=True)
+        log.info(
+            "%s-%s-%s/%s x %d days extracted from API, %d days from cache"
+            % (
+                stage,
+                self.task,
+                source,
+                date.date(),
+                requested,
+                self.period + 1 - requested,
+            )
+        )
+        return extracted
 
     @check_extract_cache
     def extract_via_bq(
@@ -580,10 +1332,16 @@ class EtlTask:
             self.current_date.strftime(config["date_format"]),
         )
         df = pdbq.read_gbq(query)
-        self.raw[source] = convert_format(
-            self.destinations["fs"]["file_format"],
-            df,
-            None if "date_fields" not in config else config["date_fields"],
+        self.raw[source] = self.spill_raw(
+            source,
+            config,
+            None,
+            convert_format(
+                self.destinations["fs"]["file_format"],
+                df,
+                None if "date_fields" not in config else config["date_fields"],
+            ),
+            date,
         )
         log.info(
             "%s-%s-%s/%s w/t %d records extracted from BigQuery"
@@ -629,6 +1387,50 @@ class EtlTask:
                 elif self.sources[source]["type"] == "const":
                     self.extracted[source] = self.extract_via_const(source, config)
 
+    def get_validator(self, source: str, config: Dict[str, Any]) -> SchemaValidator:
+        """Get the validator of transformed data of a data source.
+
+        Sources with `constraints` in config, e.g.
+        `"constraints": {"payout": {"nullable": False, "min": 0}}`,
+        are validated by their own validator compiled with the constraints,
+        see `utils.schema.SchemaValidator`.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :return: the validator
+        """
+        if "constraints" not in config:
+            return self.schema
+        if source not in self.validators:
+            self.validators[source] = SchemaValidator(
+                self.raw_schema, config["constraints"]
+            )
+        return self.validators[source]
+
+    @staticmethod
+    def get_transform_arg(arg: Any, copy: Callable[[DataFrame], DataFrame]) -> Any:
+        """Get a transform argument that doesn't change extracted data.
+
+        DataFrames, including dict of DataFrames extracted by iterators,
+        are passed as views or copies.
+
+        :param arg: the extracted DataFrame or other argument
+        :param copy: the function to copy a DataFrame,
+            e.g. `SharedViews.view()` or `DataFrame.copy()`
+        :return: the copied DataFrame(s) or the original argument
+        """
+        if isinstance(arg, DataFrame):
+            return copy(arg)
+        elif (
+            isinstance(arg, dict)
+            and len(arg) > 0
+            and all(isinstance(v, DataFrame) for v in arg.values())
+        ):
+            return {k: copy(v) for k, v in arg.items()}
+        return arg
+
     def transform(self):
         """Transform extracted data into target format DataFrames.
 
@@ -642,6 +1444,10 @@ class EtlTask:
         data source to be extracted,
         `config` is the config of the data source to be extracted,
         both specified in task config, see `configs/*.py`
+
+        Extracted DataFrames are passed as views sharing their data,
+        transforms writing into their arguments in place should set
+        `transform_copy` in the source config to get copies instead.
         """
         for source in self.sources:
             if not self.args.source or source in self.args.source.split(","):
@@ -652,26 +1458,33 @@ class EtlTask:
                     transform_method = getattr(self, "transform_{}".format(source))
                     transform_args = inspect.getfullargspec(transform_method).args
                     avail_args = {"source": source, "config": config, **self.extracted}
-                    transform_kwargs = {}
                     for transform_arg in transform_args:
                         if transform_arg == "self":
                             continue
-                        if transform_arg in avail_args:
-                            # make DataFrame copies to avoid changing the extracted one
-                            arg = (
-                                avail_args[transform_arg].copy()
-                                if isinstance(avail_args[transform_arg], DataFrame)
-                                else avail_args[transform_arg]
-                            )
-                            transform_kwargs[transform_arg] = arg
-                        else:
-                            assert False, "Invalid transform arg %s" % transform_arg
-                    self.transformed[source] = transform_method(**transform_kwargs)
-                    errors = self.schema.validate(self.transformed[source])
-                    error_msg = ""
-                    for error in errors:
-                        error_msg += error.message + "\n"
-                    assert len(errors) == 0, error_msg
+                        assert transform_arg in avail_args, (
+                            "Invalid transform arg %s" % transform_arg
+                        )
+                    views = SharedViews()
+                    copy = (
+                        DataFrame.copy
+                        if "transform_copy" in config and config["transform_copy"]
+                        else views.view
+                    )
+                    self.transformed[source] = transform_method(
+                        **{
+                            arg: self.get_transform_arg(avail_args[arg], copy)
+                            for arg in transform_args
+                            if arg != "self"
+                        }
+                    )
+                    assert not views.is_changed(), (
+                        "transform_%s writes extracted data in place, "
+                        "set transform_copy in its source config" % source
+                    )
+                    errors = self.get_validator(source, config).validate(
+                        self.transformed[source]
+                    )
+                    assert len(errors) == 0, "\n".join(errors)
                     log.info(
                         "%s-%s-%s/%s w/t %d records transformed"
                         % (
@@ -683,7 +1496,13 @@ class EtlTask:
                         )
                     )
 
-    def load_to_fs(self, source: str, config: Dict[str, Any], stage: str = "raw"):
+    def load_to_fs(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str = "raw",
+        date: datetime.datetime = None,
+    ):
         """Load data into file system based on destination settings.
 
         The logic is based on task config (see `configs/*.py`).
@@ -693,35 +1512,54 @@ class EtlTask:
         :param config: config of the data source to be extracted,
             specified in task config, see `configs/*.py`
         :param stage: the stage of the loaded data, could be raw/staging/production.
+        :param date: the date part of the raw data file name,
+            will use `self.current_date` if not specified
         """
         if stage == "raw":
-            fpath = self.get_or_create_filepath(source, config, stage, "fs")
+            cache = self.get_cache(source, config)
             # write multiple raw files if paged
             raw = self.raw[source]
             if isinstance(raw, list):
-                for i, r in enumerate(raw):
-                    fpath = self.get_or_create_filepath(
-                        source, config, stage, "fs", i + 1
-                    )
-                    write_string(fpath, r)
-                log.info(
-                    "%s-%s-%s/%s x %d pages loaded to file system."
-                    % (stage, self.task, source, self.current_date.date(), len(raw))
-                )
+                pages = {i + 1: r for i, r in enumerate(raw)}
             elif isinstance(raw, dict):
-                for i, r in raw.items():
-                    fpath = self.get_or_create_filepath(source, config, stage, "fs", i)
-                    write_string(fpath, r)
-                log.info(
-                    "%s-%s-%s/%s x %d pages loaded to file system."
-                    % (stage, self.task, source, self.current_date.date(), len(raw))
-                )
+                pages = raw
             else:
-                write_string(fpath, raw)
-                log.info(
-                    "%s-%s-%s/%s x 1 page loaded to file system."
-                    % (stage, self.task, source, self.current_date.date())
+                pages = {None: raw}
+            keys = []
+            for i, r in pages.items():
+                keys += [self.get_cache_key(source, config, stage, i, date)]
+                if isinstance(r, RawFile):
+                    path = cache.get_path(keys[-1])
+                    if r.path == path:
+                        # extracted from the cached file itself
+                        continue
+                    elif path is not None and os.path.dirname(r.path).endswith(
+                        self.get_spill_folder(source)
+                    ):
+                        # move the spill file into the file system cache
+                        os.replace(r.path, path)
+                        get_file_index(self.destinations["fs"]["prefix"]).remove(
+                            r.path
+                        )
+                        r.path = path
+                        continue
+                    r = r.read()
+                cache.set(keys[-1], r)
+            # remove pages left from a previous request
+            for key in cache.keys(self.get_cache_key(source, config, stage, "*", date)):
+                if key not in keys:
+                    cache.delete(key)
+            self.save_cache_manifest(source, config, keys, date)
+            log.info(
+                "%s-%s-%s/%s x %d pages loaded to file system."
+                % (
+                    stage,
+                    self.task,
+                    source,
+                    (self.current_date if date is None else date).date(),
+                    len(keys),
                 )
+            )
         else:
             df = self.transformed[source]
             if "date_field" in self.destinations["fs"]:
@@ -776,7 +1614,8 @@ class EtlTask:
         date = self.current_date if date is None else date
         fpath = self.get_or_create_filepath(source, config, stage, "fs", None, date)
         output = convert_format(self.destinations["fs"]["file_format"], df)
-        write_string(fpath, output)
+        write_string(fpath, output, self.get_compression(stage))
+        get_file_index(self.destinations["fs"]["prefix"]).add(fpath)
 
     def convert_latest_file(
         self,
@@ -795,32 +1634,94 @@ class EtlTask:
         :param date: the date of the data
         """
         # find the latest file
-        files = glob.glob(
-            get_path_format(True).format(
-                prefix=self.destinations["fs"]["prefix"],
-                stage=stage,
-                task=self.task,
-                source=source,
-            )
+        index = get_file_index(self.destinations["fs"]["prefix"])
+        folder = DEFAULT_PATH_FORMAT.format(
+            prefix="", stage=stage, task=self.task, source=source
         )
-        latest_ds = None
-        latest_file = None
-        for file in files:
-            fn = get_path_prefix(os.path.basename(file))[0:-1]
-            try:
-                ds = datetime.datetime.strptime(fn, DEFAULT_DATE_FORMAT)
-            except ValueError:
-                # could be "latest"
-                continue
-            if latest_ds is None or ds > latest_ds:
-                latest_ds = ds
-                latest_file = file
+        latest_file = index.get_latest(folder)
+
+        # write new or changed rows since the previous date
+        if "latest_diff" in config and config["latest_diff"]:
+            previous_file = index.get_latest(
+                folder, FileIndex.get_row(folder, os.path.basename(latest_file))[2]
+            )
+            self.convert_latest_diff_file(
+                config, source, stage, latest_file, previous_file
+            )
 
         # copy to latest filepath
         latest_dest_file = self.get_latest_filepath(source, config, stage, "fs")
         copyfile(latest_file, latest_dest_file)
+        index.add(latest_dest_file)
+
+    def convert_latest_diff_file(
+        self,
+        config: Dict[str, Any],
+        source: str,
+        stage: str,
+        latest_file: str,
+        previous_file: Optional[str],
+    ):
+        """Convert rows of the latest file that are new or changed into a diff file.
+
+        Rows are compared by all the schema fields except the date field,
+        the diff is against the file of the previous date instead of the
+        current latest file, so reruns of the same date write the same diff,
+        it's the whole latest file if there is no previous file.
+
+        :param config: the corresponding source config
+        :param source: the name of the data source
+        :param stage: the stage of the data
+        :param latest_file: the path of the file of the latest date
+        :param previous_file: the path of the file of the previous date
+        """
+        ftype = self.get_dest_ext(self.destinations)
+        assert ftype == "jsonl", "Only jsonl latest files could be diffed."
+        fs_config = self.destinations["fs"]
+        date_field = None if "date_field" not in fs_config else fs_config["date_field"]
+        columns = [name for name, _ in self.raw_schema if name != date_field]
+
+        def read_jsonl(fpath: str) -> DataFrame:
+            # keep values as is, e.g. tokens of digits
+            with RawFile(fpath).open() as f:
+                return pd.read_json(f, lines=True, dtype=False, convert_dates=False)
+
+        latest = read_jsonl(latest_file)
+        previous = DataFrame() if previous_file is None else read_jsonl(previous_file)
+        diff = diff_rows(previous, latest, columns)
+        fpath = self.get_latest_filepath(source, config, stage, "fs", "latest_diff")
+        write_string(fpath, convert_format(ftype, diff), self.get_compression(stage))
+        get_file_index(self.destinations["fs"]["prefix"]).add(fpath)
+        log.info(
+            "%s-%s-%s/latest x %d new or changed rows of %d."
+            % (stage, self.task, source, len(diff), len(latest))
+        )
+
+    def check_file_schema(self, fpath: str):
+        """Check a transformed file against the target schema before loading.
+
+        The files on GCS are loaded to BigQuery with the schema derived from
+        the task schema, so mismatches are reported before uploading them.
+        The file is streamed, only the header or the first lines are checked.
 
-    def load_to_gcs(self, source: str, config: Dict[str, Any], stage: str = "raw"):
+        :param fpath: the path of the file to check
+        """
+        with RawFile(fpath).open() as f:
+            errors = check_file_schema(
+                f, self.raw_schema, self.get_dest_ext(self.destinations)
+            )
+        assert len(errors) == 0, "%s doesn't match schema:\n%s" % (
+            fpath,
+            "\n".join(errors),
+        )
+
+    def load_to_gcs(
+        self,
+        source: str,
+        config: Dict[str, Any],
+        stage: str = "raw",
+        date: datetime.datetime = None,
+    ):
         """Load data into Google Cloud Storage based on destination settings.
 
         The logic is based on task config (see `configs/*.py`).
@@ -830,16 +1731,21 @@ class EtlTask:
         :param config: config of the data source to be extracted,
             specified in task config, see `configs/*.py`
         :param stage: the stage of the loaded data, could be raw/staging/production.
+        :param date: the date part of the raw data file name,
+            will use `self.current_date` if not specified
         """
         bucket = self.gcs.bucket(self.destinations["gcs"]["bucket"])
         if stage == "raw":
-            fpaths = self.get_filepaths(source, config, stage, "fs")
-            fl = len(fpaths)
-            for fpath in fpaths:
+            cache = self.get_cache(source, config)
+            keys = cache.keys(self.get_cache_key(source, config, stage, "*", date))
+            fl = len(keys)
+            for key in keys:
                 blob = bucket.blob(
-                    self.get_filepath(source, config, stage, "gcs", get_file_ext(fpath))
+                    self.get_filepath(
+                        source, config, stage, "gcs", get_file_ext(key), date
+                    )
                 )
-                blob.upload_from_filename(fpath)
+                self.upload_cached(blob, cache, key)
         else:
             # load files by date
             df = self.transformed[source]
@@ -848,33 +1754,140 @@ class EtlTask:
                 ds = df[self.destinations["fs"]["date_field"]].dt.date.unique()
                 fl = len(ds)
                 for d in ds:
+                    fpath = self.get_filepath(source, config, stage, "fs", None, d)
+                    self.check_file_schema(fpath)
                     blob = bucket.blob(
                         self.get_filepath(source, config, stage, "gcs", None, d)
                     )
-                    blob.upload_from_filename(
-                        self.get_filepath(source, config, stage, "fs", None, d)
-                    )
+                    self.upload_file(blob, fpath)
             else:
                 fl = 1
+                fpath = self.get_filepath(source, config, stage, "fs")
+                self.check_file_schema(fpath)
                 blob = bucket.blob(self.get_filepath(source, config, stage, "gcs"))
-                blob.upload_from_filename(
-                    self.get_filepath(source, config, stage, "fs")
-                )
+                self.upload_file(blob, fpath)
             # upload latest file
             if "write_latest" in config and config["write_latest"]:
                 log.info("Load latest file to GCS.")
                 blob = bucket.blob(
                     self.get_latest_filepath(source, config, stage, "gcs")
                 )
-                blob.upload_from_filename(
-                    self.get_latest_filepath(source, config, stage, "fs")
+                self.upload_file(
+                    blob, self.get_latest_filepath(source, config, stage, "fs")
                 )
+                if "latest_diff" in config and config["latest_diff"]:
+                    blob = bucket.blob(
+                        self.get_latest_filepath(
+                            source, config, stage, "gcs", "latest_diff"
+                        )
+                    )
+                    self.upload_file(
+                        blob,
+                        self.get_latest_filepath(
+                            source, config, stage, "fs", "latest_diff"
+                        ),
+                    )
 
         log.info(
             "%s-%s-%s/%s x %d files loaded to GCS."
             % (stage, self.task, source, self.current_date.date(), fl)
         )
 
+    def load_to_bq(self, source: str, config: Dict[str, Any], stage: str = "raw"):
+        """Load transformed DataFrame into BigQuery directly as a columnar load job.
+
+        The logic is based on task config (see `configs/*.py`),
+        the table schema is derived from the task schema.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param stage: the stage of the loaded data, could be raw/staging/production.
+        """
+        # e.g. adjust trackers are merged into BigQuery by the BigQuery task
+        assert "bq" in self.destinations, "No bq destination for %s task" % self.task
+        dest_config = self.destinations["bq"]
+        client = bigquery.Client(dest_config["project"])
+        table_ref = client.dataset(dest_config["dataset"]).table(dest_config["table"])
+        try:
+            # the table could be shared with other tasks, e.g. `mango_revenue`
+            table = client.get_table(table_ref)
+            errors = check_table_schema(table.schema, self.raw_schema)
+            assert len(errors) == 0, "%s doesn't match schema:\n%s" % (
+                table_ref.table_id,
+                "\n".join(errors),
+            )
+        except NotFound:
+            pass
+        schema = get_bq_schema(self.raw_schema)
+        df = self.transformed[source][[field.name for field in schema]].copy()
+        for field in schema:
+            if field.field_type == "DATE":
+                df[field.name] = df[field.name].dt.date
+
+        job_config = bigquery.LoadJobConfig()
+        job_config.schema = schema
+        is_append = "append" not in dest_config or dest_config["append"]
+        if "partition_field" in dest_config:
+            job_config.time_partitioning = bigquery.TimePartitioning(
+                type_=bigquery.TimePartitioningType.DAY,
+                field=dest_config["partition_field"],
+            )
+            dates = self.transformed[source][dest_config["partition_field"]].dt.date
+            ds = dates.unique()
+        else:
+            ds = [self.current_date.date()]
+
+        jobs = []
+        if is_append:
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+            if "cleanup_query" in config:
+                qstring = read_string("sql/{}.sql".format(config["cleanup_query"]))
+                for d in ds:
+                    client.query(
+                        qstring.format(
+                            project=dest_config["project"],
+                            dataset=dest_config["dataset"],
+                            dest=dest_config["table"],
+                            start_date=d.strftime(DEFAULT_DATE_FORMAT),
+                        )
+                    ).result()
+            jobs += [(table_ref, df)]
+        elif "partition_field" in dest_config:
+            # replace partitions of the loaded dates only
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+            for d in ds:
+                partition_ref = client.dataset(dest_config["dataset"]).table(
+                    "%s$%s" % (dest_config["table"], d.strftime("%Y%m%d"))
+                )
+                jobs += [(partition_ref, df[dates == d])]
+        else:
+            job_config.write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+            jobs += [(table_ref, df)]
+
+        for ref, ddf in jobs:
+            load_job = client.load_table_from_dataframe(
+                ddf, ref, location=dest_config["location"], job_config=job_config
+            )
+            load_job.result()
+        log.info(
+            "%s-%s-%s/%s x %d dates loaded to BigQuery."
+            % (stage, self.task, source, self.current_date.date(), len(ds))
+        )
+
+    def archive(self, source: str, config: Dict[str, Any], stage: str = "raw"):
+        """Archive transformed data as files to file system and GCS.
+
+        :param source: name of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param config: config of the data source to be extracted,
+            specified in task config, see `configs/*.py`
+        :param stage: the stage of the loaded data, could be raw/staging/production.
+        """
+        self.load_to_fs(source, config, stage)
+        self.load_to_gcs(source, config, stage)
+
     def load(self):
         """Load transformed files into destinations.
 
@@ -883,15 +1896,30 @@ class EtlTask:
         and load transformed data accordingly based on the destination argument,
         see also `get_arg_parser()`.
 
+        When loading to BigQuery directly, files are archived to GCS
+        in background without blocking the load of other sources.
         """
-        for source in self.sources:
-            if not self.args.source or source in self.args.source.split(","):
-                config = self.sources[source]
-                if "load" in config and config["load"]:
-                    assert self.transformed[source] is not None
-                    self.load_to_fs(source, config, self.stage)
-                    if self.args.dest != "fs":
-                        self.load_to_gcs(source, config, self.stage)
+        archives = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for source in self.sources:
+                if not self.args.source or source in self.args.source.split(","):
+                    config = self.sources[source]
+                    if "load" in config and config["load"]:
+                        assert self.transformed[source] is not None
+                        if self.args.dest == "bq":
+                            self.load_to_bq(source, config, self.stage)
+                            archives += [
+                                executor.submit(
+                                    self.archive, source, config, self.stage
+                                )
+                            ]
+                            continue
+                        self.load_to_fs(source, config, self.stage)
+                        if self.args.dest != "fs":
+                            self.load_to_gcs(source, config, self.stage)
+            # raise errors of archiving if any
+            for archive in archives:
+                archive.result()
 
     def run(self):
         """Run the whole ETL process based on the step argument.
@@ -901,9 +1929,32 @@ class EtlTask:
         """
         if self.args.step and self.args.step[0].upper() not in ["E", "T", "L"]:
             raise ValueError("Invalid argument specified.")
-        if not self.args.step or self.args.step[0].upper() in ["E", "T", "L"]:
-            self.extract()
-        if not self.args.step or self.args.step[0].upper() in ["T", "L"]:
-            self.transform()
-        if not self.args.step or self.args.step[0].upper() in ["L"]:
-            self.load()
+        try:
+            if not self.args.step or self.args.step[0].upper() in ["E", "T", "L"]:
+                with track_peak_memory("extract", self.peak_memory):
+                    self.extract()
+            if not self.args.step or self.args.step[0].upper() in ["T", "L"]:
+                with track_peak_memory("transform", self.peak_memory):
+                    self.transform()
+            if not self.args.step or self.args.step[0].upper() in ["L"]:
+                with track_peak_memory("load", self.peak_memory):
+                    self.load()
+        finally:
+            self.clean_spill()
+        self.prune_cache()
+
+    def prune_cache(self):
+        """Evict cached files by the quota of the file system destination.
+
+        Files used by this run, or of dates this run still needs,
+        are never evicted, see `utils.cache.CacheManager.prune()`.
+        """
+        manager = get_cache_manager(self.destinations["fs"], self.args)
+        if manager.max_size is None and manager.max_age is None:
+            return
+        evicted = manager.prune(
+            self.task,
+            keep_since=self.started_at,
+            keep_dates=get_needed_dates(self.current_date, self.period),
+        )
+        log.info("%d cached files of %s evicted." % (len(evicted), self.task))
@@ -1,34 +1,94 @@
 """BigQuery Etl Tasks."""
 import datetime
+import functools
+import json
 import logging
 import re
 from argparse import Namespace
-from typing import Dict, Callable, Optional
+from collections import Counter
+from copy import deepcopy
+from typing import Dict, Callable, Optional, List
 
 from google.cloud.exceptions import NotFound
 
 import utils.config
 from google.cloud import bigquery
+from utils.cache import get_request_fingerprint
 from utils.file import read_string
 from utils.marshalling import lookback_dates
+from utils.query import build_sample_filter, get_filter_columns
+from utils.schema import check_table_schema, get_bq_schema
 
 log = logging.getLogger(__name__)
 
 DEFAULTS = {}
+# gzip compressed files are detected and loaded by BigQuery as well
 FILETYPES = {
     "csv": bigquery.SourceFormat.CSV,
     "jsonl": bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
 }
+TASK_STATE_TABLE = "etl_task_state"
+# postfix of the table a diff file is loaded into before merging
+MERGE_DIFF_POSTFIX = "_diff"
+TASK_STATE_SCHEMA = [
+    bigquery.SchemaField("dest", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("run_date", "DATE", mode="REQUIRED"),
+    bigquery.SchemaField("fingerprint", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("updated_at", "TIMESTAMP", mode="REQUIRED"),
+]
+
+
+def skip_if_unchanged(daily_run_func: Callable):
+    """Skip the daily run when its inputs are unchanged since the last run.
+
+    The fingerprint of the inputs is recorded in the task state table
+    after each successful run, so a rerun of the whole DAG only redo tasks
+    that failed or whose inputs were changed by the upstream reruns.
+
+    :param daily_run_func: the daily_run function to decorate
+    :return: the decorated daily_run function
+    """
+
+    @functools.wraps(daily_run_func)
+    def skip_if_unchanged_wrapper(self):
+        if not self.skip_unchanged:
+            return daily_run_func(self)
+        fingerprint = self.get_input_fingerprint()
+        if self.does_table_exist() and fingerprint == self.get_last_fingerprint():
+            log.info(
+                "Skip %s/%s, inputs unchanged since last run."
+                % (self.config["params"]["dest"], self.date)
+            )
+            return
+        daily_run_func(self)
+        self.save_fingerprint(fingerprint)
+
+    return skip_if_unchanged_wrapper
 
 
 class BqTask:
     """Base class for BigQuery ETL."""
 
     def __init__(
-        self, config: Dict, date: datetime.datetime, next_date: datetime = None
+        self,
+        config: Dict,
+        date: datetime.datetime,
+        next_date: datetime = None,
+        sample: int = None,
+        skip_unchanged: bool = False,
     ):
         self.config = config
         self.next_date = next_date
+        self.sample = sample
+        self.skip_unchanged = skip_unchanged
+        if sample:
+            # write sampled results to a separate dataset, never mix with full data
+            self.config = deepcopy(config)
+            # static inputs, e.g. `google_rps`, are only in the full dataset
+            self.config["params"]["src_dataset"] = config["params"]["dataset"]
+            self.config["params"]["dataset"] = get_sample_dataset(
+                config["params"]["dataset"], sample
+            )
         # assuming the latest date passed in is 0 day behind today
         self.date = (
             date
@@ -100,6 +160,107 @@ class BqTask:
         except NotFound:
             return False
 
+    def create_dataset(self):
+        dataset = bigquery.Dataset(
+            self.client.dataset(self.config["params"]["dataset"])
+        )
+        dataset.location = self.config["params"]["location"]
+        self.client.create_dataset(dataset, exists_ok=True)
+
+    def get_input_fingerprint(self) -> str:
+        assert False, "get_input_fingerprint not implemented."
+
+    def get_state_table(self) -> bigquery.TableReference:
+        table_ref = self.client.dataset(self.config["params"]["dataset"]).table(
+            TASK_STATE_TABLE
+        )
+        try:
+            self.client.get_table(table_ref)
+        except NotFound:
+            table = bigquery.Table(table_ref, schema=TASK_STATE_SCHEMA)
+            self.client.create_table(table, exists_ok=True)
+        return table_ref
+
+    def get_last_fingerprint(self) -> Optional[str]:
+        table_ref = self.get_state_table()
+        qstring = read_string("sql/select_task_state.sql").format(
+            project=table_ref.project,
+            dataset=table_ref.dataset_id,
+            table=table_ref.table_id,
+        )
+        job_config = bigquery.QueryJobConfig()
+        job_config.query_parameters = self.get_state_params()
+        rows = list(self.client.query(qstring, job_config=job_config).result())
+        return rows[0].fingerprint if rows else None
+
+    def save_fingerprint(self, fingerprint: str):
+        table_ref = self.get_state_table()
+        qstring = read_string("sql/insert_task_state.sql").format(
+            project=table_ref.project,
+            dataset=table_ref.dataset_id,
+            table=table_ref.table_id,
+        )
+        job_config = bigquery.QueryJobConfig()
+        job_config.query_parameters = self.get_state_params() + [
+            bigquery.ScalarQueryParameter("fingerprint", "STRING", fingerprint)
+        ]
+        self.client.query(qstring, job_config=job_config).result()
+
+    def get_state_params(self):
+        return [
+            bigquery.ScalarQueryParameter(
+                "dest", "STRING", self.config["params"]["dest"]
+            ),
+            bigquery.ScalarQueryParameter("run_date", "DATE", str(self.date)),
+        ]
+
+    def set_clustering(self, job_config):
+        if "cluster_fields" not in self.config:
+            return
+        # the partitioning spec of jobs should match the clustering of the table
+        job_config.clustering_fields = self.config["cluster_fields"]
+        self.update_clustering()
+
+    def update_clustering(self):
+        """Cluster the existing destination table by `cluster_fields` if it's not.
+
+        Only data written afterwards is clustered, existing data is
+        re-clustered by BigQuery in background.
+        """
+        dataset_ref = self.client.dataset(self.config["params"]["dataset"])
+        try:
+            table = self.client.get_table(
+                dataset_ref.table(self.config["params"]["dest"])
+            )
+        except NotFound:
+            return
+        if table.clustering_fields != self.config["cluster_fields"]:
+            table.clustering_fields = self.config["cluster_fields"]
+            self.client.update_table(table, ["clustering_fields"])
+            log.info(
+                "Clustered %s by %s"
+                % (table.table_id, ", ".join(self.config["cluster_fields"]))
+            )
+
+    def check_table_schema(self):
+        """Check the existing destination table against the config schema.
+
+        Loads with an explicit schema are rejected on field type mismatches,
+        e.g. appending to a table created by a query of another task.
+        """
+        dataset_ref = self.client.dataset(self.config["params"]["dataset"])
+        try:
+            table = self.client.get_table(
+                dataset_ref.table(self.config["params"]["dest"])
+            )
+        except NotFound:
+            return
+        errors = check_table_schema(table.schema, self.config["schema"])
+        assert len(errors) == 0, "%s doesn't match schema:\n%s" % (
+            self.config["params"]["dest"],
+            "\n".join(errors),
+        )
+
     def does_routine_exist(self, routine_id):
         try:
             dataset = self.client.dataset(self.config["params"]["dataset"])
@@ -195,24 +356,44 @@ class BqTask:
                 log.info("Done generic cleaning up.")
 
     def get_query_params(self, d):
-        return {**self.config["params"], "start_date": d}
+        sample_filter = ""
+        if self.sample and "sample_field" in self.config:
+            sample_filter = build_sample_filter(
+                self.config["sample_field"], self.sample
+            )
+        return {
+            "src_dataset": self.config["params"]["dataset"],
+            **self.config["params"],
+            "start_date": d,
+            "sample_filter": sample_filter,
+        }
 
 
 # https://cloud.google.com/bigquery/docs/loading-data-cloud-storage-json
 class BqGcsTask(BqTask):
     """BigQuery ETL via GCS."""
 
-    def __init__(self, config: Dict, date: datetime, next_date: datetime = None):
-        super().__init__(config, date, next_date)
+    def __init__(
+        self,
+        config: Dict,
+        date: datetime,
+        next_date: datetime = None,
+        sample: int = None,
+        skip_unchanged: bool = False,
+    ):
+        super().__init__(config, date, next_date, sample, skip_unchanged)
 
     def create_schema(self, check_exists=False):
         if check_exists and self.does_table_exist():
             return
-        # load a file to create schema
-        self.run_query(self.date, True)
+        # load a file to create schema, detect schema from the file if not specified
+        self.run_query(self.date, "schema" not in self.config)
 
     def daily_run(self):
         if self.does_table_exist():
+            if "merge_keys" in self.config:
+                self.run_merge(self.date)
+                return
             self.daily_cleanup(self.date)
             self.run_query(self.date)
             if self.is_write_append():  # and self.is_latest():
@@ -224,27 +405,76 @@ class BqGcsTask(BqTask):
         else:
             self.create_schema()
 
-    def run_query(self, date, autodetect=False):
+    def run_merge(self, date):
+        """Merge the diff file into the table instead of reloading the whole file.
+
+        The diff file (`diff_src`) of new or changed rows is loaded into
+        a table postfixed by `MERGE_DIFF_POSTFIX`, then merged by `merge_keys`,
+        the table is created from the whole file (`src`) when it doesn't exist.
+
+        :param date: the date of the files
+        """
+        self.run_query(date, diff=True)
+        keys = self.config["merge_keys"]
+        columns = [name for name, _ in self.config["schema"]]
+        qstring = read_string("sql/merge_generic.sql").format(
+            **self.config["params"],
+            diff=self.config["params"]["dest"] + MERGE_DIFF_POSTFIX,
+            # rows of partial trees have null keys, which are matched as well
+            merge_condition=" AND ".join(
+                "(T.{0} = S.{0} OR (T.{0} IS NULL AND S.{0} IS NULL))".format(key)
+                for key in keys
+            ),
+            update_columns=", ".join(
+                "{0} = S.{0}".format(column) for column in columns if column not in keys
+            ),
+            columns=", ".join(columns),
+            insert_values=", ".join("S.%s" % column for column in columns),
+        )
+        self.client.query(qstring).result()
+        self.client.delete_table(
+            "%s.%s.%s%s"
+            % (
+                self.config["params"]["project"],
+                self.config["params"]["dataset"],
+                self.config["params"]["dest"],
+                MERGE_DIFF_POSTFIX,
+            ),
+            not_found_ok=True,
+        )
+        log.info("Merged diff into table '{}'.".format(self.config["params"]["dest"]))
+
+    def run_query(self, date, autodetect=False, diff=False):
         dataset_ref = self.client.dataset(self.config["params"]["dataset"])
+        src = self.config["params"]["diff_src" if diff else "src"]
+        dest = self.config["params"]["dest"] + (MERGE_DIFF_POSTFIX if diff else "")
         job_config = bigquery.LoadJobConfig()
         job_config.write_disposition = (
             bigquery.WriteDisposition.WRITE_APPEND
-            if self.is_write_append()
+            if self.is_write_append() and not diff
             else bigquery.WriteDisposition.WRITE_TRUNCATE
         )
         # don't do autodetect after schema created, may have errors on STRING/INTEGER
         job_config.autodetect = autodetect
         job_config.source_format = FILETYPES[self.config["filetype"]]
+        if "schema" in self.config:
+            if not diff:
+                self.check_table_schema()
+            job_config.schema = get_bq_schema(self.config["schema"])
+            if self.config["filetype"] == "csv":
+                job_config.skip_leading_rows = 1
         if "partition_field" in self.config:
             job_config.time_partitioning = bigquery.TimePartitioning(
                 type_=bigquery.TimePartitioningType.DAY,
                 field=self.config["partition_field"],
             )
-        uri = "gs://%s" % self.config["params"]["src"].format(start_date=date)
+        if not diff:
+            self.set_clustering(job_config)
+        uri = "gs://%s" % src.format(start_date=date)
 
         load_job = self.client.load_table_from_uri(
             uri,
-            dataset_ref.table(self.config["params"]["dest"]),
+            dataset_ref.table(dest),
             location=self.config["params"]["location"],
             job_config=job_config,
         )
@@ -260,9 +490,7 @@ class BqGcsTask(BqTask):
 
         log.info("Job finished.")
 
-        destination_table = self.client.get_table(
-            dataset_ref.table(self.config["params"]["dest"])
-        )
+        destination_table = self.client.get_table(dataset_ref.table(dest))
         log.info("Loaded {} rows.".format(destination_table.num_rows))
 
 
@@ -271,8 +499,15 @@ class BqGcsTask(BqTask):
 class BqQueryTask(BqTask):
     """BigQuery ETL via query result."""
 
-    def __init__(self, config: Dict, date: datetime, next_date: datetime = None):
-        super().__init__(config, date, next_date)
+    def __init__(
+        self,
+        config: Dict,
+        date: datetime,
+        next_date: datetime = None,
+        sample: int = None,
+        skip_unchanged: bool = False,
+    ):
+        super().__init__(config, date, next_date, sample, skip_unchanged)
 
     def create_schema(self, check_exists=False):
         super().create_schema(check_exists)
@@ -296,6 +531,7 @@ class BqQueryTask(BqTask):
                 qstring += " LIMIT 0"
             self.run_query(start_date, qstring)
 
+    @skip_if_unchanged
     def daily_run(self):
         if self.does_table_exist():
             super().create_schema(False)
@@ -312,11 +548,75 @@ class BqQueryTask(BqTask):
             self.daily_cleanup(self.date)
             self.run_query(self.date)
 
+    def get_query_string(self, date):
+        qstring = read_string("sql/{}.sql".format(self.config["query"]))
+        qparams = self.get_query_params(date)
+        return qstring.format(**qparams)
+
+    def get_input_fingerprint(self) -> str:
+        """Get the fingerprint of source partitions read for the run date.
+
+        Input tables are resolved by a dry run, so views are expanded to the
+        tables they read. The destination is excluded, since appending tasks
+        could read their own table. Partitions are listed by
+        `INFORMATION_SCHEMA.PARTITIONS`: sources outside of the task dataset
+        (e.g. telemetry sources) by the run date partition, tables in the
+        dataset by partitions up to the run date since they could be read
+        over a period of dates. Non-partitioned tables are checked as a whole.
+        The rendered query and the task config are fingerprinted as well,
+        so fixes of queries or configs are rerun.
+
+        :rtype: str
+        :return: the partition count, row count and last modified time of each input
+        """
+        qstring = self.get_query_string(self.date)
+        job_config = bigquery.QueryJobConfig()
+        job_config.dry_run = True
+        job_config.use_query_cache = False
+        query = self.client.query(qstring, job_config=job_config)
+        params = self.config["params"]
+        inputs = {}
+        for table_ref in query.referenced_tables:
+            dataset = (table_ref.project, table_ref.dataset_id)
+            if dataset == (params["project"], params["dataset"]) and (
+                table_ref.table_id == params["dest"]
+            ):
+                continue
+            if dataset not in inputs:
+                inputs[dataset] = []
+            inputs[dataset] += [table_ref.table_id]
+        run_partition = str(self.date).replace("-", "")
+        fingerprint = {
+            "query": get_request_fingerprint(
+                qstring + json.dumps(self.config, sort_keys=True, default=str)
+            )
+        }
+        for (project, dataset), tables in sorted(inputs.items()):
+            in_dataset = (project, dataset) == (params["project"], params["dataset"])
+            qstring = read_string("sql/select_partitions.sql").format(
+                project=project, dataset=dataset
+            )
+            job_config = bigquery.QueryJobConfig()
+            job_config.query_parameters = [
+                bigquery.ArrayQueryParameter("tables", "STRING", tables),
+                bigquery.ScalarQueryParameter(
+                    "start_partition", "STRING", "" if in_dataset else run_partition
+                ),
+                bigquery.ScalarQueryParameter("end_partition", "STRING", run_partition),
+            ]
+            for row in self.client.query(qstring, job_config=job_config).result():
+                fingerprint["%s.%s.%s" % (project, dataset, row.table_name)] = [
+                    row.partitions,
+                    row.total_rows,
+                    row.last_modified_time.isoformat()
+                    if row.last_modified_time
+                    else None,
+                ]
+        return json.dumps(fingerprint, sort_keys=True)
+
     def run_query(self, date, qstring=None):
         if qstring is None:
-            qstring = read_string("sql/{}.sql".format(self.config["query"]))
-            qparams = self.get_query_params(date)
-            qstring = qstring.format(**qparams)
+            qstring = self.get_query_string(date)
         table_ref = self.client.dataset(self.config["params"]["dataset"]).table(
             self.config["params"]["dest"]
         )
@@ -339,6 +639,7 @@ class BqQueryTask(BqTask):
                 type_=bigquery.TimePartitioningType.DAY,
                 field=self.config["partition_field"],
             )
+        self.set_clustering(job_config)
 
         query = self.client.query(qstring, job_config=job_config)
         query.result()
@@ -352,9 +653,14 @@ class BqViewTask(BqTask):
     """BigQuery ETL via view."""
 
     def __init__(
-        self, config: Dict, date: datetime.datetime, next_date: datetime = None
+        self,
+        config: Dict,
+        date: datetime.datetime,
+        next_date: datetime = None,
+        sample: int = None,
+        skip_unchanged: bool = False,
     ):
-        super().__init__(config, date, next_date)
+        super().__init__(config, date, next_date, sample, skip_unchanged)
 
     def create_schema(self, check_exists=False):
         super().create_schema(check_exists)
@@ -367,14 +673,84 @@ class BqViewTask(BqTask):
         self.create_schema()
 
 
-def get_task(config: Dict, date: datetime.datetime, next_date: datetime = None):
+def get_sample_dataset(dataset: str, sample: int) -> str:
+    """Get the dataset name for a sampled run.
+
+    >>> get_sample_dataset("mango_prod", 1)
+    'mango_prod_sample1'
+    """
+    return "%s_sample%d" % (dataset, sample)
+
+
+def get_task_configs(configs: Optional[Callable]) -> Dict[str, Dict]:
+    return {
+        key: value
+        for key, value in configs.__dict__.items()
+        if not key.startswith("_") and isinstance(value, dict) and "type" in value
+    }
+
+
+def suggest_cluster_fields(
+    configs: Optional[Callable],
+    dest: str,
+    columns: List[str] = None,
+    max_fields: int = 4,
+) -> List[str]:
+    """Suggest cluster fields for a table based on its downstream queries.
+
+    Columns used to filter, join, group or partition in the queries reading the
+    table (directly or through views) are ranked by occurrences.
+
+    :param configs: the BigQuery config module, see `configs/bigquery.py`
+    :param dest: the name of the table to suggest cluster fields for
+    :param columns: columns of the table, to exclude columns from other sources
+    :param max_fields: the max number of cluster fields, BigQuery allows up to 4
+    :return: the suggested cluster fields
+    """
+    cfgs = get_task_configs(configs)
+    partition_fields = [
+        cfg["partition_field"]
+        for cfg in cfgs.values()
+        if "partition_field" in cfg and cfg["params"]["dest"] == dest
+    ]
+    counts = Counter()
+    sources = [dest]
+    visited = set()
+    while sources:
+        src = sources.pop()
+        visited.add(src)
+        for cfg in cfgs.values():
+            if "query" not in cfg or src not in [
+                v for k, v in cfg["params"].items() if k.startswith("src")
+            ]:
+                continue
+            counts += get_filter_columns(read_string("sql/%s.sql" % cfg["query"]))
+            # filters on views are pushed down to the tables they read
+            if cfg["type"] == "view" and cfg["params"]["dest"] not in visited:
+                sources += [cfg["params"]["dest"]]
+    suggested = [
+        column
+        for column, _ in counts.most_common()
+        if column not in partition_fields
+        and (columns is None or column in columns)
+    ]
+    return suggested[:max_fields]
+
+
+def get_task(
+    config: Dict,
+    date: datetime.datetime,
+    next_date: datetime = None,
+    sample: int = None,
+    skip_unchanged: bool = False,
+):
     assert "type" in config, "Task type is required in BigQuery config."
     if config["type"] == "gcs":
-        return BqGcsTask(config, date, next_date)
+        return BqGcsTask(config, date, next_date, sample)
     elif config["type"] == "view":
-        return BqViewTask(config, date, next_date)
+        return BqViewTask(config, date, next_date, sample)
     elif config["type"] == "table":
-        return BqQueryTask(config, date, next_date)
+        return BqQueryTask(config, date, next_date, sample, skip_unchanged)
 
 
 def main(args: Namespace):
@@ -396,7 +772,11 @@ def main(args: Namespace):
     if args.subtask:
         log.info("Running BigQuery Task %s." % args.subtask)
         cfg = getattr(cfgs, args.subtask.upper())
-        task = get_task(cfg, args.date, next_date)
+        task = get_task(
+            cfg, args.date, next_date, args.sample, args.skip_unchanged
+        )
+        if args.sample:
+            task.create_dataset()
         if args.dropschema:
             task.drop_schema()
         if args.createschema:
@@ -404,7 +784,7 @@ def main(args: Namespace):
         task.daily_run()
         log.info("BigQuery Task %s Finished." % args.subtask)
     else:
-        daily_run(args.date, cfgs, next_date)
+        daily_run(args.date, cfgs, next_date, args.sample, args.skip_unchanged)
         # backfill("2019-09-01", "2019-10-17", cfgs)
 
 
@@ -413,32 +793,41 @@ def backfill(start, end, configs: Optional[Callable]):
         daily_run(d, configs)
 
 
-def daily_run(d: datetime, configs: Optional[Callable], next_date: datetime = None):
+def daily_run(
+    d: datetime,
+    configs: Optional[Callable],
+    next_date: datetime = None,
+    sample: int = None,
+    skip_unchanged: bool = False,
+):
     print(d)
-    core = get_task(configs.MANGO_CORE, d, next_date)
-    core_normalized = get_task(configs.MANGO_CORE_NORMALIZED, d, next_date)
-    events = get_task(configs.MANGO_EVENTS, d, next_date)
-    unnested_events = get_task(configs.MANGO_EVENTS_UNNESTED, d, next_date)
-    feature_events = get_task(configs.MANGO_EVENTS_FEATURE_MAPPING, d, next_date)
-    channel_mapping = get_task(configs.MANGO_CHANNEL_MAPPING, d, next_date)
-    user_channels = get_task(configs.MANGO_USER_CHANNELS, d, next_date)
-    feature_cohort_date = get_task(configs.MANGO_FEATURE_COHORT_DATE, d, next_date)
-    user_rfe_partial = get_task(configs.MANGO_USER_RFE_PARTIAL, d, next_date)
-    user_rfe_session = get_task(configs.MANGO_USER_RFE_SESSION, d, next_date)
-    user_rfe = get_task(configs.MANGO_USER_RFE, d, next_date)
-    # user_occurrence = get_task(configs.MANGO_USER_OCCURRENCE, d, next_date)
-    user_feature_occurrence = get_task(
-        configs.MANGO_USER_FEATURE_OCCURRENCE, d, next_date
-    )
-    cohort_user_occurrence = get_task(
-        configs.MANGO_COHORT_USER_OCCURRENCE, d, next_date
-    )
-    cohort_retained_users = get_task(configs.MANGO_COHORT_RETAINED_USERS, d, next_date)
-    user_count = get_task(configs.MANGO_ACTIVE_USER_COUNT, d, next_date)
-    feature_roi = get_task(configs.MANGO_FEATURE_ROI, d, next_date)
-    revenue_google = get_task(configs.MANGO_REVENUE_GOOGLE, d, next_date)
-    # revenue_bukalapak = get_task(configs.MANGO_REVENUE_BUKALAPAK, d, next_date)
+
+    def get_daily_task(config: Dict):
+        return get_task(config, d, next_date, sample, skip_unchanged)
+
+    core = get_daily_task(configs.MANGO_CORE)
+    core_normalized = get_daily_task(configs.MANGO_CORE_NORMALIZED)
+    events = get_daily_task(configs.MANGO_EVENTS)
+    unnested_events = get_daily_task(configs.MANGO_EVENTS_UNNESTED)
+    feature_events = get_daily_task(configs.MANGO_EVENTS_FEATURE_MAPPING)
+    channel_mapping = get_daily_task(configs.MANGO_CHANNEL_MAPPING)
+    user_channels = get_daily_task(configs.MANGO_USER_CHANNELS)
+    feature_cohort_date = get_daily_task(configs.MANGO_FEATURE_COHORT_DATE)
+    user_rfe_partial = get_daily_task(configs.MANGO_USER_RFE_PARTIAL)
+    user_rfe_session = get_daily_task(configs.MANGO_USER_RFE_SESSION)
+    user_rfe = get_daily_task(configs.MANGO_USER_RFE)
+    # user_occurrence = get_daily_task(configs.MANGO_USER_OCCURRENCE)
+    user_feature_occurrence = get_daily_task(configs.MANGO_USER_FEATURE_OCCURRENCE)
+    cohort_user_occurrence = get_daily_task(configs.MANGO_COHORT_USER_OCCURRENCE)
+    cohort_retained_users = get_daily_task(configs.MANGO_COHORT_RETAINED_USERS)
+    user_count = get_daily_task(configs.MANGO_ACTIVE_USER_COUNT)
+    feature_roi = get_daily_task(configs.MANGO_FEATURE_ROI)
+    revenue_google = get_daily_task(configs.MANGO_REVENUE_GOOGLE)
+    # revenue_bukalapak = get_daily_task(configs.MANGO_REVENUE_BUKALAPAK)
     # google_rps = get_task(configs.GOOGLE_RPS, datetime.datetime(2018, 1, 1), next_date)
+    if sample:
+        log.info("Running sampled BigQuery DAG on %d%% of clients." % sample)
+        core.create_dataset()
     core.daily_run()
     core_normalized.daily_run()
     events.daily_run()
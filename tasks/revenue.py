@@ -3,12 +3,11 @@ from argparse import Namespace
 from typing import Dict, Any, List, Tuple
 import pandas as pd
 import datetime
-import pandasql as ps
 from pandas import DataFrame
 import utils.config
 from tasks import base
 import numpy as np
-from utils.marshalling import get_country_tz_str, lookback_dates
+from utils.marshalling import lookback_dates, map_country_tz_str, upsert
 import logging
 
 log = logging.getLogger(__name__)
@@ -99,7 +98,7 @@ class RevenueEtlTask(base.EtlTask):
             d["Country.name"] = [
                 "ID" if x == "Indonesia" else "" for x in d["Country.name"]
             ]
-            d["tz"] = d["Country.name"].apply(lambda x: get_country_tz_str(x))
+            d["tz"] = map_country_tz_str(d["Country.name"])
             d = d[map_cols]
             log.info(">>> Done data preparation...")
             return d
@@ -143,29 +142,6 @@ class RevenueEtlTask(base.EtlTask):
             ), f">>> From {source}, values in column [ {not_null} ] should not be N/A."
             log.info(">>> Pass checking invalid null value...")
 
-        # which to update (update & insert)
-        def do_updates_inserts():
-            new = new_df
-            new["dt"] = self.current_date.date()
-            old = last_df.copy()
-            old["dt"] = self.current_date.date() - datetime.timedelta(days=1)
-            comb = old.append(new)  # noqa: F841
-            q = """
-                SELECT source, max(`Stat.datetime`) as updated_key
-                FROM comb
-            """
-
-            to_update = ps.sqldf(q)  # noqa: F841
-            q = """
-                SELECT comb.*
-                FROM comb left join to_update
-                on comb.source = to_update.source
-                and comb.`Stat.datetime` = to_update.updated_key
-            """
-            do_update = ps.sqldf(q).drop(columns="dt")
-            log.info(">>> Done updates and inserts...")
-            return do_update
-
         # extract new & old data
         new_df = data_prep(bukalapak)
         last_df = bukalapak_base
@@ -188,7 +164,9 @@ class RevenueEtlTask(base.EtlTask):
             log.info("init first batch")
 
         else:
-            df = do_updates_inserts()
+            # conversions of mutable days are updated in the new batch
+            df = upsert(last_df, new_df, ["source", "Stat.datetime"])
+            log.info(">>> Done updates and inserts...")
             df["Stat.date"] = df["Stat.datetime"]
             df.columns = revenue_df.columns
             df = revenue_df.append(df, ignore_index=True).drop_duplicates()
@@ -199,7 +177,7 @@ class RevenueEtlTask(base.EtlTask):
         # reformat data types
         df["utc_datetime"] = df["utc_datetime"].astype("datetime64[ns]")
         df["utc_date"] = df["utc_date"].astype("datetime64[ns]")
-        df["tz"] = df["country"].apply(lambda x: get_country_tz_str(x))
+        df["tz"] = map_country_tz_str(df["country"])
         df["sales_amount"] = df["sales_amount"].astype("float")
         df["payout"] = df["payout"].astype("float")
 
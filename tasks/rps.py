@@ -5,12 +5,11 @@ from typing import Dict, Any, List, Tuple
 from pandas import DataFrame
 import utils.config
 from tasks import base
-import pycountry
 import pandas as pd
 import numpy as np
 import logging
 
-from utils.marshalling import lookfoward_dates
+from utils.marshalling import lookfoward_dates, map_country_3_to_2, stack_frames
 
 log = logging.getLogger(__name__)
 
@@ -77,35 +76,31 @@ class RpsEtlTask(base.EtlTask):
 
         :param google_search_rps: extracted source DataFrame w/t global search volume
         :param global_package: extracted source DataFrame w/t total package number
-        :param fb_index: extracted source DataFrame for cost index reference
+        :param fb_index: extracted source DataFrame for cost index reference,
+            stacked by iterators (verticals)
         :param fb_index_latest: extracted source DataFrame for cost index reference
         :param cb_index: extracted source DataFrame for cost index reference
         :rtype: DataFrame
         :return: the transformed DataFrame
         """
         # shared functions to map/transform data
-        def map_country_3_to_2(alpha_3):
-            c = pycountry.countries.get(alpha_3=alpha_3)
-            if c:
-                return c.alpha_2
-            return None
+        iterators = [str(it) for it in self.sources["fb_index"]["iterator"]]
 
         def transform_fb_idx(idx):
-            assert len(idx.index) > 200, "Too few rows in FB index"
-            country_2 = idx["country_code"].apply(map_country_3_to_2)
-            idx["country"] = country_2
-            return idx.drop_duplicates("country").set_index("country")
-
-        def avg_idx(idxmap, col):
-            cost_idx = None
-            for i, idx in idxmap.items():
-                cidx = transform_fb_idx(idx)
-                if None is cost_idx:
-                    cost_idx = cidx[col].astype(float)
-                else:
-                    cost_idx += cidx[col].astype(float)
-            cost_idx /= len(idxmap)
-            return cost_idx
+            if isinstance(idx, dict):
+                idx = stack_frames(idx, "iterator")
+            # iterators without rows are dropped by stacking
+            sizes = idx.groupby(idx["iterator"].astype(str)).size()
+            sizes = sizes.reindex(iterators, fill_value=0)
+            assert (sizes > 200).all(), "Too few rows in FB index"
+            idx["country"] = map_country_3_to_2(idx["country_code"])
+            return idx.drop_duplicates(["iterator", "country"])
+
+        def avg_idx(idx, col):
+            idx = transform_fb_idx(idx)
+            # average of countries indexed with values by all iterators only
+            cost_idx = idx[col].astype(float).groupby(idx["country"])
+            return cost_idx.sum(min_count=len(iterators)) / len(iterators)
 
         def transform_cb_idx(idx):
             # 2017 mobile market share
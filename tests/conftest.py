@@ -1,6 +1,7 @@
 """Shared pytest fixtures."""
 import builtins
 import logging
+from typing import Iterator
 
 import pandas_gbq
 import pytest
@@ -79,6 +80,12 @@ def mock_requests(monkeypatch):
         def text(self) -> str:
             return self._content
 
+        def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+            content = self._content.encode("utf-8")
+            for start in range(0, len(content), chunk_size):
+                end = start + chunk_size
+                yield content[start:end]
+
     class MockRequest:
         def __init__(self):
             self.urls = {}
@@ -140,7 +147,10 @@ def mock_pdbq(monkeypatch):
 
 @pytest.fixture
 def mock_bigquery(monkeypatch):
-    """Mock google-cloud-bigquery object."""
+    """Mock google-cloud-bigquery object, recorded calls are reset per test."""
+    for attr in ["loads", "queries", "deleted", "updated"]:
+        monkeypatch.setattr(MockBigqueryClient, attr, [])
+    monkeypatch.setattr(MockBigqueryClient, "tables", {})
     monkeypatch.setattr(bigquery, "Client", MockBigqueryClient)
 
 
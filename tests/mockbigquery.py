@@ -1,5 +1,7 @@
 """Mock Bigquery."""
 import logging
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
 from pandas import DataFrame
 
 log = logging.getLogger(__name__)
@@ -8,14 +10,55 @@ log = logging.getLogger(__name__)
 class MockBigqueryClient:
     """Mock Object Class for bigquery client."""
 
+    loads = []
+    queries = []
+    deleted = []
+    updated = []
+    tables = {}
+
+    def __init__(self, project=None, *args, **kwargs):
+        """Init."""
+        self.project = project if project else "project"
+
+    def dataset(self, dataset_id):
+        """Get dataset reference."""
+        return bigquery.DatasetReference(self.project, dataset_id)
+
     def query(self, query, **kwargs):
         """Query."""
+        MockBigqueryClient.queries += [query]
+        return MockBigqueryJobQueryJob()
+
+    def get_table(self, table):
+        """Get table by reference or id."""
+        table_id = table if isinstance(table, str) else table.table_id
+        if table_id not in MockBigqueryClient.tables:
+            raise NotFound(table_id)
+        return MockBigqueryClient.tables[table_id]
+
+    def update_table(self, table, fields, **kwargs):
+        """Update table."""
+        MockBigqueryClient.updated += [(table.table_id, fields)]
+        return table
+
+    def delete_table(self, table, **kwargs):
+        """Delete table."""
+        MockBigqueryClient.deleted += [table]
+
+    def load_table_from_dataframe(self, dataframe, destination, **kwargs):
+        """Load table from DataFrame."""
+        log.debug("MockBigqueryClient.load_table_from_dataframe(%s)" % destination)
+        MockBigqueryClient.loads += [(destination, dataframe, kwargs)]
         return MockBigqueryJobQueryJob()
 
 
 class MockBigqueryJobQueryJob:
     """Mock Object Class for bigquery query job."""
 
+    def result(self):
+        """Wait for the job to complete."""
+        return []
+
     def to_dataframe(self, query, **kwargs):
         """Convert to pandas dataframe."""
         return DataFrame()
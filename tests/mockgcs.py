@@ -46,9 +46,12 @@ class MockStorageClient:
         MockStorageClient._bucket[name] = MockBucket(name)
         return MockStorageClient._bucket[name]
 
-    def list_blobs(self, bucket: str):
+    def list_blobs(self, bucket: str, prefix: str = None):
         """List blobs."""
-        return self.get_bucket(bucket).list_blobs()
+        blobs = self.get_bucket(bucket).list_blobs()
+        if prefix is None:
+            return blobs
+        return MockHTTPIterator([b for b in blobs if b.name.startswith(prefix)])
 
 
 class MockBlob:
@@ -59,6 +62,7 @@ class MockBlob:
         self._name = name
         self._bucket = bucket
         self.content = None
+        self.content_encoding = None
 
     @property
     def name(self):
@@ -68,12 +72,27 @@ class MockBlob:
     def upload_from_filename(self, filename):
         """Upload this blob's contents from the content of a named file."""
         log.debug("mock_blob.upload_from_filename(%s)" % filename)
-        self.content = utils.file.read_string(filename)
+        # keep the bytes as stored, compressed by Content-Encoding
+        self.content = utils.file.compress(
+            utils.file.read_string(filename).encode("utf-8"), self.content_encoding
+        )
         self._bucket._add_file(self.name, self)
 
+    def upload_from_string(self, data):
+        """Upload contents of this blob from the provided string."""
+        log.debug("mock_blob.upload_from_string()")
+        self.content = data.encode("utf-8") if isinstance(data, str) else data
+        self._bucket._add_file(self.name, self)
+
+    def download_as_string(self):
+        """Download the contents of this blob as a bytes object."""
+        log.debug("mock_blob.download_as_string()")
+        return self.content
+
     def download_to_filename(self, filename):
         """Download the contents of this blob into a named file."""
-        utils.file.write_string(filename, self.content)
+        # decompressed by Content-Encoding as GCS decompressive transcoding
+        utils.file.write_string(filename, utils.file.decode_string(self.content))
         log.debug("mock_blob.download_to_filename(%s)" % filename)
 
 
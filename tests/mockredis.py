@@ -0,0 +1,49 @@
+"""Mock Redis."""
+
+import fnmatch
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+class MockRedis:
+    """MockRedis, a local stand-in of redis.Redis for cache tests."""
+
+    def __init__(self):
+        """Init."""
+        self._store = {}
+
+    def _alive(self, name: str) -> bool:
+        if name not in self._store:
+            return False
+        expire_at = self._store[name][1]
+        if expire_at is not None and time.time() > expire_at:
+            del self._store[name]
+            return False
+        return True
+
+    def get(self, name: str):
+        """Get value as bytes."""
+        log.debug("mock_redis.get(%s)" % name)
+        return self._store[name][0] if self._alive(name) else None
+
+    def set(self, name: str, value: str, ex: int = None):
+        """Set value with optional expiry in seconds."""
+        log.debug("mock_redis.set(%s)" % name)
+        expire_at = None if ex is None else time.time() + ex
+        self._store[name] = (value.encode("utf-8"), expire_at)
+
+    def exists(self, name: str) -> int:
+        """Count existing keys."""
+        return 1 if self._alive(name) else 0
+
+    def delete(self, name: str) -> int:
+        """Delete key."""
+        return 1 if self._store.pop(name, None) is not None else 0
+
+    def scan_iter(self, match: str = "*"):
+        """Iterate keys matching a glob-style pattern as bytes."""
+        for name in list(self._store):
+            if self._alive(name) and fnmatch.fnmatchcase(name, match):
+                yield name.encode("utf-8")
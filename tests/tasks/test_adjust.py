@@ -54,8 +54,10 @@ def test_adjust_extract(load_assets):
 
 
 @pytest.mark.unittest
-def test_adjust(load_assets, mock_gcs):
+def test_adjust(load_assets, mock_gcs, monkeypatch, tmp_path):
     arg_parser = utils.config.get_arg_parser()
+    # write staging files to the temp folder instead of the configured ./data/
+    monkeypatch.setitem(cfg.DESTINATIONS["fs"], "prefix", str(tmp_path) + "/")
 
     gcs = storage.Client()
     log.debug("bucket: %s" % cfg.DESTINATIONS["gcs"]["bucket"])
@@ -73,3 +75,16 @@ def test_adjust(load_assets, mock_gcs):
 
         # TODO: check filename
         assert len([item for item in bucket.list_blobs()]) == idx + 1
+
+
+@pytest.mark.unittest
+def test_adjust_no_bq_destination(mock_gcs):
+    # mango_channel_mapping is merged from GCS by the BigQuery task only
+    for config_name in ["", "debug", "staging", "test"]:
+        assert "bq" not in utils.config.get_configs(task, config_name).DESTINATIONS
+    args = Namespace(
+        date=datetime.datetime(2019, 9, 26, 0, 0), period=30, rm=False, source=None
+    )
+    adjust = tasks.adjust.AdjustEtlTask(args, cfg.SOURCES, cfg.SCHEMA, cfg.DESTINATIONS)
+    with pytest.raises(AssertionError, match="No bq destination"):
+        adjust.load_to_bq("adjust_trackers", cfg.SOURCES["adjust_trackers"])
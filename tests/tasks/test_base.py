@@ -0,0 +1,188 @@
+import datetime
+import json
+from argparse import Namespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas import DataFrame
+
+from tasks.base import EtlTask
+from utils.file import RawFile
+from tests.utils import assert_not_mutated
+
+
+def _get_transform_test_task(tmp_path) -> EtlTask:
+    args = Namespace(
+        date=datetime.datetime(2019, 9, 8, 0, 0), period=1, rm=False, source=None
+    )
+    sources = {
+        "numbers": {"type": "const", "values": {"a": [1, 2, 3]}, "load": True},
+        "iterated": {"type": "const", "values": {}},
+    }
+    destinations = {"fs": {"prefix": str(tmp_path) + "/"}}
+    task = EtlTask(args, sources, [("a", np.int64)], destinations, "staging", "test")
+    task.extracted["numbers"] = DataFrame({"a": [1, 2, 3]})
+    task.extracted["iterated"] = {
+        "1": DataFrame({"b": [1.0, 2.0]}),
+        "2": DataFrame({"c": pd.Categorical(["x", "y"])}),
+    }
+    return task
+
+
+@pytest.mark.unittest
+def test_transform_views(mock_gcs, tmp_path):
+    task = _get_transform_test_task(tmp_path)
+    extracted = task.extracted
+    called = []
+
+    def transform_numbers(numbers, iterated):
+        called.append(True)
+        # arguments share the extracted data without copying
+        assert np.shares_memory(numbers["a"].values, extracted["numbers"]["a"].values)
+        b = iterated["1"]["b"].values
+        assert np.shares_memory(b, extracted["iterated"]["1"]["b"].values)
+        # axes are copied
+        numbers.index.name = "i"
+        iterated["2"].columns.name = "c"
+        numbers["b"] = numbers["a"] * 2
+        return numbers.loc[numbers["a"] > 1, ["b"]].rename(columns={"b": "a"})
+
+    task.transform_numbers = transform_numbers
+    with assert_not_mutated(task.extracted):
+        task.transform()
+    assert called == [True]
+    assert task.transformed["numbers"]["a"].tolist() == [4, 6]
+    assert "b" not in extracted["numbers"]
+    assert extracted["numbers"].index.name is None
+    assert extracted["iterated"]["2"].columns.name is None
+
+
+@pytest.mark.unittest
+def test_transform_mutating(mock_gcs, tmp_path):
+    task = _get_transform_test_task(tmp_path)
+    called = []
+
+    def transform_numbers(numbers, iterated):
+        called.append(True)
+        # mutate every argument in place
+        iterated["1"].iloc[0, 0] = 5.0
+        numbers.loc[0, "a"] = 10
+        iterated["1"]["c"] = 1
+        return numbers
+
+    task.transform_numbers = transform_numbers
+    with pytest.raises(AssertionError, match="transform_numbers writes"):
+        task.transform()
+
+    # transforms writing in place get copies
+    task = _get_transform_test_task(tmp_path)
+    task.sources["numbers"]["transform_copy"] = True
+    called.clear()
+    task.transform_numbers = transform_numbers
+    with assert_not_mutated(task.extracted):
+        task.transform()
+    assert called == [True]
+    assert task.transformed["numbers"]["a"].tolist() == [10, 2, 3]
+
+    with pytest.raises(AssertionError, match="numbers"):
+        with assert_not_mutated(task.extracted):
+            task.extracted["numbers"].loc[0, "a"] = 10
+
+
+@pytest.mark.unittest
+def test_extract_stack_iterators(mock_gcs, tmp_path):
+    args = Namespace(
+        date=datetime.datetime(2018, 1, 1, 0, 0), period=1, rm=False, source=None
+    )
+    paths = [
+        "test-data/raw-rps-fb_index/2018-01-01.%d.json" % i for i in range(1, 4)
+    ]
+    config = {"type": "api", "iterator": range(1, 4), "paths": paths}
+    destinations = {"fs": {"prefix": str(tmp_path) + "/"}}
+    task = EtlTask(args, {}, [], destinations, "staging", "test")
+    extracted = task.extract_via_fs("fb_index", config)
+    config["stack_iterators"] = True
+    stacked = task.extract_via_fs("fb_index", config)
+    assert stacked["iterator"].unique().tolist() == ["1", "2", "3"]
+    for it, df in extracted.items():
+        iterated = stacked[stacked["iterator"] == it].drop(columns="iterator")
+        assert iterated.reset_index(drop=True).equals(df)
+
+
+@pytest.mark.unittest
+def test_extract_via_api_stream(mock_gcs, mock_requests, tmp_path):
+    args = Namespace(
+        date=datetime.datetime(2019, 9, 26, 0, 0),
+        period=1,
+        rm=False,
+        source=None,
+        dest="fs",
+    )
+    url = "https://api.adjust.com/trackers"
+    with open("test-data/raw-adjust-adjust_trackers/2019-09-26.json", "r") as f:
+        mock_requests.setContent(url, f.read())
+    config = {
+        "type": "api",
+        "url": url,
+        "api_key": "",
+        "date_format": "%Y-%m-%d",
+        "json_path_nested": ["result_set.networks", "campaigns", "adgroups"],
+        "fields": ["name", "token"],
+    }
+    extracted = {}
+    for stream in [False, True]:
+        config["stream"] = stream
+        # separate caches, so both are requested
+        destinations = {"fs": {"prefix": "%s/%s/" % (tmp_path, stream)}}
+        task = EtlTask(args, {}, [], destinations, "staging", "test")
+        extracted[stream] = task.extract_via_api("adjust_trackers", config)
+        assert task.raw["adjust_trackers"].read() == mock_requests.urls[url]
+    assert not extracted[True].empty
+    assert extracted[True].equals(extracted[False])
+
+
+@pytest.mark.unittest
+def test_convert_latest_diff_file(mock_gcs, tmp_path):
+    args = Namespace(
+        date=datetime.datetime(2019, 9, 27, 0, 0), period=1, rm=False, source=None
+    )
+    schema = [
+        ("token", np.dtype(object).type),
+        ("name", np.dtype(object).type),
+        ("execution_date", np.datetime64),
+    ]
+    config = {"type": "api", "write_latest": True, "latest_diff": True}
+    destinations = {
+        "fs": {
+            "prefix": str(tmp_path) + "/",
+            "file_format": "jsonl",
+            "date_field": "execution_date",
+            "file_compression": "gzip",
+        }
+    }
+    task = EtlTask(args, {}, schema, destinations, "staging", "test")
+    frames = {
+        "2019-09-26": DataFrame({"token": ["001", "002", None], "name": list("abn")}),
+        "2019-09-27": DataFrame(
+            {"token": ["001", "002", None, "003"], "name": list("ab2nc")[1:]}
+        ),
+    }
+    diffs = []
+    for date, df in frames.items():
+        df["execution_date"] = date
+        task.convert_file(df, config, "trackers", "staging", pd.Timestamp(date))
+        task.convert_latest_file(config, "trackers", "staging")
+        fpath = task.get_latest_filepath(
+            "trackers", config, "staging", "fs", "latest_diff"
+        )
+        diffs += [RawFile(fpath).read().splitlines()]
+    assert len(diffs[0]) == 3
+    assert [json.loads(line) for line in diffs[1]] == [
+        {"token": "001", "name": "b", "execution_date": "2019-09-27"},
+        {"token": "002", "name": "2", "execution_date": "2019-09-27"},
+        {"token": "003", "name": "c", "execution_date": "2019-09-27"},
+    ]
+    # a rerun of the latest date is diffed against the previous date again
+    task.convert_latest_file(config, "trackers", "staging")
+    assert RawFile(fpath).read().splitlines() == diffs[1]
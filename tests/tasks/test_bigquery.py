@@ -1,11 +1,16 @@
 import datetime
+import json
 import logging
+import re
+from argparse import Namespace
 
 import pytest
 from google.cloud import bigquery
 
 import tasks.bigquery
 import utils.config
+from tests.mockbigquery import MockBigqueryClient
+from utils.file import read_string
 
 log = logging.getLogger(__name__)
 
@@ -224,3 +229,220 @@ def test_next_execution_date(client, to_delete):
     )
 
     # TODO: test parameter parsing for next_execution_date
+
+
+@pytest.mark.unittest
+def test_sample_query_params(mock_bigquery):
+    MANGO_EVENTS = utils.config.get_configs("bigquery", "test").MANGO_EVENTS
+    date = datetime.datetime(2019, 9, 26)
+
+    task = tasks.bigquery.get_task(MANGO_EVENTS, date)
+    qparams = task.get_query_params(task.date)
+    assert qparams["dataset"] == qparams["src_dataset"] == "test"
+    assert qparams["sample_filter"] == ""
+
+    task = tasks.bigquery.get_task(MANGO_EVENTS, date, sample=1)
+    qparams = task.get_query_params(task.date)
+    # sampled runs write to a suffixed dataset without touching the shared config
+    assert qparams["dataset"] == "test_sample1"
+    assert qparams["src_dataset"] == "test"
+    assert MANGO_EVENTS["params"]["dataset"] == "test"
+    assert qparams["sample_filter"] == "AND SAFE_CAST(sample_id AS INT64) < 1"
+    qstring = read_string("sql/mango_events.sql").format(**qparams)
+    assert qparams["sample_filter"] in qstring
+
+
+@pytest.mark.unittest
+def test_sample_daily_run(mock_bigquery, monkeypatch):
+    cfgs = utils.config.get_configs("bigquery", "")
+    dataset = cfgs.BQ_PROJECT["dataset"]
+    sample_dataset = tasks.bigquery.get_sample_dataset(dataset, 1)
+    runs = []
+
+    def mock_daily_run(self):
+        runs.append(self)
+
+    monkeypatch.setattr(tasks.bigquery.BqTask, "create_dataset", lambda self: None)
+    for cls in [
+        tasks.bigquery.BqGcsTask,
+        tasks.bigquery.BqQueryTask,
+        tasks.bigquery.BqViewTask,
+    ]:
+        monkeypatch.setattr(cls, "daily_run", mock_daily_run)
+    tasks.bigquery.daily_run(datetime.datetime(2019, 9, 26), cfgs, sample=1)
+
+    assert len(runs) > 0
+    created = set()
+    for task in runs:
+        params = task.config["params"]
+        assert params["dataset"] == sample_dataset
+        if "query" in task.config:
+            qstring = read_string("sql/%s.sql" % task.config["query"])
+            qstring = qstring.format(**task.get_query_params(task.date))
+            # sampled inputs should be created by the upstream sampled tasks
+            for table in re.findall(r"%s\.(\w+)`" % sample_dataset, qstring):
+                assert table in created | {params["dest"]}, "%s reads %s" % (
+                    params["dest"],
+                    table,
+                )
+            if task.config["query"] == "mango_revenue_google":
+                assert "%s.%s.google_rps" % (params["project"], dataset) in qstring
+        created.add(params["dest"])
+
+
+@pytest.mark.unittest
+def test_suggest_cluster_fields():
+    cfgs = utils.config.get_configs("bigquery", "")
+    fields = tasks.bigquery.suggest_cluster_fields(cfgs, "mango_user_rfe_28d")
+    assert 0 < len(fields) <= 4
+    assert "os" in fields and "country" in fields
+    # the partition field is already pruned by partitioning
+    assert "execution_date" not in fields
+    fields = tasks.bigquery.suggest_cluster_fields(
+        cfgs, "mango_events", ["client_id", "os", "submission_date"]
+    )
+    assert fields == ["client_id", "os"]
+
+
+@pytest.mark.unittest
+def test_set_clustering(mock_bigquery, monkeypatch):
+    MANGO_EVENTS = utils.config.get_configs("bigquery", "").MANGO_EVENTS
+    task = tasks.bigquery.get_task(MANGO_EVENTS, datetime.datetime(2019, 9, 26))
+    table = bigquery.Table("taipei-bi.mango_prod.mango_events")
+    monkeypatch.setattr(MockBigqueryClient, "tables", {"mango_events": table})
+
+    # the existing table is clustered, and so is every job writing to it
+    job_config = bigquery.QueryJobConfig()
+    task.set_clustering(job_config)
+    assert job_config.clustering_fields == ["client_id", "os"]
+    assert MockBigqueryClient.updated == [("mango_events", ["clustering_fields"])]
+    job_config = bigquery.QueryJobConfig()
+    task.set_clustering(job_config)
+    assert job_config.clustering_fields == ["client_id", "os"]
+    assert len(MockBigqueryClient.updated) == 1
+
+
+@pytest.mark.unittest
+def test_skip_unchanged(mock_bigquery, monkeypatch):
+    MANGO_EVENTS = utils.config.get_configs("bigquery", "test").MANGO_EVENTS
+    task = tasks.bigquery.get_task(
+        MANGO_EVENTS, datetime.datetime(2019, 9, 26), skip_unchanged=True
+    )
+    state = {"last": "unchanged", "saved": [], "queried": []}
+    monkeypatch.setattr(task, "does_table_exist", lambda *args: True)
+    monkeypatch.setattr(task, "get_input_fingerprint", lambda: "unchanged")
+    monkeypatch.setattr(task, "get_last_fingerprint", lambda: state["last"])
+    monkeypatch.setattr(task, "save_fingerprint", state["saved"].append)
+    monkeypatch.setattr(task, "daily_cleanup", lambda d: None)
+    monkeypatch.setattr(task, "run_query", state["queried"].append)
+
+    task.daily_run()
+    assert state["queried"] == []
+    assert state["saved"] == []
+
+    # inputs changed (or failed last time), run and record the new fingerprint
+    state["last"] = None
+    task.daily_run()
+    assert state["queried"] == [task.date]
+    assert state["saved"] == ["unchanged"]
+
+
+@pytest.mark.unittest
+def test_input_fingerprint(mock_bigquery, monkeypatch):
+    MANGO_EVENTS = utils.config.get_configs("bigquery", "test").MANGO_EVENTS
+    task = tasks.bigquery.get_task(MANGO_EVENTS, datetime.datetime(2019, 9, 26))
+    dataset = bigquery.DatasetReference("rocket-dev01", "test")
+    assets = bigquery.DatasetReference("rocket-dev01", "unittest_assets")
+    modified = datetime.datetime(2019, 9, 27, tzinfo=datetime.timezone.utc)
+    partitions = []
+
+    class MockQueryJob:
+        # the destination is read by appending tasks, e.g. `mango_revenue`
+        referenced_tables = [
+            assets.table("mango_events"),
+            dataset.table("mango_events"),
+            dataset.table("mango_channel_mapping"),
+        ]
+
+        def __init__(self, job_config):
+            self.params = {p.name: p for p in job_config.query_parameters}
+
+        def result(self):
+            partitions.append(self.params)
+            return [
+                Namespace(
+                    table_name=table,
+                    partitions=1,
+                    total_rows=10,
+                    last_modified_time=modified,
+                )
+                for table in self.params["tables"].values
+            ]
+
+    def query(qstring, job_config=None):
+        return MockQueryJob(job_config)
+
+    monkeypatch.setattr(task.client, "query", query)
+    fingerprint = json.loads(task.get_input_fingerprint())
+    assert sorted(fingerprint) == [
+        "query",
+        "rocket-dev01.test.mango_channel_mapping",
+        "rocket-dev01.unittest_assets.mango_events",
+    ]
+    assert fingerprint["rocket-dev01.test.mango_channel_mapping"] == [
+        1,
+        10,
+        "2019-09-27T00:00:00+00:00",
+    ]
+    # sources outside of the dataset are checked by the run date partition
+    dataset_params, assets_params = partitions
+    assert dataset_params["tables"].values == ["mango_channel_mapping"]
+    assert dataset_params["start_partition"].value == ""
+    assert dataset_params["end_partition"].value == "20190926"
+    assert assets_params["tables"].values == ["mango_events"]
+    assert assets_params["start_partition"].value == "20190926"
+
+    # changes of the query or the config are rerun
+    monkeypatch.setitem(task.config, "partition_field", "execution_date")
+    changed = json.loads(task.get_input_fingerprint())
+    assert changed["query"] != fingerprint["query"]
+    monkeypatch.setattr(task, "get_query_string", lambda date: "SELECT 1")
+    assert json.loads(task.get_input_fingerprint())["query"] != changed["query"]
+
+
+@pytest.mark.unittest
+def test_channel_mapping_merge(mock_bigquery, monkeypatch):
+    config = utils.config.get_configs("bigquery", "").MANGO_CHANNEL_MAPPING
+    task = tasks.bigquery.get_task(config, datetime.datetime(2019, 9, 26))
+    state = {"exists": True, "loaded": []}
+    monkeypatch.setattr(task, "does_table_exist", lambda *args: state["exists"])
+    monkeypatch.setattr(task, "create_schema", lambda: state["loaded"].append("src"))
+    monkeypatch.setattr(
+        task,
+        "run_query",
+        lambda date, diff=False: state["loaded"].append("diff_src" if diff else "src"),
+    )
+
+    # the diff is merged into the existing table
+    task.daily_run()
+    assert state["loaded"] == ["diff_src"]
+    assert len(MockBigqueryClient.queries) == 1
+    qstring = MockBigqueryClient.queries[0]
+    assert qstring.startswith(
+        "MERGE `taipei-bi.mango_prod.mango_channel_mapping` T\n"
+        "USING `taipei-bi.mango_prod.mango_channel_mapping_diff` S"
+    )
+    assert (
+        "(T.creative_token = S.creative_token"
+        " OR (T.creative_token IS NULL AND S.creative_token IS NULL))" in qstring
+    )
+    assert "creative_name = S.creative_name" in qstring
+    assert "creative_token = S.creative_token," not in qstring
+    assert MockBigqueryClient.deleted == [
+        "taipei-bi.mango_prod.mango_channel_mapping_diff"
+    ]
+
+    # the table is created from the whole latest file
+    state["exists"] = False
+    task.daily_run()
+    assert state["loaded"] == ["diff_src", "src"]
@@ -1,17 +1,23 @@
 import datetime
 import logging
+import os
 from argparse import Namespace
 from typing import Any, Dict
 
+import pandas as pd
 import pandas_gbq
 import pytest
 import requests
-from google.cloud import storage
+from google.cloud import bigquery, storage
 from google.cloud.storage import Bucket
 from pandas import DataFrame
 
+import tasks.base
 import utils.common
+import utils.marshalling
 from tasks import revenue
+from tests.mockbigquery import MockBigqueryClient
+from tests.mockgcs import MockStorageClient
 from tests.utils import inject_fixtures
 from utils.config import DEFAULT_DATETIME_FORMAT, get_configs
 from utils.marshalling import convert_format
@@ -177,3 +183,267 @@ def test_revenue_load(mock_io, revenue_sample_data):
         DEFAULT_DATETIME_FORMAT
     )
     assert data == convert_format(cfg.DESTINATIONS["fs"]["file_format"], expected)
+
+
+@pytest.mark.unittest
+def test_revenue_load_to_bq(mock_bigquery, mock_gcs, monkeypatch):
+    source = "google_search"
+    args = Namespace(
+        config="test",
+        date=datetime.datetime(2019, 9, 8, 0, 0),
+        debug=True,
+        dest="bq",
+        loglevel=None,
+        period=30,
+        rm=False,
+        source=source,
+        step="l",
+        task="revenue",
+    )
+    task = revenue.RevenueEtlTask(args, cfg.SOURCES, cfg.SCHEMA, cfg.DESTINATIONS)
+    df = DataFrame({name: ["a", "b", "c"] for name, _ in cfg.SCHEMA})
+    df["utc_datetime"] = pd.to_datetime(
+        ["2019-09-06 01:00:00", "2019-09-06 02:00:00", "2019-09-07 01:00:00"]
+    )
+    df["utc_date"] = df["utc_datetime"].dt.floor("D")
+    df["sales_amount"] = df["payout"] = 1.0
+    task.transformed[source] = df
+    task.load_to_bq(source, cfg.SOURCES[source], "staging")
+    # not appending, each date is loaded to replace its own partition
+    loads = {ref.table_id: len(ddf.index) for ref, ddf, _ in MockBigqueryClient.loads}
+    assert loads == {"revenue$20190906": 2, "revenue$20190907": 1}
+    _, _, kwargs = MockBigqueryClient.loads[0]
+    job_config = kwargs["job_config"]
+    assert job_config.time_partitioning.field == "utc_date"
+    schema = job_config.schema
+    assert [f.name for f in schema] == [name for name, _ in cfg.SCHEMA]
+    assert schema[3].field_type == "DATETIME"
+
+    # the existing table, e.g. created by another task, should match the schema
+    table = bigquery.Table(
+        "rocket-dev01.test.revenue",
+        [bigquery.SchemaField("utc_datetime", "TIMESTAMP")],
+    )
+    monkeypatch.setattr(MockBigqueryClient, "tables", {"revenue": table})
+    with pytest.raises(AssertionError, match="utc_datetime is TIMESTAMP"):
+        task.load_to_bq(source, cfg.SOURCES[source], "staging")
+
+
+def _get_cache_test_task(period: int, tmp_path) -> revenue.RevenueEtlTask:
+    args = Namespace(
+        config="test",
+        date=datetime.datetime(2019, 9, 8, 0, 0),
+        debug=True,
+        dest="fs",
+        loglevel=None,
+        period=period,
+        rm=False,
+        source="bukalapak",
+        step="e",
+        task="revenue",
+    )
+    # write cached files to the temp folder instead of the configured ./data/
+    fs = dict(cfg.DESTINATIONS["fs"], prefix=str(tmp_path) + "/")
+    destinations = dict(cfg.DESTINATIONS, fs=fs)
+    return revenue.RevenueEtlTask(args, cfg.SOURCES, cfg.SCHEMA, destinations)
+
+
+@pytest.mark.unittest
+def test_revenue_extract_cache_backend(mock_gcs, tmp_path):
+    source = "bukalapak"
+    config = {
+        "type": "api",
+        "url": "https://api.test.com/?from={start_date}&to={end_date}&page={page}",
+        "api_key": "",
+        "cache_file": True,
+        "cache": {"backend": "memory", "name": "test_revenue", "ttl": 3600},
+        "date_format": "%Y-%m-%d",
+        "file_format": "json",
+        "json_path": "response.data.data",
+        "date_fields": ["date"],
+    }
+    task = _get_cache_test_task(30, tmp_path)
+    assert not task.is_cached(source, config)
+    task.raw[source] = [
+        '{"response": {"data": {"data": [{"id": 0, "date": "2019-08-20"}]}}}',
+        '{"response": {"data": {"data": [{"id": 1, "date": "2019-09-07"}]}}}',
+    ]
+    task.load_to_fs(source, config)
+    assert task.is_cached(source, config)
+    # nothing is written to file system, raw pages are read back from memory
+    assert not os.path.exists(task.get_filepath(source, config, "raw", "fs", 1))
+    df = task.extract_via_fs(source, config)
+    assert df["id"].tolist() == [0, 1]
+
+    # a narrower window reuses the cache and filters the cached days
+    task = _get_cache_test_task(7, tmp_path)
+    assert task.is_cached(source, config)
+    df = task.filter_cached_window(source, config, task.extract_via_fs(source, config))
+    assert df["id"].tolist() == [1]
+    # a wider window or a different request refreshes the cache
+    assert not _get_cache_test_task(60, tmp_path).is_cached(source, config)
+    config["url"] += "&status=approved"
+    assert not _get_cache_test_task(30, tmp_path).is_cached(source, config)
+
+
+@pytest.mark.unittest
+def test_revenue_extract_daily_cache(mock_gcs, monkeypatch, tmp_path):
+    source = "bukalapak"
+    config = {
+        "type": "api",
+        "url": "https://api.test.com/?from={start_date}&to={end_date}&p={page}",
+        "api_key": "",
+        "request_interval": 0,
+        "cache": {"backend": "memory", "name": "test_revenue_daily"},
+        "daily_cache": True,
+        "mutable_days": 1,
+        "date_format": "%Y-%m-%d",
+        "file_format": "json",
+        "json_path": "response.data.data",
+        "json_path_page_count": "response.data.pageCount",
+        "page_size": 100,
+    }
+    response = '{"response": {"data": {"data": [{"day": "%s"}], "pageCount": 1}}}'
+    requested = []
+
+    def get(url, **kwargs):
+        requested.append(url.split("from=")[1][:10])
+        return type("MockResponse", (), {"text": response % requested[-1]})
+
+    monkeypatch.setattr(requests, "get", get)
+    task = _get_cache_test_task(3, tmp_path)
+    df = task.extract_daily_via_api(source, config)
+    days = ["2019-09-05", "2019-09-06", "2019-09-07", "2019-09-08", "2019-09-09"]
+    assert df["day"].tolist() == days[:4]
+    assert requested == days[:4]
+
+    # next day, only the mutable day and the new day are requested
+    requested.clear()
+    task.current_date = datetime.datetime(2019, 9, 9, 0, 0)
+    task.last_month = datetime.datetime(2019, 9, 6, 0, 0)
+    df = task.extract_daily_via_api(source, config)
+    assert df["day"].tolist() == days[1:]
+    assert requested == days[3:]
+    # the window is assembled from day cells, not written as raw pages again
+    cache = task.get_cache(source, config)
+    keys = task.get_daily_cache_keys(source, config)
+    assert len(keys) == 4
+    assert task.raw[source] == [cache.get(key) for key in keys]
+    requested.clear()
+    df = task.extract_via_api(source, config)
+    assert df["day"].tolist() == days[1:]
+    assert requested == days[4:]
+    assert cache.keys(task.get_cache_key(source, config, "raw", "*")) == []
+    assert task.get_cache_manifest(source, config) is None
+    assert task.spill_files == []
+    # yesterday's window for validation is assembled from day cells too
+    yesterday = datetime.datetime(2019, 9, 8, 0, 0)
+    df = task.extract_via_fs(source, config, "raw", yesterday)
+    assert df["day"].tolist() == days[:4]
+
+
+@pytest.mark.unittest
+def test_revenue_extract_daily_cache_gcs(mock_gcs, monkeypatch, tmp_path):
+    source = "bukalapak"
+    config = {
+        "type": "api",
+        "url": "https://api.test.com/?from={start_date}&to={end_date}&p={page}",
+        "api_key": "",
+        "request_interval": 0,
+        "cache": {"backend": "memory", "name": "test_revenue_daily_gcs"},
+        "daily_cache": True,
+        "date_format": "%Y-%m-%d",
+        "file_format": "json",
+        "json_path": "response.data.data",
+        "json_path_page_count": "response.data.pageCount",
+        "page_size": 100,
+    }
+    response = '{"response": {"data": {"data": [{"day": "%s"}], "pageCount": 1}}}'
+
+    def get(url, **kwargs):
+        return type("MockResponse", (), {"text": response % url.split("from=")[1][:10]})
+
+    monkeypatch.setattr(requests, "get", get)
+    monkeypatch.setattr(MockStorageClient, "_bucket", {})
+    task = _get_cache_test_task(3, tmp_path)
+    task.args.dest = "gcs"
+    task.gcs.create_bucket(cfg.DESTINATIONS["gcs"]["bucket"])
+    task.extract_via_api(source, config)
+    # requested day cells with their manifests are backed up to GCS
+    blobs = [b.name for b in task.gcs.list_blobs(cfg.DESTINATIONS["gcs"]["bucket"])]
+    assert len(blobs) == 8
+    assert "taipei/raw-revenue-bukalapak_daily/2019-09-05.manifest" in blobs
+
+    # restored from GCS by another worker without the cache
+    config["cache"] = {"backend": "memory", "name": "test_revenue_daily_gcs2"}
+    task = _get_cache_test_task(3, tmp_path)
+    df = task.extract_via_gcs(source, config, "raw", datetime.datetime(2019, 9, 7))
+    assert df["day"].tolist() == ["2019-09-05", "2019-09-06", "2019-09-07"]
+
+
+@pytest.mark.unittest
+def test_revenue_convert_raw_cache(mock_gcs, monkeypatch, tmp_path):
+    source = "bukalapak"
+    config = {
+        "type": "api",
+        "cache_file": True,
+        "file_format": "json",
+        "json_path": "response.data.data",
+    }
+    raw = '{"response": {"data": {"data": [{"id": 1, "date": "2019-09-07"}]}}}'
+    converted = []
+
+    def convert_df(raw, config):
+        converted.append(raw)
+        return utils.marshalling.convert_df(raw, config)
+
+    monkeypatch.setattr(tasks.base, "convert_df", convert_df)
+    task = _get_cache_test_task(30, tmp_path)
+    expected = task.convert_raw(source, config, raw)
+    df = task.convert_raw(source, config, raw)
+    assert df.equals(expected)
+    assert len(converted) == 1
+    # converted cache is invalidated by conversion configs
+    config["date_fields"] = ["date"]
+    df = task.convert_raw(source, config, raw)
+    assert str(df["date"].dtype) == "datetime64[ns]"
+    assert len(converted) == 2
+    config["date_field_formats"] = {"date": "%Y-%m-%d"}
+    task.convert_raw(source, config, raw)
+    assert len(converted) == 3
+
+
+@pytest.mark.unittest
+def test_revenue_extract_spill_raw(mock_gcs, monkeypatch, tmp_path):
+    source = "bukalapak"
+    config = {
+        "type": "api",
+        "url": "https://api.test.com/?from={start_date}&to={end_date}&p={page}",
+        "api_key": "",
+        "request_interval": 0,
+        "cache_file": True,
+        "date_format": "%Y-%m-%d",
+        "file_format": "json",
+        "json_path": "response.data.data",
+        "json_path_page_count": "response.data.pageCount",
+        "page_size": 100,
+    }
+    response = '{"response": {"data": {"data": [{"page": "%s"}], "pageCount": 3}}}'
+
+    def get(url, **kwargs):
+        return type("MockResponse", (), {"text": response % url.split("p=")[1]})
+
+    monkeypatch.setattr(requests, "get", get)
+    task = _get_cache_test_task(3, tmp_path)
+    df = task.extract_via_api(source, config)
+    assert df["page"].tolist() == ["1", "2"]
+    # raw pages are kept as files moved from spill files into the cache
+    assert [r.path for r in task.raw[source]] == [
+        task.get_filepath(source, config, "raw", "fs", i) for i in [1, 2]
+    ]
+    assert task.extract_via_fs(source, config).equals(df)
+    spill_folder = str(tmp_path) + "/" + task.get_spill_folder(source)
+    assert os.listdir(spill_folder) == []
+    task.spill_raw(source, config, 3, response % 3)
+    task.clean_spill()
+    assert os.listdir(spill_folder) == []
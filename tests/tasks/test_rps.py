@@ -1,9 +1,13 @@
+import datetime
 import logging
+from argparse import Namespace
 from typing import Dict, Any
 import pytest
 import requests
 from google.cloud.storage import Bucket
+from pandas import DataFrame
 import utils.config
+from tasks.rps import RpsEtlTask
 from tests.utils import inject_fixtures
 
 log = logging.getLogger(__name__)
@@ -33,3 +37,22 @@ def test_write_gcs(gcs_bucket: Bucket, gcs_dest: Dict[str, Any]):
     blob = gcs_bucket.blob(gcs_dest["prefix"] + "test.txt")
     blob.upload_from_string("This is a test.")
     blob.delete()
+
+
+@pytest.mark.unittest
+def test_transform_fb_index_empty_vertical(mock_gcs, tmp_path):
+    cfg = utils.config.get_configs(task, "test")
+    args = Namespace(
+        date=datetime.datetime(2018, 1, 1, 0, 0), period=1, rm=False, source=None
+    )
+    sources = dict(cfg.SOURCES, fb_index=dict(cfg.SOURCES["fb_index"]))
+    sources["fb_index"]["iterator"] = range(1, 3)
+    destinations = dict(cfg.DESTINATIONS, fs={"prefix": str(tmp_path) + "/"})
+    rps = RpsEtlTask(args, sources, cfg.SCHEMA, destinations)
+    vertical = DataFrame({"country_code": ["TWN"] * 201, "cost_index": [1.0] * 201})
+    # the empty vertical is dropped by stacking, but should still fail
+    fb_index = {"1": vertical, "2": vertical.iloc[:0]}
+    with pytest.raises(AssertionError, match="Too few rows in FB index"):
+        rps.transform_google_search_rps(
+            DataFrame(), DataFrame(), fb_index, fb_index, DataFrame()
+        )
@@ -0,0 +1,248 @@
+"""Test cache utils."""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.cache
+import utils.file
+from tests.mockredis import MockRedis
+from utils.cache import (
+    CacheManager,
+    FileIndex,
+    FileSystemCache,
+    MemoryCache,
+    RedisCache,
+    SqliteCache,
+    get_cache_backend,
+    get_converted_fingerprint,
+)
+from utils.file import RawFile, write_string
+
+
+def _create_backend(backend: str, tmp_path, ttl=None, max_entries=None):
+    if backend == "fs":
+        return FileSystemCache(str(tmp_path) + "/", ttl, max_entries)
+    elif backend == "memory":
+        return MemoryCache(str(tmp_path), ttl, max_entries)
+    elif backend == "sqlite":
+        return SqliteCache(str(tmp_path / "cache.sqlite"), ttl, max_entries)
+    return RedisCache(ttl=ttl, max_entries=max_entries, client=MockRedis())
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("backend", ["fs", "memory", "sqlite", "redis"])
+def test_cache_backend(backend, tmp_path):
+    cache = _create_backend(backend, tmp_path)
+    assert not cache.exists("raw-rps-fb_index/2019-09-08.1.json")
+    assert cache.get("raw-rps-fb_index/2019-09-08.1.json") is None
+    cache.set("raw-rps-fb_index/2019-09-08.1.json", "page1")
+    cache.set("raw-rps-fb_index/2019-09-08.2.json", "page2")
+    cache.set("raw-rps-fb_index/2019-09-09.1.json", "other")
+    assert cache.exists("raw-rps-fb_index/2019-09-08.1.json")
+    assert cache.get("raw-rps-fb_index/2019-09-08.2.json") == "page2"
+    assert cache.keys("raw-rps-fb_index/2019-09-08.*.json") == [
+        "raw-rps-fb_index/2019-09-08.1.json",
+        "raw-rps-fb_index/2019-09-08.2.json",
+    ]
+    cache.delete("raw-rps-fb_index/2019-09-08.1.json")
+    assert not cache.exists("raw-rps-fb_index/2019-09-08.1.json")
+    assert cache.keys("raw-rps-fb_index/*") == [
+        "raw-rps-fb_index/2019-09-08.2.json",
+        "raw-rps-fb_index/2019-09-09.1.json",
+    ]
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("backend", ["fs", "memory", "sqlite", "redis"])
+def test_cache_backend_ttl(backend, tmp_path, monkeypatch):
+    now = utils.cache.time.time()
+    cache = _create_backend(backend, tmp_path, ttl=60)
+    cache.set("raw-rps-cb_index/2019-09-08.1.csv", "a,b")
+    assert cache.get("raw-rps-cb_index/2019-09-08.1.csv") == "a,b"
+    monkeypatch.setattr(utils.cache.time, "time", lambda: now + 120)
+    assert not cache.exists("raw-rps-cb_index/2019-09-08.1.csv")
+    assert cache.get("raw-rps-cb_index/2019-09-08.1.csv") is None
+    assert cache.keys("raw-rps-cb_index/*") == []
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_cache_backend_lru(backend, tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(utils.cache.time, "time", lambda: clock[0])
+    cache = _create_backend(backend, tmp_path, max_entries=2)
+    for key in ["a", "b"]:
+        cache.set(key, key)
+        clock[0] += 1
+    assert cache.get("a") == "a"
+    clock[0] += 1
+    cache.set("c", "c")
+    assert cache.keys("*") == ["a", "c"]
+
+
+@pytest.mark.unittest
+def test_file_system_cache_lru(tmp_path):
+    cache = _create_backend("fs", tmp_path, max_entries=2)
+    for i, key in enumerate(["raw-a-b/1.json", "raw-a-b/2.json", "raw-a-c/1.json"]):
+        cache.set(key, key)
+        os.utime(str(tmp_path / key), (1000 + i, 1000 + i))
+    os.utime(str(tmp_path / "raw-a-b/1.json"), (1010, 1000))
+    cache.set("raw-a-b/3.json", "3")
+    assert cache.keys("raw-a-b/*") == ["raw-a-b/1.json", "raw-a-b/3.json"]
+    assert cache.keys("raw-a-c/*") == ["raw-a-c/1.json"]
+
+
+@pytest.mark.unittest
+def test_sqlite_cache_threads(tmp_path):
+    cache = _create_backend("sqlite", tmp_path)
+    cache.set("a", "a")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(cache.get, ["a", "b"])) == ["a", None]
+        executor.submit(cache.set, "b", "b").result()
+    assert cache.keys("*") == ["a", "b"]
+
+
+@pytest.mark.unittest
+def test_redis_cache_max_entries(tmp_path, caplog):
+    _create_backend("redis", tmp_path, max_entries=2)
+    assert "max_entries is ignored" in caplog.text
+
+
+@pytest.mark.unittest
+def test_get_cache_backend(tmp_path):
+    assert isinstance(get_cache_backend({}, "./data/"), FileSystemCache)
+    cache = get_cache_backend(
+        {"cache": {"backend": "memory", "name": "test", "max_entries": 10}}, ""
+    )
+    assert isinstance(cache, MemoryCache) and cache.max_entries == 10
+    cache = get_cache_backend(
+        {"cache": {"backend": "sqlite", "ttl": 3600}}, str(tmp_path) + "/"
+    )
+    assert isinstance(cache, SqliteCache) and cache.ttl == 3600
+    with pytest.raises(AssertionError):
+        get_cache_backend({"cache": {"backend": "memcached"}}, "")
+
+
+def _create_cached_file(root, name: str, size: int, last_used: float) -> str:
+    path = os.path.join(str(root), name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x" * size)
+    os.utime(path, (last_used, last_used))
+    return path
+
+
+@pytest.mark.unittest
+def test_cache_manager(tmp_path):
+    now = utils.cache.time.time()
+    day = 24 * 60 * 60
+    old = _create_cached_file(tmp_path, "raw-rps-cb_index/2019-01-01.1.csv", 10, 0)
+    lru = _create_cached_file(
+        tmp_path, "raw-revenue-bukalapak/2019-09-01.1.json", 10, now - 3 * day
+    )
+    needed = _create_cached_file(
+        tmp_path, "raw-revenue-bukalapak/2019-09-07.1.json", 10, now - 2 * day
+    )
+    used = _create_cached_file(
+        tmp_path, "raw-revenue-bukalapak/2019-09-02.1.json", 10, now
+    )
+    manager = CacheManager(str(tmp_path) + "/", max_size=15, max_age=30 * day)
+    assert manager.get_stats("revenue") == {
+        "raw-revenue-bukalapak": {"files": 3, "size": 30, "last_used": now}
+    }
+    # reading through file system cache marks a file as used
+    FileSystemCache(str(tmp_path) + "/").get("raw-revenue-bukalapak/2019-09-01.1.json")
+    assert utils.cache.get_last_used(lru) >= now
+    os.utime(lru, (now - 3 * day, now - 3 * day))
+
+    evicted = manager.prune(keep_since=now - day, keep_dates={"2019-09-07"})
+    # old file is expired, the rest evicted by folder size except kept ones
+    assert sorted(evicted) == sorted([old, lru])
+    assert os.path.isfile(needed) and os.path.isfile(used)
+    assert manager.get_stats()["raw-revenue-bukalapak"]["size"] == 20
+
+
+@pytest.mark.unittest
+def test_file_index(tmp_path):
+    root = str(tmp_path) + "/"
+    existing = _create_cached_file(tmp_path, "raw-rps-fb_index/2019-09-01.1.json", 1, 0)
+    index = FileIndex(root)
+    # index is built from existing folders
+    assert index.list("raw-rps-fb_index") == [existing]
+
+    cache = FileSystemCache(root)
+    cache.set("raw-rps-fb_index/2019-09-08.1.json", "1")
+    cache.set("raw-rps-fb_index/2019-09-08.2.json", "2")
+    cache.set("raw-rps-fb_index/2019-09-09.1.json", "3")
+    index.add(root + "staging-rps-fb_index/latest.jsonl")
+    assert cache.keys("raw-rps-fb_index/2019-09-08.*.json") == [
+        "raw-rps-fb_index/2019-09-08.1.json",
+        "raw-rps-fb_index/2019-09-08.2.json",
+    ]
+    assert index.find(root + "raw-rps-fb_index/2019-09-0?.1.json") == [
+        existing,
+        root + "raw-rps-fb_index/2019-09-08.1.json",
+        root + "raw-rps-fb_index/2019-09-09.1.json",
+    ]
+    assert index.get_latest("raw-rps-fb_index") == (
+        root + "raw-rps-fb_index/2019-09-09.1.json"
+    )
+    assert index.get_latest("raw-rps-fb_index", "2019-09-09") == (
+        root + "raw-rps-fb_index/2019-09-08.1.json"
+    )
+    assert index.get_latest("staging-rps-fb_index") is None
+
+    cache.delete("raw-rps-fb_index/2019-09-09.1.json")
+    assert index.get_latest("raw-rps-fb_index") == (
+        root + "raw-rps-fb_index/2019-09-08.1.json"
+    )
+    # index is rebuilt when removed
+    os.remove(root + utils.cache.INDEX_FILE)
+    assert len(FileIndex(root).list("raw-rps-fb_index")) == 3
+
+
+@pytest.mark.unittest
+def test_file_index_outside_root(tmp_path):
+    index = FileIndex(str(tmp_path / "data") + "/")
+    outside = _create_cached_file(tmp_path, "other/2019-09-08.1.json", 1, 0)
+    # files outside of the root aren't indexed, but could still be found
+    assert index.find(str(tmp_path) + "/other/2019-09-0?.1.json") == [outside]
+    assert index.find(str(tmp_path) + "/other/2019-09-09.*.json") == []
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize(
+    "key,value",
+    [
+        ("timezone_field", "tz"),
+        ("country_field", "country"),
+        ("date_field_formats", {"date": "%Y-%m-%d"}),
+    ],
+)
+def test_converted_fingerprint(key, value):
+    raw = '[{"date": "2019-09-07", "tz": "Asia/Taipei", "country": "TW"}]'
+    config = {"file_format": "json", "date_fields": ["date"]}
+    fingerprint = get_converted_fingerprint(raw, config)
+    # every option changing the converted DataFrame invalidates its cache
+    assert get_converted_fingerprint(raw, dict(config, **{key: value})) != fingerprint
+
+
+@pytest.mark.unittest
+def test_converted_fingerprint_compressed(tmp_path, monkeypatch):
+    raw = '[{"date": "2019-09-07"}]' * 1000
+    config = {"file_format": "json"}
+    fingerprints = set()
+    for compression in [None, "gzip"]:
+        path = str(tmp_path / str(compression))
+        write_string(path, raw, compression)
+        fingerprints.add(get_converted_fingerprint(RawFile(path), config))
+    assert len(fingerprints) == 2
+
+    # compressed files are hashed as stored, never decompressed into memory
+    def decompress(data):
+        assert False, "decompressed"
+
+    monkeypatch.setattr(utils.file, "decompress", decompress)
+    path = str(tmp_path / "gzip")
+    assert get_converted_fingerprint(RawFile(path), config) in fingerprints
@@ -4,7 +4,8 @@ import tempfile
 
 import pytest
 
-from utils.file import read_string, write_string
+from utils.file import RawFile, get_file_compression, read_string, write_string
+from utils.marshalling import convert_df
 
 
 def _create_temp_file(name="", suffix="") -> str:
@@ -36,3 +37,40 @@ def test_read_string():
     data = read_string(fname)
     assert data == STR
     os.remove(fname)
+
+
+@pytest.mark.unittest
+def test_write_string_compressed():
+    STR = '{"a": 1}\n' * 100
+    fname = _create_temp_file()
+    write_string(fname, STR, "gzip")
+    assert get_file_compression(fname) == "gzip"
+    assert os.path.getsize(fname) < len(STR)
+    assert read_string(fname) == STR
+    write_string(fname, STR)
+    assert get_file_compression(fname) is None
+    assert read_string(fname) == STR
+    os.remove(fname)
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("compression", [None, "gzip"])
+@pytest.mark.parametrize(
+    "config,STR",
+    [
+        ({"file_format": "csv"}, "a,b\n1,x\n2,y\n"),
+        ({"file_format": "csv", "header": ["c", "d"]}, "1,x\n2,y\n"),
+        ({"file_format": "json"}, '[{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]'),
+        ({"file_format": "jsonl"}, '{"a": 1, "b": "x"}\n{"a": 2, "b": "y"}\n'),
+    ],
+)
+def test_raw_file(config, STR, compression):
+    fname = _create_temp_file()
+    write_string(fname, STR, compression)
+    raw = RawFile(fname)
+    assert raw.compression == compression
+    assert raw.read() == STR
+    with raw.buffer() as buffer:
+        assert bytes(buffer) == STR.encode("utf-8")
+    assert convert_df(raw, config).equals(convert_df(STR, config))
+    os.remove(fname)
@@ -0,0 +1,368 @@
+"""Test marshalling utils."""
+import json
+import sqlite3
+import timeit
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import utils.marshalling
+from utils.file import RawFile, write_stream
+from utils.marshalling import (
+    convert_df,
+    diff_rows,
+    get_country_tz_str,
+    iter_json_array,
+    json_extract,
+    json_unnest,
+    map_country_3_to_2,
+    map_country_tz_str,
+    normalize_json,
+    singularize,
+    upsert,
+)
+
+TRACKER_PATHS = ["result_set.networks", "campaigns", "adgroups", "creatives"]
+
+
+def _get_conversions(start: str, size: int, status: str) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "source": "bukalapak",
+            "Stat.datetime": pd.date_range(start, periods=size, freq="s"),
+            "Stat.sale_amount": np.random.rand(size),
+            "Stat.conversion_status": status,
+        }
+    )
+
+
+@pytest.mark.unittest
+def test_map_country_3_to_2():
+    pycountry = pytest.importorskip("pycountry")
+    countries = list(pycountry.countries)
+    country_codes = [country.alpha_3 for country in countries]
+    expected = [country.alpha_2 for country in countries]
+    assert map_country_3_to_2(pd.Series(country_codes)).tolist() == expected
+    country_codes = pd.Series(["twn", "XXX", None])
+    assert map_country_3_to_2(country_codes).tolist() == ["TW", np.nan, np.nan]
+    assert pycountry.countries.get(alpha_3="XXX") is None
+
+
+@pytest.mark.unittest
+def test_map_country_tz_str():
+    country_codes = list(pytz.country_timezones) + ["xk", "tw", "", None, "XX"]
+    expected = [get_country_tz_str(country_code) for country_code in country_codes]
+    index = range(10, 10 + len(country_codes))
+    tz_strs = map_country_tz_str(pd.Series(country_codes, index=index))
+    assert tz_strs.tolist() == expected
+    assert tz_strs.index.equals(pd.Index(index))
+
+
+@pytest.mark.unittest
+def test_convert_df_multi_country():
+    raw = pd.DataFrame(
+        {
+            "country": ["TW", "ID", "TW", "JP", None, "ID"],
+            "date": ["2019-09-07 08:00:00", "2019-09-07 07:00:00"]
+            + ["2019-09-07 08:00:00", "2019-09-07 09:00:00"]
+            + ["2019-09-07 00:00:00", None],
+        }
+    ).to_csv(index=False)
+    config = {
+        "file_format": "csv",
+        "date_fields": ["date"],
+        "date_field_formats": {"date": "%Y-%m-%d %H:%M:%S"},
+        "country_field": "country",
+    }
+    df = convert_df(raw, config)
+    expected = pd.to_datetime(["2019-09-07 00:00"] * 5 + [None])
+    assert df["date"].tolist() == expected.tolist()
+    expected = ["+08:00", "+07:00", "+08:00", "+09:00", "+00:00", "+07:00"]
+    assert df["tz"].tolist() == expected
+    # a source in one timezone is converted the same way
+    del config["country_field"]
+    config["country_code"] = "TW"
+    df = convert_df(raw, config)
+    assert df["date"].dt.hour.tolist()[:5] == [0, 23, 0, 1, 16]
+    assert df["tz"].unique().tolist() == ["+08:00"]
+
+
+@pytest.mark.unittest
+def test_upsert():
+    keys = ["source", "Stat.datetime"]
+    old = _get_conversions("2019-09-07", 4, "pending")
+    new = _get_conversions("2019-09-07 00:00:02", 4, "approved")
+    # conversions at the same time are kept all
+    new = pd.concat([new, new.tail(1)], ignore_index=True)
+    df = upsert(old, new, keys)
+    assert df["Stat.datetime"].dt.second.tolist() == [0, 1, 2, 3, 4, 5, 5]
+    assert df["Stat.conversion_status"].tolist() == ["pending"] * 2 + ["approved"] * 5
+    assert upsert(old.head(0), new, keys).equals(new)
+    assert upsert(old, new.head(0), keys).equals(old)
+
+
+@pytest.mark.unittest
+def test_diff_rows():
+    old = json_unnest(_get_tracker_tree(3), TRACKER_PATHS, ["name", "token"])
+    columns = old.columns.tolist()
+    old["execution_date"] = "2019-09-26"
+    new = old.copy()
+    new["execution_date"] = "2019-09-27"
+    new.loc[5, "creative_name"] = "renamed"
+    added = new.iloc[[0]].assign(creative_token="new")
+    new = pd.concat([new, added], ignore_index=True)
+    # rows of partial trees with null tokens are unchanged as well
+    assert new.iloc[:2]["campaign_token"].isnull().any()
+    diff = diff_rows(old, new, columns)
+    assert diff.equals(new.iloc[[5, len(new) - 1]].reset_index(drop=True))
+    assert diff_rows(old, old, columns).empty
+    assert diff_rows(old.head(0), new, columns).equals(new)
+
+
+@pytest.mark.unittest
+def test_diff_rows_null_keys():
+    columns = ["network", "campaign", "name"]
+    old = pd.DataFrame(
+        {
+            "network": ["n1", "n1", None, None],
+            "campaign": [None, "c1", None, None],
+            "name": ["a", "b", "c", "c"],
+        }
+    )
+    new = pd.DataFrame(
+        {
+            "network": ["n1", "n1", np.nan, None, None],
+            "campaign": [None, "c1", None, None, np.nan],
+            "name": ["a", "b2", "c", "d", "c"],
+        }
+    )
+    # None and NaN are both null, nulls are equal and duplicates are kept
+    diff = diff_rows(old, new, columns)
+    assert diff.values.tolist() == [["n1", "c1", "b2"], [None, None, "d"]]
+    assert diff_rows(new, new, columns).empty
+
+
+@pytest.mark.benchmark
+def test_upsert_benchmark():
+    keys = ["source", "Stat.datetime"]
+    old = _get_conversions("2019-09-05", 100000, "pending")
+    new = _get_conversions("2019-09-06", 100000, "approved")
+
+    # what pandasql.sqldf did for the previous do_updates_inserts()
+    def sqldf(q, tables):
+        with sqlite3.connect(":memory:") as conn:
+            for name, df in tables.items():
+                df.to_sql(name, conn, index=False)
+            return pd.read_sql(q, conn)
+
+    def do_updates_inserts():
+        comb = pd.concat([old, new])
+        q = """
+            SELECT source, max(`Stat.datetime`) as updated_key
+            FROM comb
+        """
+        to_update = sqldf(q, {"comb": comb})
+        q = """
+            SELECT comb.*
+            FROM comb left join to_update
+            on comb.source = to_update.source
+            and comb.`Stat.datetime` = to_update.updated_key
+        """
+        return sqldf(q, {"comb": comb, "to_update": to_update})
+
+    assert len(upsert(old, new, keys)) == 186400
+    elapsed = min(timeit.repeat(do_updates_inserts, number=1, repeat=3))
+    vectorized = min(timeit.repeat(lambda: upsert(old, new, keys), number=1, repeat=3))
+    print("sqlite: %.3fs, upsert: %.3fs" % (elapsed, vectorized))
+    assert elapsed / vectorized >= 10
+
+
+def _json_unnest_recursive(
+    json_str, paths, fields, ancestors, result, level=0
+):  # the previous json_unnest(), serializing and parsing elements at every level
+    path = paths[level]
+    path_leaf = singularize(path.split(".")[-1]).lower()
+    extracted = json_extract(json_str, path)
+    if not extracted:
+        return None
+    for elem in json.loads(extracted):
+        vals = ancestors.copy()
+        for field in fields:
+            vals[path_leaf + "_" + field.lower()] = elem[field]
+        if level + 1 < len(paths):
+            r = _json_unnest_recursive(
+                json.dumps(elem), paths, fields, vals, result, level + 1
+            )
+            if r is None:
+                result += [vals]
+        else:
+            result += [vals]
+    return json.dumps(result)
+
+
+def _get_tracker_tree(size: int) -> dict:
+    def get_children(path, level, size):
+        children = []
+        for i in range(size):
+            child = {"name": "%s %d" % (path, i), "token": "%06x" % i}
+            if level < 3:
+                child[paths[level + 1]] = get_children(paths[level + 1], level + 1, 10)
+            children += [child]
+        return children
+
+    paths = ["networks", "campaigns", "adgroups", "creatives"]
+    networks = get_children("networks", 0, size)
+    # trees could be partial, an element without nested elements is a row,
+    # unless the nested elements are empty
+    del networks[0]["campaigns"]
+    networks[1]["campaigns"][0]["adgroups"][0]["creatives"] = []
+    networks[1]["campaigns"][1]["adgroups"] = None
+    return {"result_set": {"networks": networks}}
+
+
+@pytest.mark.unittest
+def test_json_unnest():
+    paths = ["result_set.networks", "campaigns", "adgroups", "creatives"]
+    fields = ["name", "token"]
+    for tree in [
+        _get_tracker_tree(3),
+        json.load(open("test-data/raw-adjust-adjust_trackers/2019-09-26.json")),
+    ]:
+        expected = pd.io.json.json_normalize(
+            json.loads(_json_unnest_recursive(json.dumps(tree), paths, fields, {}, []))
+        )
+        df = json_unnest(tree, paths, fields)
+        assert df.equals(expected)
+    assert json_unnest({}, paths, fields).empty
+
+
+@pytest.mark.benchmark
+def test_json_unnest_benchmark():
+    paths = ["result_set.networks", "campaigns", "adgroups", "creatives"]
+    fields = ["name", "token"]
+
+    def recursive(raw):
+        result = _json_unnest_recursive(raw, paths, fields, {}, [])
+        return pd.io.json.json_normalize(json.loads(result))
+
+    def iterative(raw):
+        return json_unnest(json.loads(raw), paths, fields)
+
+    raw = json.dumps(_get_tracker_tree(100))
+    assert len(iterative(raw)) == 100000 - 1000 + 1 - 10 - 100 + 1
+    unnested = min(timeit.repeat(lambda: iterative(raw), number=1, repeat=3))
+    print("iterative x 100k creatives: %.3fs" % unnested)
+    assert unnested < 2
+    # the recursive one is quadratic as every level serializes the whole result
+    raw = json.dumps(_get_tracker_tree(10))
+    elapsed = timeit.timeit(lambda: recursive(raw), number=1)
+    unnested = min(timeit.repeat(lambda: iterative(raw), number=1, repeat=3))
+    print("x 10k creatives, recursive: %.3fs, iterative: %.3fs" % (elapsed, unnested))
+    assert elapsed / unnested >= 100
+
+
+@pytest.mark.unittest
+def test_normalize_json():
+    raw = open("test-data/raw-revenue-bukalapak/2019-09-08.1.json").read()
+    page = json.loads(raw)["response"]["data"]["data"]
+    for data in [
+        page,
+        page[0],
+        [{"a": {}, "b": {"c": 1, "d": {"e": None}, 2: 3}, "f": [{"g": 1}]}, {"h": 1}],
+        [],
+        [1, 2],
+    ]:
+        assert normalize_json(data).equals(pd.io.json.json_normalize(data))
+    config = {"file_format": "json", "json_path": "response.data.data"}
+    assert convert_df(raw, config).equals(pd.io.json.json_normalize(page))
+
+
+@pytest.mark.benchmark
+def test_convert_json_benchmark():
+    raw = open("test-data/raw-revenue-bukalapak/2019-09-08.1.json").read()
+    config = {"file_format": "json", "json_path": "response.data.data"}
+
+    def convert_twice():
+        # the previous convert_df(), parsing pages twice and serializing once
+        extracted = json.dumps(json.loads(raw)["response"]["data"]["data"])
+        return pd.io.json.json_normalize(pd.io.json.loads(extracted))
+
+    elapsed = min(timeit.repeat(convert_twice, number=20, repeat=3))
+    converted = min(timeit.repeat(lambda: convert_df(raw, config), number=20, repeat=3))
+    print("per page, twice: %.2fms, once: %.2fms" % (elapsed * 50, converted * 50))
+    assert elapsed / converted >= 2
+
+
+@pytest.mark.unittest
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_iter_json_array(chunk_size):
+    doc = {
+        "a": 12345,
+        "b": {"s": "x]}\\\"", "c": [{"d": [1, {}]}, -1.5e3, "y", None, True, []]},
+    }
+    raw = json.dumps(doc, indent=1)
+    for path, expected in [
+        ("b.c", doc["b"]["c"]),
+        ("b.s", []),
+        ("b.e", []),
+        ("a.b", []),
+        ("", []),
+    ]:
+        assert list(iter_json_array(StringIO(raw), path, chunk_size)) == expected
+    assert list(iter_json_array(StringIO(" [1, 22] "), "", chunk_size)) == [1, 22]
+    assert list(iter_json_array(StringIO("[ ]"), "", chunk_size)) == []
+
+
+@pytest.mark.unittest
+def test_stream_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils.marshalling, "STREAM_BATCH_SIZE", 7)
+    raw = open("test-data/raw-revenue-bukalapak/2019-09-08.1.json").read()
+    config = {"file_format": "json", "json_path": "response.data.data"}
+    nested_config = {
+        "file_format": "json",
+        "json_path_nested": TRACKER_PATHS,
+        "fields": ["name", "token"],
+    }
+    tree = json.dumps(_get_tracker_tree(3))
+    for i, (s, c) in enumerate([(raw, config), (tree, nested_config)]):
+        path = str(tmp_path / ("%d.json.gz" % i))
+        write_stream(path, [s[:100].encode(), s[100:].encode()], "gzip")
+        expected = convert_df(s, c)
+        assert convert_df(RawFile(path), dict(c, stream=True)).equals(expected)
+    path = str(tmp_path / "empty.json")
+    write_stream(path, [b'{"response": {"data": {"data": []}}}'])
+    assert convert_df(RawFile(path), dict(config, stream=True)).empty
+
+
+@pytest.mark.benchmark
+def test_stream_json_benchmark(tmp_path, monkeypatch):
+    # a batch of 10 networks is 10k creatives
+    monkeypatch.setattr(utils.marshalling, "STREAM_BATCH_SIZE", 10)
+    config = {
+        "file_format": "json",
+        "json_path_nested": TRACKER_PATHS,
+        "fields": ["name", "token"],
+    }
+    path = str(tmp_path / "trackers.json.gz")
+    write_stream(path, [json.dumps(_get_tracker_tree(100)).encode()], "gzip")
+
+    def get_overhead(config):
+        # peak memory beyond the converted DataFrame itself
+        tracemalloc.start()
+        try:
+            df = convert_df(RawFile(path), config)
+            current, peak = tracemalloc.get_traced_memory()
+            return df, peak - current
+        finally:
+            tracemalloc.stop()
+
+    expected, whole = get_overhead(config)
+    df, streamed = get_overhead(dict(config, stream=True))
+    assert df.equals(expected)
+    whole, streamed = whole / 2 ** 20, streamed / 2 ** 20
+    print("overhead, whole: %.1fMB, streamed: %.1fMB" % (whole, streamed))
+    assert whole / streamed >= 2
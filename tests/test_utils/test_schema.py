@@ -0,0 +1,157 @@
+"""Test schema utils."""
+import timeit
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+
+from configs import revenue
+from utils.schema import (
+    SchemaValidator,
+    check_file_schema,
+    check_table_schema,
+    get_bq_schema,
+)
+
+SCHEMA = [
+    ("country", np.dtype(object).type),
+    ("volume", np.dtype(int).type),
+    ("rps", np.dtype(float).type),
+    ("utc_datetime", np.datetime64),
+    ("utc_date", np.datetime64),
+]
+
+
+@pytest.mark.unittest
+def test_get_bq_schema():
+    schema = get_bq_schema(SCHEMA)
+    assert [(f.name, f.field_type) for f in schema] == [
+        ("country", "STRING"),
+        ("volume", "INTEGER"),
+        ("rps", "FLOAT"),
+        ("utc_datetime", "DATETIME"),
+        ("utc_date", "DATE"),
+    ]
+
+
+@pytest.mark.unittest
+def test_check_file_schema_csv():
+    raw = StringIO("country,volume,rps,utc_datetime,utc_date\nID,1,0.1,a,b\n")
+    assert check_file_schema(raw, SCHEMA, "csv") == []
+    # columns are loaded by positions in csv
+    errors = check_file_schema(StringIO("volume,country\n"), SCHEMA, "csv")
+    assert len(errors) == 1
+
+
+@pytest.mark.unittest
+def test_check_file_schema_jsonl():
+    raw = (
+        '{"country":"ID","volume":1,"rps":1,"utc_datetime":"2019-09-07 16:08:52",'
+        '"utc_date":"2019-09-07"}\n'
+        '{"country":null,"volume":1.5,"utc_date":"2019-09-07 16:08:52","os":"a"}\n'
+    )
+    assert check_file_schema(StringIO(raw), SCHEMA, "jsonl") == [
+        "line 2: volume=1.5 is not INTEGER",
+        'line 2: utc_date="2019-09-07 16:08:52" is not DATE',
+        "line 2: os is not in schema",
+    ]
+    # only the first lines are checked
+    assert check_file_schema(StringIO(raw), SCHEMA, "jsonl", max_lines=1) == []
+
+
+@pytest.mark.unittest
+def test_check_table_schema():
+    # mango_revenue created by sql/mango_revenue_google.sql, appended by revenue
+    table_schema = [
+        bigquery.SchemaField(name, field_type)
+        for name, field_type in [
+            ("conversion_status", "STRING"),
+            ("os", "STRING"),
+            ("country", "STRING"),
+            ("utc_date", "DATE"),
+            ("utc_datetime", "DATETIME"),
+            ("tz", "STRING"),
+            ("source", "STRING"),
+            ("sales_amount", "FLOAT64"),
+            ("payout", "FLOAT"),
+            ("currency", "STRING"),
+        ]
+        + [("fx_defined%d" % i, "STRING") for i in range(1, 6)]
+    ]
+    assert check_table_schema(table_schema, revenue.SCHEMA) == []
+    table_schema[4] = bigquery.SchemaField("utc_datetime", "TIMESTAMP")
+    assert check_table_schema(table_schema, revenue.SCHEMA) == [
+        "utc_datetime is TIMESTAMP in table, DATETIME in schema"
+    ]
+
+
+@pytest.mark.unittest
+def test_schema_validator():
+    validator = SchemaValidator(
+        SCHEMA,
+        {
+            "country": {"nullable": False, "isin": ["ID", "TW"]},
+            "volume": {"nullable": False, "min": 0},
+            "utc_date": {"nullable": False, "max": "2019-09-08"},
+        },
+    )
+    df = pd.DataFrame(
+        {
+            "country": ["ID", "TW", "US", None],
+            "volume": [1, 2, -1, 3],
+            "rps": [0.1, 0.2, np.nan, 0.4],
+            "utc_datetime": pd.to_datetime(["2019-09-07"] * 4),
+            "utc_date": pd.to_datetime(["2019-09-07", None, "2019-09-09", None]),
+        }
+    )
+    assert validator.validate(df) == [
+        "column country has 1 null values, e.g. rows [3]",
+        "column country has 1 values not in ['ID', 'TW'], e.g. rows [2]",
+        "column volume has 1 values < 0, e.g. rows [2]",
+        "column utc_date has 2 null values, e.g. rows [1, 3]",
+        "column utc_date has 1 values > 2019-09-08, e.g. rows [2]",
+    ]
+    assert validator.validate(df.astype({"volume": float})) == [
+        "column volume has a dtype of float64 which is not a subclass of int64"
+    ]
+    assert len(validator.validate(df.drop(columns="rps"))) == 1
+
+
+def _get_revenue_frame(size: int) -> pd.DataFrame:
+    columns = {}
+    for name, dtype in revenue.SCHEMA:
+        if dtype == np.datetime64:
+            columns[name] = pd.to_datetime(np.arange(size), unit="s")
+        elif dtype == np.dtype(float).type:
+            columns[name] = np.random.rand(size)
+        else:
+            columns[name] = np.arange(size).astype(str).astype(object)
+    return pd.DataFrame(columns)
+
+
+@pytest.mark.benchmark
+def test_schema_validator_benchmark():
+    pandas_schema = pytest.importorskip("pandas_schema")
+    validation = pytest.importorskip("pandas_schema.validation")
+    df = _get_revenue_frame(1000000)
+    not_nulls = [name for name, _ in revenue.SCHEMA[:8]]
+    columns = []
+    for name, dtype in revenue.SCHEMA:
+        validations = [validation.IsDtypeValidation(dtype)]
+        if name in not_nulls:
+            validations += [
+                validation.CustomElementValidation(lambda v: not pd.isnull(v), "null")
+            ]
+        columns += [pandas_schema.Column(name, validations)]
+    schema = pandas_schema.Schema(columns)
+    validator = SchemaValidator(
+        revenue.SCHEMA, {name: {"nullable": False} for name in not_nulls}
+    )
+    assert schema.validate(df) == []
+    assert validator.validate(df) == []
+    elapsed = min(timeit.repeat(lambda: schema.validate(df), number=1, repeat=3))
+    compiled = min(timeit.repeat(lambda: validator.validate(df), number=1, repeat=3))
+    print("pandas_schema: %.3fs, SchemaValidator: %.3fs" % (elapsed, compiled))
+    assert elapsed / compiled >= 10
@@ -1,7 +1,10 @@
 """Shared utilities for tests."""
+import copy
 import datetime
-from typing import Dict, Callable, Any, Tuple
+from contextlib import contextmanager
+from typing import Dict, Callable, Any, Tuple, Iterator
 from _pytest.fixtures import FixtureRequest
+from pandas import DataFrame
 import utils.config
 import logging
 import pytest
@@ -23,6 +26,23 @@ def inject_fixtures(namespace: Dict[str, Any], task: str, cfgs: Dict[str, Any]):
         namespace[name] = fixture
 
 
+@contextmanager
+def assert_not_mutated(data: Dict[str, Any]) -> Iterator[None]:
+    """Assert DataFrames are not mutated in the context, e.g. `EtlTask.extracted`.
+
+    :param data: dict of DataFrames, or dict of dict of DataFrames
+    """
+    snapshot = copy.deepcopy(data)
+    yield
+    for name, expected in snapshot.items():
+        frames = expected if isinstance(expected, dict) else {None: expected}
+        for key, frame in frames.items():
+            if not isinstance(frame, DataFrame):
+                continue
+            actual = data[name] if key is None else data[name][key]
+            assert actual.equals(frame), "%s %s is mutated" % (name, key or "")
+
+
 def get_default_range(request: FixtureRequest) -> Tuple[str, str]:
     """Get default data range."""
     date = datetime.datetime.utcnow()
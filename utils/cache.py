@@ -1,12 +1,956 @@
 """Cache utilities."""
 import datetime
+import errno
+import fnmatch
 import functools
-from typing import Dict, Any, Callable
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, Any, Callable, List, Optional, Set, Union
 from pandas import DataFrame
 import logging
 
+from utils.config import DEFAULT_DATE_FORMAT
+from utils.file import RawFile, read_string, write_string
+
 log = logging.getLogger(__name__)
 
+DEFAULT_CACHE_BACKEND = "fs"
+DEFAULT_SQLITE_PATH = "cache.sqlite"
+MEMORY_CACHES = dict()
+FILE_INDEXES = dict()
+INDEX_FILE = "index.sqlite"
+INDEX_DATE_REGEX = r"^\d{4}-\d{2}-\d{2}"
+MANIFEST_EXT = "manifest"
+DAILY_CACHE_SUFFIX = "_daily"
+CONVERTED_STAGE = "converted"
+SPILL_STAGE = "spill"
+CONVERTED_EXT = "parquet"
+# source configs used by `utils.marshalling.convert_df()`
+CONVERT_CONFIG_KEYS = [
+    "file_format",
+    "json_path",
+    "json_path_nested",
+    "fields",
+    "header",
+    "timezone",
+    "country_code",
+    "timezone_field",
+    "country_field",
+    "date_fields",
+    "date_field_formats",
+]
+
+
+def mark_used(path: str):
+    """Mark a cached file as recently used by its access time.
+
+    The modified time is kept, which is used for expiry.
+
+    :param path: the file path
+    """
+    os.utime(path, (time.time(), os.path.getmtime(path)))
+
+
+def get_last_used(path: str) -> float:
+    """Get the last used time of a cached file, either accessed or modified.
+
+    :param path: the file path
+    :return: the epoch time of last use
+    """
+    stat = os.stat(path)
+    return max(stat.st_atime, stat.st_mtime)
+
+
+class FileIndex:
+    """Index of data files under the file system prefix, kept in SQLite.
+
+    Files are indexed by folder (e.g. `raw-revenue-bukalapak`), name and
+    the date the name starts with, so looking up pages of a date,
+    the latest date or all files of a folder doesn't need to list folders.
+    The index is maintained on every write/delete through the ETL,
+    and is rebuilt from the folders when it doesn't exist yet.
+    """
+
+    def __init__(self, root: str):
+        """Initiate file index, create and build the index if not exists.
+
+        :param root: the file system prefix, e.g. `./data/`
+        """
+        self.root = root
+        self.path = root + INDEX_FILE
+        os.makedirs(root, exist_ok=True)
+        is_new = not os.path.isfile(self.path)
+        self.execute(
+            "CREATE TABLE IF NOT EXISTS files "
+            "(folder TEXT, name TEXT, date TEXT, PRIMARY KEY (folder, name))"
+        )
+        self.execute("CREATE INDEX IF NOT EXISTS files_date ON files (folder, date)")
+        if is_new:
+            self.rebuild()
+
+    def execute(self, query: str, params: Any = ()) -> List[Any]:
+        """Execute a query on the index.
+
+        A connection is opened for each query,
+        so the index could be used by multiple threads/processes.
+
+        :param query: the SQL query
+        :param params: the query parameters
+        :return: the fetched rows
+        """
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            with conn:
+                if isinstance(params, list):
+                    conn.executemany(query, params)
+                    return []
+                return conn.execute(query, params).fetchall()
+
+    def split(self, path: str) -> Optional[List[str]]:
+        """Split a file path into folder and name relative to the root.
+
+        :param path: the file path or key relative to the root
+        :return: list of folder and name, None if not under the root
+        """
+        if path.startswith(self.root):
+            path = path.replace(self.root, "", 1)
+        elif path.startswith(".") or path.startswith("/"):
+            return None
+        return [os.path.dirname(path), os.path.basename(path)]
+
+    @staticmethod
+    def get_row(folder: str, name: str) -> List[Optional[str]]:
+        """Get the index row of a file.
+
+        :param folder: the folder of the file
+        :param name: the file name
+        :return: the row of folder/name/date
+
+        >>> FileIndex.get_row("raw-rps-fb_index", "2019-09-08.1.json")
+        ['raw-rps-fb_index', '2019-09-08.1.json', '2019-09-08']
+        >>> FileIndex.get_row("staging-adjust-adjust_trackers", "latest.jsonl")[2]
+        """
+        date = re.search(INDEX_DATE_REGEX, name)
+        return [folder, name, None if date is None else date.group(0)]
+
+    def add(self, path: str):
+        """Add a file to the index.
+
+        :param path: the file path or key relative to the root
+        """
+        split = self.split(path)
+        if split is not None:
+            self.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                tuple(self.get_row(*split)),
+            )
+
+    def remove(self, path: str):
+        """Remove a file from the index.
+
+        :param path: the file path or key relative to the root
+        """
+        split = self.split(path)
+        if split is not None:
+            self.execute(
+                "DELETE FROM files WHERE folder = ? AND name = ?", tuple(split)
+            )
+
+    def find(self, pattern: str) -> List[str]:
+        """Find indexed files by a wildcard pattern of file name.
+
+        :param pattern: the file path or key relative to the root,
+            only the file name could contain wildcard, e.g. `raw-a-b/2019-09-08.*.json`
+        :return: sorted list of file paths
+        """
+        split = self.split(pattern)
+        if split is None:
+            # not under the root, so not indexed
+            return sorted(glob.glob(pattern))
+        folder, name = split
+        rows = self.execute(
+            "SELECT name FROM files WHERE folder = ? AND name GLOB ? ORDER BY name",
+            (folder, name),
+        )
+        return [os.path.join(self.root + folder, row[0]) for row in rows]
+
+    def list(self, folder: str) -> List[str]:
+        """List all indexed files of a folder.
+
+        :param folder: the folder, e.g. `raw-revenue-bukalapak`
+        :return: sorted list of file paths
+        """
+        rows = self.execute(
+            "SELECT name FROM files WHERE folder = ? ORDER BY name", (folder,)
+        )
+        return [os.path.join(self.root + folder, row[0]) for row in rows]
+
+    def get_latest(self, folder: str, before: str = None) -> Optional[str]:
+        """Get the indexed file of the latest date in a folder.
+
+        :param folder: the folder, e.g. `staging-adjust-adjust_trackers`
+        :param before: only files of dates before it, e.g. `2019-09-08`
+        :return: the file path, None if no dated file
+        """
+        where, params = "folder = ? AND date IS NOT NULL", (folder,)
+        if before is not None:
+            where, params = where + " AND date < ?", params + (before,)
+        rows = self.execute(
+            "SELECT name FROM files WHERE %s ORDER BY date DESC, name LIMIT 1" % where,
+            params,
+        )
+        return None if not rows else os.path.join(self.root + folder, rows[0][0])
+
+    def rebuild(self):
+        """Rebuild the index by listing folders under the root."""
+        rows = []
+        for dirpath, _, filenames in os.walk(self.root):
+            folder = os.path.relpath(dirpath, self.root)
+            if folder == ".":
+                continue
+            rows += [self.get_row(folder, name) for name in filenames]
+        self.execute("DELETE FROM files")
+        self.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", rows)
+        log.info("Indexed %d files under %s" % (len(rows), self.root))
+
+
+def get_file_index(root: str) -> FileIndex:
+    """Get the shared file index of a file system prefix.
+
+    :param root: the file system prefix, e.g. `./data/`
+    :return: the file index
+    """
+    if root not in FILE_INDEXES or not os.path.isfile(root + INDEX_FILE):
+        FILE_INDEXES[root] = FileIndex(root)
+    return FILE_INDEXES[root]
+
+
+class CacheManager:
+    """Account and evict cached files under the file system prefix.
+
+    Files are grouped by their `{stage}-{task}-{source}` folders,
+    each folder is limited to `max_size` bytes by evicting least recently
+    used files, and files not used for `max_age` seconds are evicted.
+    """
+
+    def __init__(self, root: str, max_size: int = None, max_age: int = None):
+        """Initiate cache manager.
+
+        :param root: the file system prefix, e.g. `./data/`
+        :param max_size: max bytes of each folder, unlimited if None
+        :param max_age: max seconds since a file is last used, unlimited if None
+        """
+        self.root = root
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get_files(self, task: str = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Get cached files by folder.
+
+        :param task: only list folders of the task if specified
+        :return: dict of folder name to list of files with path/size/last_used,
+            sorted from least recently used
+        """
+        folders = dict()
+        if not os.path.isdir(self.root):
+            return folders
+        for folder in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, folder)
+            if not os.path.isdir(path):
+                continue
+            if task is not None and "-%s-" % task not in folder:
+                continue
+            files = []
+            for entry in os.scandir(path):
+                if entry.is_file():
+                    files += [
+                        {
+                            "path": entry.path,
+                            "size": entry.stat().st_size,
+                            "last_used": get_last_used(entry.path),
+                        }
+                    ]
+            folders[folder] = sorted(files, key=lambda f: f["last_used"])
+        return folders
+
+    def get_stats(self, task: str = None) -> Dict[str, Dict[str, Any]]:
+        """Get file count, total size and last used time by folder.
+
+        :param task: only list folders of the task if specified
+        :return: dict of folder name to stats
+        """
+        stats = dict()
+        for folder, files in self.get_files(task).items():
+            stats[folder] = {
+                "files": len(files),
+                "size": sum([f["size"] for f in files]),
+                "last_used": max([f["last_used"] for f in files]) if files else None,
+            }
+        return stats
+
+    def prune(
+        self,
+        task: str = None,
+        keep_since: float = None,
+        keep_dates: Set[str] = None,
+    ) -> List[str]:
+        """Evict files by age and folder size quota.
+
+        Files used since `keep_since` (e.g. by the current run),
+        or named by a date in `keep_dates`, are never evicted.
+
+        :param task: only prune folders of the task if specified
+        :param keep_since: epoch time, files used after it are kept
+        :param keep_dates: dates in YYYY-MM-DD format, data files of them are kept
+        :return: list of evicted file paths
+        """
+        keep_dates = set() if keep_dates is None else keep_dates
+        now = time.time()
+        evicted = []
+        for folder, files in self.get_files(task).items():
+            size = sum([f["size"] for f in files])
+            for f in files:
+                if keep_since is not None and f["last_used"] >= keep_since:
+                    continue
+                if os.path.basename(f["path"])[:10] in keep_dates:
+                    continue
+                age = now - f["last_used"]
+                expired = self.max_age is not None and age > self.max_age
+                oversized = self.max_size is not None and size > self.max_size
+                if not expired and not oversized:
+                    continue
+                os.remove(f["path"])
+                get_file_index(self.root).remove(f["path"])
+                size -= f["size"]
+                evicted += [f["path"]]
+            log.info("Pruned %s, %d bytes left" % (folder, size))
+        return evicted
+
+
+def get_cache_manager(fs_config: Dict[str, Any], args: Any = None) -> CacheManager:
+    """Get the cache manager of a file system destination.
+
+    The quota is configured by `cache_max_size` (MB) and `cache_max_age` (days)
+    of the destination, or overridden by `--max_cache_size`/`--max_cache_age`.
+
+    :param fs_config: the file system destination config, see `configs/*.py`
+    :param args: args passed from command line, see `get_arg_parser()`
+    :return: the cache manager
+
+    >>> get_cache_manager({"prefix": "./data/", "cache_max_age": 30}).max_age
+    2592000
+    """
+    max_size = (
+        None if "cache_max_size" not in fs_config else fs_config["cache_max_size"]
+    )
+    max_age = None if "cache_max_age" not in fs_config else fs_config["cache_max_age"]
+    if args is not None and "max_cache_size" in args and args.max_cache_size:
+        max_size = args.max_cache_size
+    if args is not None and "max_cache_age" in args and args.max_cache_age:
+        max_age = args.max_cache_age
+    return CacheManager(
+        fs_config["prefix"],
+        None if max_size is None else max_size * 1024 * 1024,
+        None if max_age is None else max_age * 24 * 60 * 60,
+    )
+
+
+def get_needed_dates(date: datetime.datetime, period: int) -> Set[str]:
+    """Get dates of cached files a run still needs.
+
+    That's the extracted window, the day before it for validation,
+    and the lookforward window (e.g. latest fb_index of rps).
+
+    :param date: the base date of the run
+    :param period: the period of the run
+    :return: set of dates in YYYY-MM-DD format
+
+    >>> sorted(get_needed_dates(datetime.datetime(2019, 9, 8), 1))
+    ['2019-09-06', '2019-09-07', '2019-09-08', '2019-09-09']
+    """
+    return set(
+        [
+            (date + datetime.timedelta(days=i)).strftime(DEFAULT_DATE_FORMAT)
+            for i in range(-period - 1, period + 1)
+        ]
+    )
+
+
+class CacheBackend:
+    """Base class of extract cache backends.
+
+    Cached raw data are stored as strings by key, the key is the relative
+    file path of the raw data, e.g. `raw-revenue-bukalapak/2019-09-08.1.json`.
+    Entries older than `ttl` seconds are treated as missing, and backends
+    that support eviction keep at most `max_entries` entries.
+    """
+
+    def __init__(self, ttl: int = None, max_entries: int = None):
+        """Initiate cache backend.
+
+        :param ttl: seconds before a cached entry expires, never if None
+        :param max_entries: max number of cached entries, unlimited if None
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def is_expired(self, timestamp: float) -> bool:
+        """Check whether an entry written at timestamp is expired.
+
+        :param timestamp: the epoch time the entry was written
+        :return: whether the entry is expired
+
+        >>> CacheBackend(ttl=60).is_expired(time.time() - 120)
+        True
+        >>> CacheBackend().is_expired(0)
+        False
+        """
+        return self.ttl is not None and time.time() - timestamp > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached value by key.
+
+        :param key: the cache key
+        :return: the cached value, None if not cached or expired
+        """
+        raise NotImplementedError
+
+    def get_raw(self, key: str) -> Union[str, RawFile, None]:
+        """Get cached value by key, as a file reference if it's cached in a file.
+
+        :param key: the cache key
+        :return: the cached value or file, None if not cached or expired
+        """
+        return self.get(key)
+
+    def set(self, key: str, value: str):
+        """Set cached value by key.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Delete cached value by key.
+
+        :param key: the cache key
+        """
+        raise NotImplementedError
+
+    def keys(self, pattern: str) -> List[str]:
+        """List unexpired cache keys matching a wildcard pattern.
+
+        :param pattern: the wildcard pattern, e.g. `raw-rps-fb_index/2019-09-08.*.json`
+        :return: sorted list of matched keys
+        """
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        """Check whether a key is cached and not expired.
+
+        :param key: the cache key
+        :return: whether the key is cached
+        """
+        return self.get(key) is not None
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Get the local file path of a key if the backend is file based.
+
+        Used to stream cached files from/to GCS without reading them in memory.
+
+        :param key: the cache key
+        :return: the local file path, None if not file based
+        """
+        return None
+
+
+class FileSystemCache(CacheBackend):
+    """Cache raw data as files under the file system destination prefix."""
+
+    def __init__(
+        self,
+        root: str,
+        ttl: int = None,
+        max_entries: int = None,
+        compression: str = None,
+    ):
+        """Initiate file system cache.
+
+        :param root: the folder to store cached files, e.g. `./data/`
+        :param ttl: seconds before a cached file expires, never if None
+        :param max_entries: max number of cached files in each folder, unlimited if None
+        :param compression: gzip/zstd to compress cached files, None for plain text,
+            compressed files are always detected when reading
+        """
+        super().__init__(ttl, max_entries)
+        self.root = root
+        self.compression = compression
+
+    def get_path(self, key: str) -> str:
+        """Get the file path of a key, folders will be created if not exist.
+
+        The key is indexed as the file is to be written,
+        stale index entries are ignored by `keys()`.
+
+        :param key: the cache key
+        :return: the file path
+        """
+        path = self.root + key
+        self.evict(key)
+        get_file_index(self.root).add(key)
+        if not os.path.exists(os.path.dirname(path)):
+            try:
+                os.makedirs(os.path.dirname(path))
+            except OSError as exc:  # Guard against race condition
+                if exc.errno != errno.EEXIST:
+                    raise
+        return path
+
+    def evict(self, key: str):
+        """Evict least recently used files to make room for a key to be written.
+
+        The file system prefix is shared by all tasks, so `max_entries` is
+        applied to the folder of the key, e.g. `raw-rps-fb_index`.
+
+        :param key: the cache key to be written
+        """
+        if self.max_entries is None or os.path.isfile(self.root + key):
+            return
+        index = get_file_index(self.root)
+        paths = [p for p in index.list(os.path.dirname(key)) if os.path.isfile(p)]
+        paths = sorted(paths, key=get_last_used)
+        for path in paths[: max(len(paths) - self.max_entries + 1, 0)]:
+            self.delete(path.replace(self.root, "", 1))
+            log.debug("Evicted %s from file system cache" % path)
+
+    def exists(self, key: str) -> bool:
+        """Check whether a key is cached and not expired.
+
+        :param key: the cache key
+        :return: whether the file exists and not expired
+        """
+        path = self.root + key
+        return os.path.isfile(path) and not self.is_expired(os.path.getmtime(path))
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached file content by key.
+
+        :param key: the cache key
+        :return: the file content, None if not cached or expired
+        """
+        if not self.exists(key):
+            return None
+        mark_used(self.root + key)
+        return read_string(self.root + key)
+
+    def get_raw(self, key: str) -> Optional[RawFile]:
+        """Get the cached file by key without reading it.
+
+        :param key: the cache key
+        :return: the cached file, None if not cached or expired
+        """
+        if not self.exists(key):
+            return None
+        mark_used(self.root + key)
+        return RawFile(self.root + key)
+
+    def set(self, key: str, value: str):
+        """Write value to the file of the key.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        write_string(self.get_path(key), value, self.compression)
+
+    def delete(self, key: str):
+        """Delete the file of the key if exists.
+
+        :param key: the cache key
+        """
+        if os.path.isfile(self.root + key):
+            os.remove(self.root + key)
+        get_file_index(self.root).remove(key)
+
+    def keys(self, pattern: str) -> List[str]:
+        """List unexpired cached files matching a wildcard pattern.
+
+        Files are looked up from the index, see `FileIndex`,
+        unless the folder part of the pattern contains wildcard.
+
+        :param pattern: the wildcard pattern
+        :return: sorted list of matched keys
+        """
+        if "*" in os.path.dirname(pattern):
+            paths = glob.glob(self.root + pattern)
+        else:
+            paths = get_file_index(self.root).find(pattern)
+        keys = [p.replace(self.root, "", 1) for p in paths]
+        return sorted([k for k in keys if self.exists(k)])
+
+
+class MemoryCache(CacheBackend):
+    """Cache raw data in process with least-recently-used eviction.
+
+    Entries are shared by tasks in the same process through `MEMORY_CACHES`.
+    """
+
+    def __init__(self, name: str = "default", ttl: int = None, max_entries: int = None):
+        """Initiate in-process cache.
+
+        :param name: name of the shared in-process store
+        :param ttl: seconds before a cached entry expires, never if None
+        :param max_entries: max number of cached entries, unlimited if None
+        """
+        super().__init__(ttl, max_entries)
+        if name not in MEMORY_CACHES:
+            MEMORY_CACHES[name] = OrderedDict()
+        self.store = MEMORY_CACHES[name]
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached value by key and mark it as recently used.
+
+        :param key: the cache key
+        :return: the cached value, None if not cached or expired
+        """
+        if key not in self.store:
+            return None
+        value, timestamp = self.store[key]
+        if self.is_expired(timestamp):
+            del self.store[key]
+            return None
+        self.store.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str):
+        """Set cached value by key, evict least recently used entries if full.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        self.store[key] = (value, time.time())
+        self.store.move_to_end(key)
+        while self.max_entries is not None and len(self.store) > self.max_entries:
+            evicted, _ = self.store.popitem(last=False)
+            log.debug("Evicted %s from memory cache" % evicted)
+
+    def delete(self, key: str):
+        """Delete cached value by key.
+
+        :param key: the cache key
+        """
+        self.store.pop(key, None)
+
+    def keys(self, pattern: str) -> List[str]:
+        """List unexpired cache keys matching a wildcard pattern.
+
+        :param pattern: the wildcard pattern
+        :return: sorted list of matched keys
+        """
+        keys = [k for k in self.store if fnmatch.fnmatchcase(k, pattern)]
+        return sorted([k for k in keys if not self.is_expired(self.store[k][1])])
+
+
+class SqliteCache(CacheBackend):
+    """Cache raw data in a SQLite database with least-recently-used eviction."""
+
+    def __init__(self, path: str, ttl: int = None, max_entries: int = None):
+        """Initiate SQLite cache, the table will be created if not exists.
+
+        :param path: the SQLite database file path
+        :param ttl: seconds before a cached entry expires, never if None
+        :param max_entries: max number of cached entries, unlimited if None
+        """
+        super().__init__(ttl, max_entries)
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT, updated_at REAL, accessed_at REAL)"
+        )
+
+    def execute(self, query: str, params: Any = ()) -> List[Any]:
+        """Execute a query on the cache database.
+
+        A connection is opened for each query, as `FileIndex.execute`,
+        so the cache could be used by multiple threads/processes.
+
+        :param query: the SQL query
+        :param params: the query parameters
+        :return: the fetched rows
+        """
+        with closing(sqlite3.connect(self.path, timeout=60)) as conn:
+            with conn:
+                return conn.execute(query, params).fetchall()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached value by key and mark it as recently used.
+
+        :param key: the cache key
+        :return: the cached value, None if not cached or expired
+        """
+        rows = self.execute("SELECT value, updated_at FROM cache WHERE key = ?", (key,))
+        if not rows:
+            return None
+        if self.is_expired(rows[0][1]):
+            self.delete(key)
+            return None
+        self.execute(
+            "UPDATE cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+        )
+        return rows[0][0]
+
+    def set(self, key: str, value: str):
+        """Set cached value by key, evict least recently used entries if full.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        now = time.time()
+        self.execute(
+            "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (key, value, now, now)
+        )
+        if self.max_entries is not None:
+            self.execute(
+                "DELETE FROM cache WHERE key NOT IN "
+                "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        """Delete cached value by key.
+
+        :param key: the cache key
+        """
+        self.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def keys(self, pattern: str) -> List[str]:
+        """List unexpired cache keys matching a wildcard pattern.
+
+        :param pattern: the wildcard pattern
+        :return: sorted list of matched keys
+        """
+        min_updated_at = 0 if self.ttl is None else time.time() - self.ttl
+        rows = self.execute(
+            "SELECT key FROM cache WHERE key GLOB ? AND updated_at >= ? ORDER BY key",
+            (pattern, min_updated_at),
+        )
+        return [row[0] for row in rows]
+
+
+class RedisCache(CacheBackend):
+    """Cache raw data in Redis, shared by workers.
+
+    Expiry is handled by Redis with `EX`, eviction follows the
+    `maxmemory-policy` of the Redis server (e.g. `allkeys-lru`).
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        ttl: int = None,
+        max_entries: int = None,
+        key_prefix: str = "etl:",
+        client: Any = None,
+    ):
+        """Initiate Redis cache.
+
+        :param url: the Redis url, e.g. `redis://localhost:6379/0`
+        :param ttl: seconds before a cached entry expires, never if None
+        :param max_entries: not supported, configure maxmemory on the server
+        :param key_prefix: prefix of keys stored in Redis
+        :param client: a redis client compatible object, created from url if None
+        """
+        super().__init__(ttl, max_entries)
+        if max_entries is not None:
+            log.warning(
+                "max_entries is ignored by redis cache, "
+                "configure maxmemory-policy of the server instead"
+            )
+        if client is None:
+            # redis is an optional dependency, only needed for this backend
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get(self, key: str) -> Optional[str]:
+        """Get cached value by key.
+
+        :param key: the cache key
+        :return: the cached value, None if not cached or expired
+        """
+        value = self.client.get(self.key_prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def exists(self, key: str) -> bool:
+        """Check whether a key is cached and not expired.
+
+        :param key: the cache key
+        :return: whether the key is cached
+        """
+        return bool(self.client.exists(self.key_prefix + key))
+
+    def set(self, key: str, value: str):
+        """Set cached value by key with expiry.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        self.client.set(self.key_prefix + key, value, ex=self.ttl)
+
+    def delete(self, key: str):
+        """Delete cached value by key.
+
+        :param key: the cache key
+        """
+        self.client.delete(self.key_prefix + key)
+
+    def keys(self, pattern: str) -> List[str]:
+        """List cache keys matching a wildcard pattern.
+
+        :param pattern: the wildcard pattern
+        :return: sorted list of matched keys
+        """
+        keys = []
+        for k in self.client.scan_iter(match=self.key_prefix + pattern):
+            if isinstance(k, bytes):
+                k = k.decode("utf-8")
+            keys += [k.replace(self.key_prefix, "", 1)]
+        return sorted(keys)
+
+
+def get_cache_backend(
+    config: Dict[str, Any], root: str, compression: str = None
+) -> CacheBackend:
+    """Get the extract cache backend of a data source.
+
+    The backend is configured by the optional `cache` of source config, e.g.
+    `"cache": {"backend": "sqlite", "ttl": 86400, "max_entries": 1000}`,
+    backend could be fs/memory/sqlite/redis, default is fs.
+
+    :param config: config of the data source, see `configs/*.py`
+    :param root: the file system destination prefix, e.g. `./data/`
+    :param compression: compression of cached files for the fs backend
+    :return: the cache backend
+
+    >>> get_cache_backend({}, "./data/").root
+    './data/'
+    >>> get_cache_backend({"cache": {"backend": "memory", "ttl": 60}}, "").ttl
+    60
+    """
+    cache_config = config["cache"] if "cache" in config else dict()
+    backend = (
+        DEFAULT_CACHE_BACKEND
+        if "backend" not in cache_config
+        else cache_config["backend"]
+    )
+    ttl = None if "ttl" not in cache_config else cache_config["ttl"]
+    max_entries = (
+        None if "max_entries" not in cache_config else cache_config["max_entries"]
+    )
+    if backend == "fs":
+        return FileSystemCache(root, ttl, max_entries, compression)
+    elif backend == "memory":
+        name = "default" if "name" not in cache_config else cache_config["name"]
+        return MemoryCache(name, ttl, max_entries)
+    elif backend == "sqlite":
+        path = (
+            root + DEFAULT_SQLITE_PATH
+            if "path" not in cache_config
+            else cache_config["path"]
+        )
+        return SqliteCache(path, ttl, max_entries)
+    elif backend == "redis":
+        url = (
+            os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+            if "url" not in cache_config
+            else cache_config["url"]
+        )
+        return RedisCache(url, ttl, max_entries)
+    assert False, "Unsupported cache backend %s" % backend
+
+
+class RequestPlaceholders(dict):
+    """Format mapping that keeps unknown placeholders as is."""
+
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+def render_request(template: str, **kwargs) -> str:
+    """Render a request template, placeholders not given are kept as is.
+
+    :param template: the url/query template, e.g. `config["url"]`
+    :param kwargs: the placeholder values to render
+    :return: the rendered request
+
+    >>> render_request("https://a.b/?key={api_key}&from={start_date}&p={page}",
+    ...     api_key="", start_date="2019-09-08")
+    'https://a.b/?key=&from=2019-09-08&p={page}'
+    """
+    return template.format_map(RequestPlaceholders(**kwargs))
+
+
+def get_request_fingerprint(request: str) -> str:
+    """Get the fingerprint of a rendered request to key cache entries.
+
+    :param request: the rendered url/query
+    :return: the hex digest of the request
+
+    >>> get_request_fingerprint("https://a.b/?from=2019-09-08")[:12]
+    'b8e894178717'
+    """
+    return hashlib.sha1(request.encode("utf-8")).hexdigest()
+
+
+def get_converted_fingerprint(
+    raw: Union[str, RawFile], config: Dict[str, Any]
+) -> str:
+    """Get the fingerprint of a raw data and its conversion configs.
+
+    The converted DataFrame cache is keyed by this,
+    so it's invalidated when either the raw data or the configs changed.
+    Raw files are hashed from their (memory mapped) content,
+    compressed files are hashed in chunks as stored without decompressing.
+
+    :param raw: the raw data or the raw file
+    :param config: config of the data source, see `configs/*.py`
+    :return: the hex digest of the raw data and the configs
+
+    >>> a = get_converted_fingerprint("[]", {"file_format": "json", "url": "a"})
+    >>> a == get_converted_fingerprint("[]", {"file_format": "json", "url": "b"})
+    True
+    >>> a == get_converted_fingerprint("[]", {"file_format": "json", "header": []})
+    False
+    """
+    converting = {k: config[k] for k in CONVERT_CONFIG_KEYS if k in config}
+    if isinstance(raw, RawFile) and raw.compression is not None:
+        sha1 = hashlib.sha1()
+        with open(raw.path, "rb") as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b""):
+                sha1.update(chunk)
+        raw_fingerprint = sha1.hexdigest()
+    elif isinstance(raw, RawFile):
+        with raw.buffer() as buffer:
+            raw_fingerprint = hashlib.sha1(buffer).hexdigest()
+    else:
+        raw_fingerprint = get_request_fingerprint(raw)
+    return get_request_fingerprint(
+        raw_fingerprint
+        + json.dumps(converting, sort_keys=True, default=str)
+    )
+
 
 def check_extract_cache(extract_func: Callable):
     """Return cached extracted results when cache hit.
@@ -23,14 +967,17 @@ def check_extract_cache(extract_func: Callable):
         stage: str = "raw",
         date: datetime.datetime = None,
     ) -> DataFrame:
-        if "cache_file" in config and config["cache_file"]:
-            if not self.is_cached(source, config):
+        if "daily_cache" in config and config["daily_cache"]:
+            # day cells are the only cache, see `EtlTask.extract_daily_via_api()`
+            extracted = extract_func(self, source, config, stage, date)
+        elif "cache_file" in config and config["cache_file"]:
+            if not self.is_cached(source, config, date=date):
                 extracted = extract_func(self, source, config, stage, date)
-                self.load_to_fs(source, config)
+                self.load_to_fs(source, config, date=date)
                 if self.args.dest != "fs" and config["type"] == "api":
                     # load API cache to GCS as backup,
                     # not needed for BQ/GCS type since they are already on GCS
-                    self.load_to_gcs(source, config)
+                    self.load_to_gcs(source, config, date=date)
             else:
                 log.info(
                     "Cache hit for %s-%s-%s/%s"
@@ -41,9 +988,8 @@ def check_extract_cache(extract_func: Callable):
                         (self.current_date if date is None else date).date(),
                     )
                 )
-                # TODO: support different cache server when needed
-                # e.g. memcached, redis, cloud memorystore, etc...
-                extracted = self.extract_via_fs(source, config)
+                extracted = self.extract_via_fs(source, config, date=date)
+                extracted = self.filter_cached_window(source, config, extracted, date)
         else:
             extracted = extract_func(self, source, config, stage, date)
             if (
@@ -54,7 +1000,7 @@ def check_extract_cache(extract_func: Callable):
             ):
                 # force loading newly cached file to GCS,
                 # by default API cache will only load to GCS on first call
-                self.load_to_gcs(source, config)
+                self.load_to_gcs(source, config, date=date)
         # Extract data from previous date for validation
         return extracted
 
@@ -1,10 +1,9 @@
 """Common."""
 from pandas import DataFrame
+from utils.file import read_string
 from utils.marshalling import convert_df
 
 
 def cachedDataFrame(fpath, config) -> DataFrame:
     """Open dataframe stored in file."""
-    with open(fpath, "r") as f:
-        raw = f.read()
-        return convert_df(raw, config)
+    return convert_df(read_string(fpath), config)
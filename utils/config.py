@@ -105,9 +105,10 @@ def get_arg_parser(**kwargs) -> ArgumentParser:
         "--dest",
         default=None if "dest" not in kwargs else kwargs["dest"],
         help=(
-            "The place to load transformed data to, can be 'fs' or 'gcs'.\n"
+            "The place to load transformed data to, can be 'fs', 'gcs' or 'bq'.\n"
             "Default is 'gcs', "
-            "which the intermediate output will still write to 'fs'."
+            "which the intermediate output will still write to 'fs'. "
+            "'bq' loads directly to BigQuery and archives to 'gcs' in background."
         ),
     )
     parser.add_argument(
@@ -137,6 +138,48 @@ def get_arg_parser(**kwargs) -> ArgumentParser:
         action="store_true",
         help="Clean up cached files.",
     )
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=None if "sample" not in kwargs else kwargs["sample"],
+        help=(
+            "Run BigQuery tasks on a PCT percent sample of clients (by sample_id), "
+            "writing to a dataset suffixed with '_sample{PCT}'."
+        ),
+    )
+    parser.add_argument(
+        "command",
+        nargs="*",
+        default=[] if "command" not in kwargs else kwargs["command"],
+        help=(
+            "Maintenance command instead of running tasks, "
+            "'cache stats' or 'cache prune' for the file system cache."
+        ),
+    )
+    parser.add_argument(
+        "--max_cache_size",
+        type=int,
+        default=None if "max_cache_size" not in kwargs else kwargs["max_cache_size"],
+        help=(
+            "Max size in MB of each {stage}-{task}-{source} cache folder "
+            "when pruning cache, overrides DESTINATIONS['fs']['cache_max_size']."
+        ),
+    )
+    parser.add_argument(
+        "--max_cache_age",
+        type=int,
+        default=None if "max_cache_age" not in kwargs else kwargs["max_cache_age"],
+        help=(
+            "Max days since a cached file is last used when pruning cache, "
+            "overrides DESTINATIONS['fs']['cache_max_age']."
+        ),
+    )
+    parser.add_argument(
+        "--skip_unchanged",
+        default=False if "skip_unchanged" not in kwargs else kwargs["skip_unchanged"],
+        action="store_true",
+        help="Skip BigQuery tasks whose inputs are unchanged since the last run.",
+    )
     return parser
 
 
@@ -1,30 +1,221 @@
 """File utilities."""
+import gzip
+import io
+import mmap
+import os
 import re
+from contextlib import contextmanager
+from typing import IO, Any, Iterable, Iterator, Optional
 
 from utils.config import EXT_REGEX, DEFAULT_PATH_FORMAT
 
+COMPRESSION_MAGIC = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+GZIP_LEVEL = 6
 
-def write_string(path: str, s: str):
+
+def get_zstd():
+    """Get the zstandard module, an optional dependency only needed for zstd.
+
+    :return: the zstandard module
+    """
+    import zstandard
+
+    return zstandard
+
+
+def compress(data: bytes, compression: Optional[str] = None) -> bytes:
+    """Compress bytes.
+
+    :param data: the bytes to compress
+    :param compression: gzip/zstd, or None to keep it uncompressed
+    :return: the compressed bytes
+
+    >>> compress(b"abc")
+    b'abc'
+    >>> get_compression(compress(b"abc", "gzip"))
+    'gzip'
+    """
+    if compression is None:
+        return data
+    elif compression == "gzip":
+        # fixed mtime so the same content is always compressed the same
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    elif compression == "zstd":
+        return get_zstd().ZstdCompressor().compress(data)
+    assert False, "Unsupported compression: %s" % compression
+
+
+def get_compression(data: bytes) -> Optional[str]:
+    """Detect the compression of bytes by magic number.
+
+    :param data: the bytes, or at least the first 4 bytes of them
+    :return: gzip/zstd, None if not compressed
+
+    >>> get_compression(b'{"a": 1}')
+    """
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if data.startswith(magic):
+            return compression
+    return None
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompress bytes, the compression is detected automatically.
+
+    :param data: the bytes to decompress
+    :return: the decompressed bytes, or the same bytes if not compressed
+
+    >>> decompress(compress(b"abc", "gzip"))
+    b'abc'
+    >>> decompress(b"abc")
+    b'abc'
+    """
+    compression = get_compression(data)
+    if compression == "gzip":
+        return gzip.decompress(data)
+    elif compression == "zstd":
+        # decompressobj also supports frames without content size
+        return get_zstd().ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def decode_string(data: bytes) -> str:
+    """Decode bytes into string, decompress first if compressed.
+
+    Newlines are translated as reading files in text mode.
+
+    :param data: the bytes to decode
+    :return: the decoded string
+
+    >>> decode_string(compress(b"a,b\\r\\n1,2\\r\\n", "gzip"))
+    'a,b\\n1,2\\n'
+    """
+    return io.TextIOWrapper(io.BytesIO(decompress(data)), encoding="utf-8").read()
+
+
+def get_file_compression(path: str) -> Optional[str]:
+    """Detect the compression of a file by magic number.
+
+    :param path: the file path
+    :return: gzip/zstd, None if not compressed
+    """
+    with open(path, "rb") as f:
+        return get_compression(f.read(4))
+
+
+def write_string(path: str, s: str, compression: Optional[str] = None):
     """Write string to file.
 
     :param path: the file path to write to
     :param s: the string to write
+    :param compression: gzip/zstd, or None to write plain text
     """
-    with open(path, "w") as f:
-        f.write(s)
+    if compression is None:
+        with open(path, "w") as f:
+            f.write(s)
+    else:
+        with open(path, "wb") as f:
+            f.write(compress(s.encode("utf-8"), compression))
+
+
+def write_stream(
+    path: str, chunks: Iterable[bytes], compression: Optional[str] = None
+):
+    """Write chunks of bytes to file without joining them in memory.
+
+    :param path: the file path to write to
+    :param chunks: the chunks of bytes, e.g. of a streamed response
+    :param compression: gzip/zstd, or None to write as is
+    """
+    with open(path, "wb") as f:
+        if compression is None:
+            writer = f
+        elif compression == "gzip":
+            # fixed mtime and no file name, so the same content is compressed the same
+            writer = gzip.GzipFile("", "wb", GZIP_LEVEL, f, mtime=0)
+        elif compression == "zstd":
+            writer = get_zstd().ZstdCompressor().stream_writer(f)
+        else:
+            assert False, "Unsupported compression: %s" % compression
+        with writer:
+            for chunk in chunks:
+                writer.write(chunk)
 
 
 def read_string(path: str) -> str:
     """Read string from file.
 
+    Compressed files are detected and decompressed automatically.
+
     :param path: the file path to read from
     :return: the string read from the file
     """
-    with open(path, "r") as f:
-        s = f.read()
+    with open(path, "rb") as f:
+        s = decode_string(f.read())
     return s
 
 
+class RawFile:
+    """Reference to a raw data file, so the content isn't kept in memory.
+
+    Parsers read the file directly through `open()`/`buffer()`
+    instead of a string read by `read()`.
+    """
+
+    def __init__(self, path: str):
+        """Initiate raw file reference.
+
+        :param path: the file path
+        """
+        self.path = path
+
+    def __repr__(self) -> str:
+        """Represent the reference by the file path."""
+        return "RawFile(%r)" % self.path
+
+    @property
+    def compression(self) -> Optional[str]:
+        """Get the compression of the file, gzip/zstd, None if not compressed."""
+        return get_file_compression(self.path)
+
+    def read(self) -> str:
+        """Read the whole file content as string.
+
+        :return: the decompressed file content
+        """
+        return read_string(self.path)
+
+    def open(self) -> IO[str]:
+        """Open the file as text, decompressed as it's read if compressed.
+
+        :return: the text file object
+        """
+        compression = self.compression
+        if compression == "gzip":
+            return gzip.open(self.path, "rt", encoding="utf-8")
+        elif compression == "zstd":
+            reader = get_zstd().ZstdDecompressor().stream_reader(open(self.path, "rb"))
+            return io.TextIOWrapper(reader, encoding="utf-8")
+        return open(self.path, "r")
+
+    @contextmanager
+    def buffer(self) -> Iterator[Any]:
+        """Get the file content as a read-only bytes-like buffer.
+
+        Uncompressed files are memory mapped, so the pages are read on demand
+        and shared with the page cache instead of copied,
+        compressed files are decompressed into bytes.
+
+        :return: the bytes-like buffer, valid until the context exits
+        """
+        with open(self.path, "rb") as f:
+            if self.compression is not None or os.fstat(f.fileno()).st_size == 0:
+                yield decompress(f.read())
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    yield m
+
+
 def get_file_ext(fpath: str) -> str:
     """Extract file extension from path.
 
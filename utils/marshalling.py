@@ -3,9 +3,11 @@ import datetime
 import json
 import re
 from io import StringIO
+from types import MappingProxyType
 from collections import Counter
-from functools import reduce
-from typing import Optional, Dict, List, Any
+from functools import lru_cache, reduce
+from typing import IO, Optional, Dict, List, Any, Iterator, Union
+import numpy as np
 import pandas.io.json as pd_json
 import pandas as pd
 import pytz
@@ -14,66 +16,376 @@ import logging
 from pandas import DataFrame, Series
 
 from utils.config import DEFAULT_TZ_FORMAT, DEFAULT_DATETIME_FORMAT
+from utils.file import RawFile
+
+try:
+    # orjson is an optional dependency, parsing json faster if installed
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 log = logging.getLogger(__name__)
 
+# ISO 3166-1 alpha-3 to alpha-2 country codes, same as `pycountry.countries`
+COUNTRY_CODES_3_TO_2 = MappingProxyType(
+    dict(
+        code.split(":")
+        for code in """
+ABW:AW AFG:AF AGO:AO AIA:AI ALA:AX ALB:AL AND:AD ARE:AE ARG:AR ARM:AM
+ASM:AS ATA:AQ ATF:TF ATG:AG AUS:AU AUT:AT AZE:AZ BDI:BI BEL:BE BEN:BJ
+BES:BQ BFA:BF BGD:BD BGR:BG BHR:BH BHS:BS BIH:BA BLM:BL BLR:BY BLZ:BZ
+BMU:BM BOL:BO BRA:BR BRB:BB BRN:BN BTN:BT BVT:BV BWA:BW CAF:CF CAN:CA
+CCK:CC CHE:CH CHL:CL CHN:CN CIV:CI CMR:CM COD:CD COG:CG COK:CK COL:CO
+COM:KM CPV:CV CRI:CR CUB:CU CUW:CW CXR:CX CYM:KY CYP:CY CZE:CZ DEU:DE
+DJI:DJ DMA:DM DNK:DK DOM:DO DZA:DZ ECU:EC EGY:EG ERI:ER ESH:EH ESP:ES
+EST:EE ETH:ET FIN:FI FJI:FJ FLK:FK FRA:FR FRO:FO FSM:FM GAB:GA GBR:GB
+GEO:GE GGY:GG GHA:GH GIB:GI GIN:GN GLP:GP GMB:GM GNB:GW GNQ:GQ GRC:GR
+GRD:GD GRL:GL GTM:GT GUF:GF GUM:GU GUY:GY HKG:HK HMD:HM HND:HN HRV:HR
+HTI:HT HUN:HU IDN:ID IMN:IM IND:IN IOT:IO IRL:IE IRN:IR IRQ:IQ ISL:IS
+ISR:IL ITA:IT JAM:JM JEY:JE JOR:JO JPN:JP KAZ:KZ KEN:KE KGZ:KG KHM:KH
+KIR:KI KNA:KN KOR:KR KWT:KW LAO:LA LBN:LB LBR:LR LBY:LY LCA:LC LIE:LI
+LKA:LK LSO:LS LTU:LT LUX:LU LVA:LV MAC:MO MAF:MF MAR:MA MCO:MC MDA:MD
+MDG:MG MDV:MV MEX:MX MHL:MH MKD:MK MLI:ML MLT:MT MMR:MM MNE:ME MNG:MN
+MNP:MP MOZ:MZ MRT:MR MSR:MS MTQ:MQ MUS:MU MWI:MW MYS:MY MYT:YT NAM:NA
+NCL:NC NER:NE NFK:NF NGA:NG NIC:NI NIU:NU NLD:NL NOR:NO NPL:NP NRU:NR
+NZL:NZ OMN:OM PAK:PK PAN:PA PCN:PN PER:PE PHL:PH PLW:PW PNG:PG POL:PL
+PRI:PR PRK:KP PRT:PT PRY:PY PSE:PS PYF:PF QAT:QA REU:RE ROU:RO RUS:RU
+RWA:RW SAU:SA SDN:SD SEN:SN SGP:SG SGS:GS SHN:SH SJM:SJ SLB:SB SLE:SL
+SLV:SV SMR:SM SOM:SO SPM:PM SRB:RS SSD:SS STP:ST SUR:SR SVK:SK SVN:SI
+SWE:SE SWZ:SZ SXM:SX SYC:SC SYR:SY TCA:TC TCD:TD TGO:TG THA:TH TJK:TJ
+TKL:TK TKM:TM TLS:TL TON:TO TTO:TT TUN:TN TUR:TR TUV:TV TWN:TW TZA:TZ
+UGA:UG UKR:UA UMI:UM URY:UY USA:US UZB:UZ VAT:VA VCT:VC VEN:VE VGB:VG
+VIR:VI VNM:VN VUT:VU WLF:WF WSM:WS YEM:YE ZAF:ZA ZMB:ZM ZWE:ZW
+""".split()
+    )
+)
+
+# json arrays of raw files are streamed in chunks and converted in batches,
+# see `stream_json()`
+STREAM_CHUNK_SIZE = 2 ** 16
+STREAM_BATCH_SIZE = 10000
 
-def convert_df(raw: str, config: Dict[str, Any]) -> DataFrame:
+
+class SharedViews:
+    """Shallow copies of DataFrames sharing their data with the originals.
+
+    Adding or dropping columns of a view only changes the view, and the axes
+    are copied so renaming them doesn't change the originals either.
+    Writing into the shared data in place (e.g. `df.loc[0, "a"] = 1` or
+    `fillna(inplace=True)`) changes the originals, so they are hashed when
+    viewed to be checked by `is_changed()`.
+    """
+
+    def __init__(self):
+        """Initialize shared views."""
+        self.hashes = []
+
+    def view(self, df: DataFrame) -> DataFrame:
+        """Get a view of a DataFrame.
+
+        :param df: the original DataFrame
+        :return: the view
+
+        >>> views = SharedViews()
+        >>> df = DataFrame({"a": [1, 2]})
+        >>> view = views.view(df)
+        >>> view.index.name = "i"
+        >>> view["b"] = 1
+        >>> df.index.name, df.columns.tolist(), views.is_changed()
+        (None, ['a'], False)
+        >>> view.loc[0, "a"] = 3
+        >>> views.is_changed()
+        True
+        """
+        view = df.copy(deep=False)
+        view.index = df.index.copy()
+        view.columns = df.columns.copy()
+        self.hashes += [(df, pd.util.hash_pandas_object(df).values)]
+        return view
+
+    def is_changed(self) -> bool:
+        """Check if any original DataFrame is changed since viewed.
+
+        :return: whether any original DataFrame is changed
+        """
+        return any(
+            not np.array_equal(hashes, pd.util.hash_pandas_object(df).values)
+            for df, hashes in self.hashes
+        )
+
+
+def convert_df(raw: Union[str, RawFile], config: Dict[str, Any]) -> DataFrame:
     """Convert raw string to DataFrame, currently only supports json/csv.
 
+    Raw files are parsed from the file directly without reading into a string,
+    csv files are memory mapped and jsonl files are read line by line,
+    json files of sources with `stream` are streamed, see `stream_json()`.
+
+    Date fields are parsed by `date_field_formats` if specified,
+    then converted from the timezone of each row to UTC,
+    see `get_row_timezones()` and `normalize_tz()`.
+
     :rtype: DataFrame
-    :param raw: the raw source string in json/csv format,
+    :param raw: the raw source string in json/csv format, or the raw file of it,
         this is to be converted to DataFrame
     :param config: the config of the data source specified in task config,
         see `configs/*.py`
     :return: the converted `DataFrame`
     """
     ftype = "json" if "file_format" not in config else config["file_format"]
+    is_streamed = "stream" in config and config["stream"]
     df = None
     if ftype == "jsonl":
-        jlines = raw.split("\n")
         df = DataFrame()
-        for jline in jlines:
-            if len(jline) < 3:
-                continue
-            line = json.loads(jline)
-            df = df.append(Series(line), ignore_index=True)
+        with StringIO(raw) if isinstance(raw, str) else raw.open() as jlines:
+            for jline in jlines:
+                jline = jline.rstrip("\n")
+                if len(jline) < 3:
+                    continue
+                line = json.loads(jline)
+                df = df.append(Series(line), ignore_index=True)
+    elif ftype == "json" and isinstance(raw, RawFile) and is_streamed:
+        df = stream_json(raw, config)
     elif ftype == "json":
-        if "json_path" in config:
-            extracted_json = json_extract(raw, config["json_path"])
-        elif "json_path_nested" in config:
-            extracted_json = json_unnest(
-                raw, config["json_path_nested"], config["fields"], {}, []
-            )
+        if isinstance(raw, RawFile):
+            # json parsers need a whole document, pass bytes without decoding
+            with raw.buffer() as buffer:
+                raw = bytes(buffer)
+        # parse once, then extract from the parsed json
+        data = json_loads(raw)
+        if "json_path_nested" in config:
+            df = json_unnest(data, config["json_path_nested"], config["fields"])
         else:
-            extracted_json = raw
-        data = pd_json.loads(extracted_json)
-        df = pd_json.json_normalize(data)
+            if "json_path" in config:
+                data = json_get(data, config["json_path"])
+            df = normalize_json(data)
     elif ftype == "csv":
-        if "header" in config:
-            df = pd.read_csv(StringIO(raw), names=config["header"])
+        names = None if "header" not in config else config["header"]
+        if isinstance(raw, str):
+            df = pd.read_csv(StringIO(raw), names=names)
+        elif raw.compression is None:
+            df = pd.read_csv(raw.path, names=names, memory_map=True)
         else:
-            df = pd.read_csv(StringIO(raw))
+            with raw.open() as f:
+                df = pd.read_csv(f, names=names)
     # convert timezone according to config
-    tz = None
-    if "timezone" in config:
-        tz = pytz.timezone(config["timezone"])
-    elif "country_code" in config:
-        tz = get_country_tz(config["country_code"])
-    # TODO: support multiple countries/timezones in the future if needed
     if "date_fields" in config:
+        date_formats = config.get("date_field_formats", {})
         for date_field in config["date_fields"]:
-            df[date_field] = pd.to_datetime(df[date_field])
-        if tz is not None:
-            df["tz"] = get_tz_str(tz)
-            for date_field in config["date_fields"]:
-                df[date_field] = (
-                    df[date_field].dt.tz_localize(tz).dt.tz_convert(pytz.utc)
-                )
-                df[date_field] = df[date_field].astype("datetime64[ns]")
+            df[date_field] = pd.to_datetime(
+                df[date_field], format=date_formats.get(date_field)
+            )
+        timezones = get_row_timezones(df, config)
+        if timezones is not None:
+            tz_strs = [get_tz_str(tz) for tz in timezones.cat.categories]
+            df["tz"] = np.array(tz_strs, dtype=object)[timezones.cat.codes]
+            normalize_tz(df, config["date_fields"], timezones)
     return df
 
 
+def get_row_timezones(df: DataFrame, config: Dict[str, Any]) -> Optional[Series]:
+    """Get the timezone of the date fields of each row of a data source.
+
+    Timezones are either per row, by the timezone names in `timezone_field`
+    or the 2 digit country codes in `country_field`,
+    or per source, see `get_source_tz()`.
+
+    :rtype: Series
+    :param df: the DataFrame of the data source
+    :param config: the config of the data source specified in task config,
+        see `configs/*.py`
+    :return: the categorical timezones, None if not specified
+
+    >>> df = DataFrame({"c": ["TW", "ID"], "tz": ["Asia/Tokyo", None]})
+    >>> get_row_timezones(df, {"country_field": "c"}).map(str).tolist()
+    ['Asia/Taipei', 'Asia/Jakarta']
+    >>> get_row_timezones(df, {"timezone_field": "tz"}).map(str).tolist()
+    ['Asia/Tokyo', 'UTC']
+    """
+    if "timezone_field" in config:
+        names = df[config["timezone_field"]].fillna("UTC").astype("category")
+        return names.cat.rename_categories(pytz.timezone)
+    elif "country_field" in config:
+        countries = df[config["country_field"]].fillna("").astype("category")
+        # look up each country once, countries could share a timezone
+        codes, timezones = pd.factorize(
+            map_country_tz(Series(countries.cat.categories))
+        )
+        codes = codes[countries.cat.codes.to_numpy()]
+    else:
+        tz = get_source_tz(config)
+        if tz is None:
+            return None
+        codes, timezones = np.zeros(len(df), dtype=int), [tz]
+    return Series(pd.Categorical.from_codes(codes, timezones), index=df.index)
+
+
+def normalize_tz(df: DataFrame, date_fields: List[str], timezones: Series):
+    """Convert date fields in local time of each row to UTC in place.
+
+    Rows are grouped by timezone and each group is converted in one operation.
+
+    :param df: the DataFrame with date fields parsed in local time
+    :param date_fields: the date fields to convert
+    :param timezones: the categorical timezone of each row,
+        see `get_row_timezones()`
+
+    >>> df = DataFrame({"d": pd.to_datetime(["2019-09-07 08:00", "2019-09-07 07:00"])})
+    >>> normalize_tz(df, ["d"], get_row_timezones(DataFrame({"c": ["TW", "ID"]}),
+    ...     {"country_field": "c"}))
+    >>> df["d"].tolist()
+    [Timestamp('2019-09-07 00:00:00'), Timestamp('2019-09-07 00:00:00')]
+    """
+    categories = timezones.cat.categories
+    codes = timezones.cat.codes.to_numpy()
+    groups = [np.flatnonzero(codes == i) for i in range(len(categories))]
+    for date_field in date_fields:
+        local = pd.DatetimeIndex(df[date_field])
+        if len(categories) == 1:
+            utc = local.tz_localize(categories[0])
+            df[date_field] = utc.tz_convert(pytz.utc).tz_localize(None)
+            continue
+        utc = np.empty(len(local), dtype="datetime64[ns]")
+        for tz, positions in zip(categories, groups):
+            utc[positions] = (
+                local[positions].tz_localize(tz).tz_convert(pytz.utc).tz_localize(None)
+            )
+        df[date_field] = utc
+
+
+def get_source_tz(config: Dict[str, Any]) -> Optional[pytz.UTC]:
+    """Get the timezone of the date fields of a data source.
+
+    :param config: the config of the data source specified in task config,
+        see `configs/*.py`
+    :return: the timezone, None if not specified
+
+    >>> get_source_tz({"timezone": "Asia/Taipei"})
+    <DstTzInfo 'Asia/Taipei' LMT+8:06:00 STD>
+    >>> get_source_tz({}) is None
+    True
+    """
+    if "timezone" in config:
+        return pytz.timezone(config["timezone"])
+    elif "country_code" in config:
+        return get_country_tz(config["country_code"])
+    return None
+
+
+def filter_date_window(
+    df: DataFrame,
+    config: Dict[str, Any],
+    start_date: datetime.datetime,
+    end_date: datetime.datetime,
+) -> DataFrame:
+    """Filter a DataFrame converted by `convert_df()` to a date window.
+
+    The window is inclusive and in the source timezone,
+    rows are filtered by the first of the source `date_fields`.
+
+    :rtype: DataFrame
+    :param df: the converted DataFrame
+    :param config: the config of the data source specified in task config,
+        see `configs/*.py`
+    :param start_date: the first date of the window
+    :param end_date: the last date of the window
+    :return: the filtered DataFrame
+
+    >>> df = DataFrame({"d": pd.to_datetime(["2019-09-06 15:00", "2019-09-07 01:00"])})
+    >>> filter_date_window(df, {"date_fields": ["d"], "timezone": "Asia/Taipei"},
+    ...     datetime.datetime(2019, 9, 7), datetime.datetime(2019, 9, 7))["d"].tolist()
+    [Timestamp('2019-09-07 01:00:00')]
+    """
+    start = pd.Timestamp(start_date.date())
+    end = pd.Timestamp(end_date.date()) + pd.Timedelta(days=1)
+    tz = get_source_tz(config)
+    if tz is not None:
+        # converted date fields are in UTC
+        start = start.tz_localize(tz).tz_convert(pytz.utc).tz_localize(None)
+        end = end.tz_localize(tz).tz_convert(pytz.utc).tz_localize(None)
+    field = df[config["date_fields"][0]]
+    return df[(field >= start) & (field < end)].reset_index(drop=True)
+
+
+def stack_frames(frames: Dict[str, DataFrame], key: str) -> DataFrame:
+    """Stack DataFrames into one DataFrame with their keys in a column.
+
+    :rtype: DataFrame
+    :param frames: the DataFrames by key, e.g. extracted by iterators
+    :param key: the column of the key of each row
+    :return: the stacked DataFrame
+
+    >>> stack_frames({"1": DataFrame({"a": [1, 2]}), "2": DataFrame({"a": [3]})},
+    ...     "iterator").values.tolist()
+    [['1', 1], ['1', 2], ['2', 3]]
+    """
+    if not frames:
+        return DataFrame(columns=[key])
+    stacked = pd.concat(frames, names=[key], sort=False)
+    return stacked.reset_index(level=0).reset_index(drop=True)
+
+
+def upsert(old: DataFrame, new: DataFrame, keys: List[str]) -> DataFrame:
+    """Update and insert a new batch of records into an old batch by keys.
+
+    Old records with keys in the new batch are replaced by all the new records
+    with the same keys, e.g. a conversion updated from pending to approved,
+    the other old records are kept before the new records.
+
+    :rtype: DataFrame
+    :param old: the old batch, e.g. extracted yesterday
+    :param new: the new batch
+    :param keys: the columns identifying a record, e.g. source and datetime
+    :return: the combined DataFrame
+
+    >>> old = DataFrame({"k": [1, 2], "status": ["pending", "pending"]})
+    >>> new = DataFrame({"k": [2, 3], "status": ["approved", "pending"]})
+    >>> upsert(old, new, ["k"]).values.tolist()
+    [[1, 'pending'], [2, 'approved'], [3, 'pending']]
+    """
+    if old.empty:
+        return new.reset_index(drop=True)
+    # number keys of both batches as groups to compare integers instead of tuples,
+    # keys with null values are never matched
+    ids = (
+        pd.concat([old[keys], new[keys]], ignore_index=True)
+        .groupby(keys, sort=False)
+        .ngroup()
+        .to_numpy()
+    )
+    old_ids, new_ids = np.split(ids, [len(old)])
+    updated = np.isin(old_ids, new_ids)
+    return pd.concat([old[~updated], new], ignore_index=True, sort=False)
+
+
+def diff_rows(old: DataFrame, new: DataFrame, columns: List[str]) -> DataFrame:
+    """Get the rows of a new batch of records which are new or changed.
+
+    A new row is unchanged if an old row has the same values of all the columns,
+    e.g. a tracker with the same tokens and names, null values are compared equal.
+
+    :rtype: DataFrame
+    :param old: the old batch, e.g. the previous snapshot
+    :param new: the new batch
+    :param columns: the columns to compare
+    :return: the new or changed rows of the new batch
+
+    >>> old = DataFrame({"token": ["a", "b", None], "name": ["A", "B", "N"]})
+    >>> new = DataFrame({"token": ["a", "b", "c", None], "name": ["A", "B2", "C", "N"]})
+    >>> diff_rows(old, new, ["token", "name"]).values.tolist()
+    [['b', 'B2'], ['c', 'C']]
+    """
+    if old.empty:
+        return new.reset_index(drop=True)
+    # merge matches null keys with each other, old rows are deduplicated
+    # so the left merge keeps exactly the new rows in order
+    matched = new[columns].merge(
+        old[columns].drop_duplicates(), how="left", on=columns, indicator=True
+    )
+    changed = (matched["_merge"] == "left_only").to_numpy()
+    return new[changed].reset_index(drop=True)
+
+
 def convert_format(format: str, df: DataFrame, date_fields: List = None) -> str:
     """Convert DataFrame into destination format.
 
@@ -105,6 +417,226 @@ def convert_format(format: str, df: DataFrame, date_fields: List = None) -> str:
     return output
 
 
+def json_get(data: Any, path: str) -> Any:
+    """Get nested element of parsed json by path.
+
+    :param data: the parsed json
+    :param path: path of the element in string format, e.g. response.data
+    :return: the element, None if not found
+
+    >>> json_get({"level1": {"level2": [1, 2]}}, "level1.level2")
+    [1, 2]
+    >>> json_get({"level1": [1, 2]}, "level1.level2") is None
+    True
+    """
+    for key in path.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def flatten_json(data: Dict, prefix: str = "", flattened: Dict = None) -> Dict:
+    """Flatten nested json object with keys joined by ".".
+
+    :param data: the parsed json object
+    :param prefix: the prefix of the keys
+    :param flattened: the flattened dict to add to, a new one if not specified
+    :return: the flattened dict
+
+    >>> flatten_json({"a": {"b": 1, "c": {"d": 2}}, "e": 3})
+    {'e': 3, 'a.b': 1, 'a.c.d': 2}
+    """
+    flattened = dict() if flattened is None else flattened
+    nested = []
+    for key, value in data.items():
+        key = prefix + str(key)
+        if not isinstance(value, dict):
+            flattened[key] = value
+        elif prefix:
+            flatten_json(value, key + ".", flattened)
+        else:
+            # nested objects follow the top level values, as `json_normalize()`
+            nested += [(key, value)]
+    for key, value in nested:
+        flatten_json(value, key + ".", flattened)
+    return flattened
+
+
+def normalize_json(data: Any) -> DataFrame:
+    """Normalize parsed json objects into a flat DataFrame.
+
+    It's the same as `pandas.io.json.json_normalize()` without record paths,
+    but flattens objects without copying them first.
+
+    :rtype: DataFrame
+    :param data: the parsed json object or list of objects
+    :return: the normalized DataFrame
+
+    >>> normalize_json([{"a": {"b": 1}, "c": 2}, {"a": {"b": 3}}]).values.tolist()
+    [[2.0, 1.0], [nan, 3.0]]
+    """
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(d, dict) for d in data):
+        return pd_json.json_normalize(data)
+    return DataFrame([flatten_json(d) for d in data])
+
+
+class JsonStreamReader:
+    """Read json values one by one from a text stream.
+
+    Only a chunk of the stream and the value being read are kept in memory,
+    so a json array could be iterated without parsing the whole document,
+    see `iter_json_array()`.
+    """
+
+    def __init__(self, stream: IO[str], chunk_size: int = STREAM_CHUNK_SIZE):
+        """Initialize json stream reader.
+
+        :param stream: the text stream to read from
+        :param chunk_size: the number of characters to read at a time
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size: int) -> bool:
+        """Read more characters from the stream into the buffer.
+
+        :param size: the number of characters to read
+        :return: whether any character is read
+        """
+        chunk = self.stream.read(size)
+        pos, self.pos = self.pos, 0
+        self.buffer = self.buffer[pos:] + chunk
+        self.eof = not chunk
+        return not self.eof
+
+    def peek(self) -> str:
+        """Skip whitespaces and get the next character without consuming it.
+
+        :return: the next character, empty if the stream ends
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill(self.chunk_size):
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which is expected to be one of chars.
+
+        :param chars: the expected characters
+        :return: the consumed character
+        """
+        c = self.peek()
+        assert c and c in chars, "Expected %s in json stream, got %r" % (chars, c)
+        self.pos += 1
+        return c
+
+    def read_value(self) -> Any:
+        """Read the next json value.
+
+        :return: the parsed value
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # numbers/literals at the end of buffer might continue in the stream
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # the value is incomplete, read more, doubling the size for large values
+            self.fill(size)
+            size *= 2
+
+
+def iter_json_array(
+    stream: IO[str], path: str, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[Any]:
+    """Iterate elements of a json array in a text stream.
+
+    :param stream: the text stream of the json document
+    :param path: path of the array in `json_get()` format, empty for the document
+    :param chunk_size: the number of characters to read at a time
+    :return: the iterator of parsed elements, empty if the path is not found
+
+    >>> list(iter_json_array(StringIO('{"a": 1, "b": {"c": [{"d": 2}, 3]}}'), "b.c"))
+    [{'d': 2}, 3]
+    """
+    reader = JsonStreamReader(stream, chunk_size)
+    for key in path.split(".") if path else []:
+        if reader.peek() != "{":
+            return
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                return
+            name = reader.read_value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.read_value()
+            if reader.expect(",}") == "}":
+                return
+    if reader.peek() != "[":
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.read_value()
+        if reader.expect(",]") == "]":
+            return
+
+
+def stream_json(raw: RawFile, config: Dict[str, Any]) -> DataFrame:
+    """Convert a raw json file to DataFrame by streaming the json array in it.
+
+    The array at `json_path` or the first of `json_path_nested` is parsed
+    and converted in batches of `STREAM_BATCH_SIZE` elements,
+    so the whole document is never parsed into memory at once.
+
+    :rtype: DataFrame
+    :param raw: the raw json file
+    :param config: the config of the data source specified in task config,
+        see `configs/*.py`
+    :return: the converted `DataFrame`
+    """
+    if "json_path_nested" in config:
+        path = config["json_path_nested"][0]
+    else:
+        path = config["json_path"] if "json_path" in config else ""
+
+    def convert_batch(batch: List) -> DataFrame:
+        if "json_path_nested" in config:
+            return unnest_json_array(
+                batch, config["json_path_nested"], config["fields"]
+            )
+        return normalize_json(batch)
+
+    frames = []
+    batch = []
+    with raw.open() as f:
+        for elem in iter_json_array(f, path):
+            batch += [elem]
+            if len(batch) >= STREAM_BATCH_SIZE:
+                frames += [convert_batch(batch)]
+                batch = []
+    if batch or not frames:
+        frames += [convert_batch(batch)]
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
 def json_extract(json_str: str, path: str) -> Optional[str]:
     """Extract nested json element by path.
 
@@ -119,68 +651,75 @@ def json_extract(json_str: str, path: str) -> Optional[str]:
     >>> json_extract(j, "level1.level2.level3")
     'extract me'
     """
-    j = json.loads(json_str)
+    j = json_loads(json_str)
     if not path:
         return json.dumps(j)
     if isinstance(path, str):
-        for i in path.split("."):
-            if i in j:
-                j = j[i]
-            else:
-                return None
+        j = json_get(j, path)
     if isinstance(j, list) or isinstance(j, dict):
         return json.dumps(j)
     else:
         return j
 
 
-def json_unnest(
-    json_str: str,
-    paths: List[str],
-    fields: List[str],
-    ancestors: Dict,
-    result: List,
-    level: int = 0,
-) -> Optional[str]:
+def json_unnest(data: Any, paths: List[str], fields: List[str]) -> DataFrame:
     """Flatten nested json elements of specified paths.
 
-    :param json_str: original json in string format
-    :param paths: paths of the nested elements in string format
+    Elements are walked iteratively in the parsed json without serializing
+    and parsing them again, each element without nested elements at the next path
+    is a row with the fields of itself and its ancestors,
+    e.g. `campaign_name` for field `name` of path `campaigns`.
+
+    :rtype: DataFrame
+    :param data: the parsed json
+    :param paths: paths of the nested elements, the first in `json_extract()` format
     :param fields: fields to extract
-    :param ancestors: elements from ancestors
-    :param result: the recursively accumulated result
-    :param level: current recursive level
-    :return: the extracted json element in string format
-    :rtype: str
+    :return: the flattened DataFrame
+
+    >>> data = {"result": {"networks": [{"name": "n1", "campaigns": [
+    ...     {"name": "c1"}, {"name": "c2"}]}, {"name": "n2"}]}}
+    >>> json_unnest(data, ["result.networks", "campaigns"], ["name"]).values.tolist()
+    [['n1', 'c1'], ['n1', 'c2'], ['n2', nan]]
     """
-    if not paths:
-        return json_str
-    ancestors = {} if not ancestors else ancestors
-    if isinstance(paths, list):
-        # flatten nested json here
-        path = paths[level]
-        path_leaf = singularize(path.split(".")[-1]).lower()
-        extracted = json_extract(json_str, path)
-        if not extracted:
-            return None
-        # expected to be json array
-        elems = json.loads(extracted)
-        for elem in elems:
-            vals = ancestors.copy()
-            for field in fields:
-                vals[path_leaf + "_" + field.lower()] = elem[field]
-            if level + 1 < len(paths):
-                r = json_unnest(
-                    json.dumps(elem), paths, fields, vals, result, level + 1
-                )
-                if r is None:
-                    result += [vals]
-            else:
-                result += [vals]
+    assert isinstance(paths, list), "paths should be a list of strings"
+    elems = json_get(data, paths[0])
+    if not isinstance(elems, list):
+        return DataFrame()
+    return unnest_json_array(elems, paths, fields)
 
-    else:
-        assert False, "paths should be a list of strings"
-    return json.dumps(result)
+
+def unnest_json_array(elems: List, paths: List[str], fields: List[str]) -> DataFrame:
+    """Flatten nested json elements of specified paths in a json array.
+
+    :rtype: DataFrame
+    :param elems: the parsed json array of the first path,
+        or a part of it to flatten in batches
+    :param paths: paths of the nested elements, see `json_unnest()`
+    :param fields: fields to extract
+    :return: the flattened DataFrame
+    """
+    names = []
+    for path in paths:
+        path_leaf = singularize(path.split(".")[-1]).lower()
+        names += [[path_leaf + "_" + field.lower() for field in fields]]
+    columns = [[] for _ in range(len(paths) * len(fields))]
+    depth = 0
+    # depth first, elements are popped in the order of the json arrays
+    stack = [(elem, 0, []) for elem in reversed(elems)]
+    while stack:
+        elem, level, vals = stack.pop()
+        vals = vals + [elem[field] for field in fields]
+        children = None
+        if level + 1 < len(paths):
+            children = json_get(elem, paths[level + 1])
+        if isinstance(children, list):
+            stack += [(child, level + 1, vals) for child in reversed(children)]
+            continue
+        depth = max(depth, level + 1)
+        for i, column in enumerate(columns):
+            column.append(vals[i] if i < len(vals) else np.nan)
+    names = [name for level_names in names[:depth] for name in level_names]
+    return DataFrame(dict(zip(names, columns)), columns=names)
 
 
 def singularize(s: str) -> str:
@@ -197,30 +736,16 @@ def singularize(s: str) -> str:
     return s
 
 
-def get_country_tz(country_code: str) -> pytz.UTC:
-    """Get the default timezone for specified country code.
-
-    If covered multiple timezone, pick the most common one.
+def get_major_tz(timezones: List[str]) -> pytz.UTC:
+    """Get the major timezone of timezones, i.e. the one with the most common offset.
 
     :rtype: pytz.UTC
-    :return: the default (major) timezone of the country
-    :param country_code: the 2 digit country code to get timezone
+    :param timezones: the timezone names, e.g. of a country
+    :return: the major timezone, UTC if none is valid
 
-    >>> get_country_tz("TW")
-    <DstTzInfo 'Asia/Taipei' LMT+8:06:00 STD>
+    >>> get_major_tz(["Asia/Jakarta", "Asia/Pontianak", "Asia/Makassar"])
+    <DstTzInfo 'Asia/Jakarta' LMT+7:07:00 STD>
     """
-    if not country_code:
-        log.warning("No country code specified, returning UTC.")
-        return pytz.UTC
-    country_code = country_code.upper()
-    if country_code not in pytz.country_timezones:
-        # FIXME: workaround here for pytz doesn't support XK for now.
-        tzmap = {"XK": "CET"}
-        if country_code in tzmap:
-            return pytz.timezone(tzmap[country_code])
-        log.warning("timezone not found for %s, return UTC" % country_code)
-        return pytz.utc
-    timezones = pytz.country_timezones[country_code]
     offsets = []
     for timezone in timezones:
         try:
@@ -244,6 +769,57 @@ def get_country_tz(country_code: str) -> pytz.UTC:
     return pytz.timezone(timezones[offsets.index(max_offset)])
 
 
+@lru_cache(maxsize=1)
+def get_country_tz_table() -> DataFrame:
+    """Get the default timezones of all countries.
+
+    It's computed once and memoized, so countries could be mapped to timezones
+    by lookups instead of creating timezones for each record.
+
+    :rtype: DataFrame
+    :return: the table indexed by 2 digit country codes, with the default (major)
+        timezone in `tz` and its offset string (e.g. +08:00) in `tz_str`
+
+    >>> get_country_tz_table().loc["TW"].tolist()
+    [<DstTzInfo 'Asia/Taipei' LMT+8:06:00 STD>, '+08:00']
+    """
+    timezones = dict()
+    for country_code in pytz.country_timezones:
+        timezones[country_code] = get_major_tz(pytz.country_timezones[country_code])
+    # FIXME: workaround here for pytz doesn't support XK for now.
+    tzmap = {"XK": "CET"}
+    for country_code, timezone in tzmap.items():
+        if country_code not in timezones:
+            timezones[country_code] = pytz.timezone(timezone)
+    table = DataFrame({"tz": Series(timezones)})
+    table["tz_str"] = table["tz"].map(get_tz_str)
+    return table
+
+
+def get_country_tz(country_code: str) -> pytz.UTC:
+    """Get the default timezone for specified country code.
+
+    If covered multiple timezone, pick the most common one,
+    see `get_country_tz_table()`.
+
+    :rtype: pytz.UTC
+    :return: the default (major) timezone of the country
+    :param country_code: the 2 digit country code to get timezone
+
+    >>> get_country_tz("TW")
+    <DstTzInfo 'Asia/Taipei' LMT+8:06:00 STD>
+    """
+    if not country_code:
+        log.warning("No country code specified, returning UTC.")
+        return pytz.UTC
+    country_code = country_code.upper()
+    table = get_country_tz_table()
+    if country_code not in table.index:
+        log.warning("timezone not found for %s, return UTC" % country_code)
+        return pytz.utc
+    return table.at[country_code, "tz"]
+
+
 def get_country_tz_str(country_code: str) -> str:
     """Get the default timezone string (e.g. +08:00) for specified country code.
 
@@ -259,6 +835,67 @@ def get_country_tz_str(country_code: str) -> str:
     return get_tz_str(get_country_tz(country_code))
 
 
+def map_country_tz(country_codes: Series) -> Series:
+    """Map country codes to default timezones.
+
+    It's the vectorized `get_country_tz()` for a column,
+    by a single lookup of `get_country_tz_table()`.
+
+    :rtype: Series
+    :param country_codes: the 2 digit country codes
+    :return: the default (major) timezones of the countries, UTC if not found
+
+    >>> map_country_tz(Series(["TW", "id"])).map(str).tolist()
+    ['Asia/Taipei', 'Asia/Jakarta']
+    """
+    codes = country_codes.fillna("").astype(str).str.upper()
+    timezones = codes.map(get_country_tz_table()["tz"])
+    missing = timezones.isna()
+    if missing.any():
+        log.warning(
+            "timezone not found for %s, return UTC" % sorted(set(codes[missing]))
+        )
+        timezones[missing] = pytz.UTC
+    return timezones
+
+
+def map_country_tz_str(country_codes: Series) -> Series:
+    """Map country codes to default timezone strings (e.g. +08:00).
+
+    It's the vectorized `get_country_tz_str()` for a column,
+    by a single lookup of `get_country_tz_table()`.
+
+    :rtype: Series
+    :param country_codes: the 2 digit country codes
+    :return: the default (major) timezone strings of the countries
+        in +08:00 format, +00:00 if not found
+
+    >>> map_country_tz_str(Series(["TW", "id", "TW"])).tolist()
+    ['+08:00', '+07:00', '+08:00']
+    """
+    codes = country_codes.fillna("").astype(str).str.upper()
+    tz_strs = codes.map(get_country_tz_table()["tz_str"])
+    missing = tz_strs.isna()
+    if missing.any():
+        log.warning(
+            "timezone not found for %s, return UTC" % sorted(set(codes[missing]))
+        )
+    return tz_strs.fillna(get_tz_str(pytz.UTC))
+
+
+def map_country_3_to_2(country_codes: Series) -> Series:
+    """Map 3 digit country codes to 2 digit country codes.
+
+    :rtype: Series
+    :param country_codes: the ISO 3166-1 alpha-3 country codes
+    :return: the ISO 3166-1 alpha-2 country codes, NaN if not found
+
+    >>> map_country_3_to_2(Series(["TWN", "idn", "XXX"])).tolist()
+    ['TW', 'ID', nan]
+    """
+    return country_codes.str.upper().map(COUNTRY_CODES_3_TO_2)
+
+
 def get_tz_str(timezone: pytz.UTC) -> str:
     """Convert timezone to offset string (e.g. +08:00).
 
@@ -0,0 +1,71 @@
+"""Memory utilities."""
+import logging
+import resource
+import sys
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+log = logging.getLogger(__name__)
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+def get_peak_rss() -> int:
+    """Get the peak resident set size of this process.
+
+    On Linux it's the peak since the last `reset_peak_rss()`,
+    otherwise the peak since the process started.
+
+    :return: the peak resident set size in bytes
+
+    >>> get_peak_rss() > 0
+    True
+    """
+    try:
+        with open(PROC_STATUS, "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """Reset the peak resident set size of this process to the current size.
+
+    Only supported on Linux, see `man 5 proc` for `/proc/[pid]/clear_refs`.
+
+    :return: whether the peak is reset
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def track_peak_memory(phase: str, peaks: Dict[str, int]) -> Iterator[None]:
+    """Track and log the peak memory of a phase.
+
+    :param phase: the name of the phase, e.g. extract
+    :param peaks: dict to record the peak resident set size in bytes by phase
+    """
+    is_reset = reset_peak_rss()
+    try:
+        yield
+    finally:
+        peaks[phase] = get_peak_rss()
+        log.info(
+            "Peak memory of %s: %.1f MB%s"
+            % (
+                phase,
+                peaks[phase] / 2 ** 20,
+                "" if is_reset else " (since process started)",
+            )
+        )
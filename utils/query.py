@@ -1,4 +1,6 @@
 """Query utilities."""
+import re
+from collections import Counter
 from typing import Dict, Any
 
 from utils.file import read_string
@@ -29,3 +31,91 @@ def build_query(config: Dict[str, Any], start_date: str, end_date: str) -> str:
             end_date=end_date,
         )
     return query
+
+
+def build_sample_filter(field: str, sample: int) -> str:
+    """Build the predicate to sample rows by a 0-99 bucket field (e.g. sample_id).
+
+    :rtype: str
+    :param field: the name of the sample bucket field
+    :param sample: the percentage of buckets to keep, from 1 to 100
+    :return: the predicate to append to a WHERE clause
+
+    >>> build_sample_filter("sample_id", 1)
+    'AND SAFE_CAST(sample_id AS INT64) < 1'
+    """
+    assert 0 < sample <= 100, "Sample percentage should be between 1 and 100."
+    return "AND SAFE_CAST({field} AS INT64) < {sample}".format(
+        field=field, sample=sample
+    )
+
+
+SQL_KEYWORDS = {
+    "and",
+    "or",
+    "not",
+    "in",
+    "is",
+    "null",
+    "true",
+    "false",
+    "between",
+    "like",
+    "as",
+    "case",
+    "when",
+    "then",
+    "else",
+    "end",
+    "asc",
+    "desc",
+    "date",
+    "interval",
+    "day",
+    "week",
+    "month",
+    "year",
+    "distinct",
+    "ignore",
+    "nulls",
+    "unnest",
+    "exists",
+    "rows",
+    "range",
+    "current",
+    "row",
+    "preceding",
+    "following",
+    "unbounded",
+}
+FILTER_CLAUSE_REGEX = (
+    r"\b(WHERE|ON|GROUP\s+BY|PARTITION\s+BY)\b(.*?)"
+    r"(?=\b(?:SELECT|FROM|WHERE|GROUP|ORDER|HAVING|LIMIT|UNION|WINDOW|JOIN|LEFT"
+    r"|RIGHT|INNER|FULL|CROSS)\b|\)|$)"
+)
+IDENTIFIER_REGEX = r"(?<![\w.])([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)(?![\w.]|\s*\()"
+
+
+def get_filter_columns(qstring: str) -> Counter:
+    """Count columns used to filter, join, group or partition in a query.
+
+    Columns qualified with a table alias are counted by their bare names.
+
+    :rtype: Counter
+    :param qstring: the query string (or template) to scan
+    :return: occurrences of each column in WHERE/ON/GROUP BY/PARTITION BY clauses
+
+    >>> q = "SELECT * FROM t WHERE os = 'Android' AND t.country = 'ID' GROUP BY os"
+    >>> sorted(get_filter_columns(q).items())
+    [('country', 1), ('os', 2)]
+    """
+    # strip comments, string literals and quoted table names
+    qstring = re.sub(r"--[^\n]*", " ", qstring)
+    qstring = re.sub(r"'[^']*'|\"[^\"]*\"|`[^`]*`", " ", qstring)
+    columns = Counter()
+    for clause in re.finditer(FILTER_CLAUSE_REGEX, qstring, re.I | re.S):
+        for identifier in re.findall(IDENTIFIER_REGEX, clause.group(2)):
+            column = identifier.split(".")[-1]
+            if column.lower() not in SQL_KEYWORDS:
+                columns[column] += 1
+    return columns
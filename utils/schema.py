@@ -0,0 +1,312 @@
+"""Schema utilities."""
+import csv
+import datetime
+import json
+from itertools import islice
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from google.cloud import bigquery
+from pandas import DataFrame, Series
+
+from utils.config import DEFAULT_DATE_FORMAT, DEFAULT_DATETIME_FORMAT
+
+BQ_TYPES = {
+    np.dtype(object).type: "STRING",
+    np.dtype(float).type: "FLOAT",
+    np.dtype(int).type: "INTEGER",
+    np.dtype(bool).type: "BOOLEAN",
+}
+# standard SQL names of legacy SQL types returned by the API
+BQ_TYPE_ALIASES = {"FLOAT64": "FLOAT", "INT64": "INTEGER", "BOOL": "BOOLEAN"}
+
+
+def get_bq_type(name: str, dtype: np.generic) -> str:
+    """Get the BigQuery type of a column in task schema.
+
+    Date columns are loaded as DATETIME if named as datetime, DATE otherwise,
+    which is consistent with the date format of files loaded to GCS,
+    and the tables queried into, e.g. `DATETIME(vol.date) AS utc_datetime`.
+    Converted date fields are naive UTC, see `utils.marshalling.convert_df()`.
+
+    :rtype: str
+    :param name: the name of the column
+    :param dtype: the numpy data type of the column, see `configs/*.py`
+    :return: the BigQuery standard SQL type name
+
+    >>> get_bq_type("utc_datetime", np.datetime64)
+    'DATETIME'
+    >>> get_bq_type("utc_date", np.datetime64)
+    'DATE'
+    >>> get_bq_type("payout", np.dtype(float).type)
+    'FLOAT'
+    """
+    if dtype == np.datetime64:
+        return "DATETIME" if "datetime" in name else "DATE"
+    assert dtype in BQ_TYPES, "Unsupported data type %s of %s" % (dtype, name)
+    return BQ_TYPES[dtype]
+
+
+def get_bq_schema(schema: List[Tuple[str, np.generic]]) -> List[bigquery.SchemaField]:
+    """Translate task schema into BigQuery schema.
+
+    :rtype: list[bigquery.SchemaField]
+    :param schema: list of tuples(column name, numpy data type),
+        see `configs/*.py`
+    :return: the BigQuery schema
+    """
+    return [
+        bigquery.SchemaField(name, get_bq_type(name, dtype)) for name, dtype in schema
+    ]
+
+
+def is_bq_value(value, bq_type: str) -> bool:
+    """Check whether a json value could be loaded as the BigQuery type.
+
+    :rtype: bool
+    :param value: the json value to check
+    :param bq_type: the BigQuery standard SQL type name
+    :return: whether the value could be loaded
+
+    >>> is_bq_value("2019-09-07 16:08:52", "DATETIME")
+    True
+    >>> is_bq_value("2019-09-07", "DATETIME")
+    False
+    >>> is_bq_value(1, "FLOAT")
+    True
+    """
+    if value is None:
+        return True
+    if bq_type == "STRING":
+        return isinstance(value, str)
+    if bq_type == "BOOLEAN":
+        return isinstance(value, bool)
+    if bq_type == "INTEGER":
+        return isinstance(value, int) and not isinstance(value, bool)
+    if bq_type == "FLOAT":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    date_format = (
+        DEFAULT_DATETIME_FORMAT
+        if bq_type in ["DATETIME", "TIMESTAMP"]
+        else DEFAULT_DATE_FORMAT
+    )
+    try:
+        datetime.datetime.strptime(value, date_format)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def check_file_schema(
+    f: IO[str],
+    schema: List[Tuple[str, np.generic]],
+    file_format: str,
+    max_errors: int = 10,
+    max_lines: int = 1000,
+) -> List[str]:
+    """Check a file to load against the BigQuery schema of task schema.
+
+    CSV files are loaded by column positions, so the header should match
+    the schema in order. For json lines, each field should be in the schema
+    and its value should be loadable as the field type.
+    The file is read as a stream, only the header or the first lines are checked.
+
+    :rtype: list[str]
+    :param f: the text stream of the file, e.g. `RawFile.open()`
+    :param schema: list of tuples(column name, numpy data type),
+        see `configs/*.py`
+    :param file_format: the format of the file, could be csv/jsonl
+    :param max_errors: the max number of errors to report
+    :param max_lines: the max number of json lines to check
+    :return: the error messages, empty if the file matches the schema
+
+    >>> from io import StringIO
+    >>> schema = [("country", np.dtype(object).type), ("rps", np.dtype(float).type)]
+    >>> check_file_schema(StringIO("country,rps\\nID,0.1\\n"), schema, "csv")
+    []
+    >>> check_file_schema(StringIO('{"country":"ID","rps":"0.1"}'), schema, "jsonl")
+    ['line 1: rps="0.1" is not FLOAT']
+    """
+    types = {field.name: field.field_type for field in get_bq_schema(schema)}
+    errors = []
+    if file_format == "csv":
+        header = next(csv.reader(islice(f, 1)), [])
+        if header != list(types.keys()):
+            errors += ["header %s does not match schema %s" % (header, list(types))]
+    elif file_format == "jsonl":
+        for i, line in enumerate(islice(f, max_lines)):
+            if len(errors) >= max_errors:
+                break
+            if not line.strip():
+                continue
+            for k, v in json.loads(line).items():
+                if k not in types:
+                    errors += ["line %d: %s is not in schema" % (i + 1, k)]
+                elif not is_bq_value(v, types[k]):
+                    errors += [
+                        "line %d: %s=%s is not %s" % (i + 1, k, json.dumps(v), types[k])
+                    ]
+    return errors[:max_errors]
+
+
+class SchemaValidator:
+    """Validate DataFrames against task schema with vectorized checks.
+
+    Compiled once from the schema tuples (see `configs/*.py`) and optional
+    constraints by column, e.g. `{"payout": {"nullable": False, "min": 0}}`,
+    supported constraints are nullable/min/max/isin.
+    Dtypes are checked per column, then constraints are checked on the numpy
+    arrays of columns by checks specialized for the column dtypes,
+    and each failed check is summarized as one error message.
+    """
+
+    def __init__(
+        self,
+        schema: List[Tuple[str, np.generic]],
+        constraints: Dict[str, Dict[str, Any]] = None,
+    ):
+        """Compile the validator.
+
+        :param schema: list of tuples(column name, numpy data type),
+            see `configs/*.py`
+        :param constraints: constraints by column name
+        """
+        self.dtypes = {name: dtype for name, dtype in schema}
+        self.checks = []  # type: List[Tuple[str, str, Callable]]
+        constraints = dict() if constraints is None else constraints
+        for name, constraint in constraints.items():
+            assert name in self.dtypes, "Constraint of %s is not in schema" % name
+            for key, value in constraint.items():
+                if key == "nullable" and value:
+                    continue
+                check = self.compile_check(key, value, self.dtypes[name])
+                if check is not None:
+                    self.checks += [(name, *check)]
+
+    @staticmethod
+    def compile_check(
+        key: str, value: Any, dtype: np.generic
+    ) -> Optional[Tuple[str, Callable[[np.ndarray], np.ndarray]]]:
+        """Compile a constraint of a column into a vectorized check.
+
+        :param key: the constraint, could be nullable(False)/min/max/isin
+        :param value: the value of the constraint
+        :param dtype: the numpy data type of the column
+        :return: the description and the function to get the invalid mask
+            of the column values, None if nothing to check
+        """
+        limit = value
+        if dtype == np.datetime64 and key in ("min", "max"):
+            limit = np.datetime64(value, "ns")
+        if key == "nullable":
+            if np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.bool_):
+                # integer/boolean columns couldn't contain null
+                return None
+            elif np.issubdtype(dtype, np.floating):
+                return "null values", np.isnan
+            elif dtype == np.datetime64:
+                return "null values", np.isnat
+            return "null values", pd.isna
+        elif key == "min":
+            return "values < %s" % value, (lambda a: a < limit)
+        elif key == "max":
+            return "values > %s" % value, (lambda a: a > limit)
+        elif key == "isin":
+            return (
+                "values not in %s" % list(value),
+                (lambda a: ~Series(a, copy=False).isin(value).to_numpy() & ~pd.isna(a)),
+            )
+        assert False, "Unsupported constraint %s" % key
+
+    @staticmethod
+    def summarize(series: Series, invalid: np.ndarray, desc: str) -> str:
+        """Summarize invalid values of a column.
+
+        :param series: the column
+        :param invalid: boolean mask of invalid values
+        :param desc: description of the check
+        :return: the error message
+        """
+        rows = np.flatnonzero(invalid)
+        return "column %s has %d %s, e.g. rows %s" % (
+            series.name,
+            len(rows),
+            desc,
+            series.index[rows[:3]].tolist(),
+        )
+
+    def validate(self, df: DataFrame) -> List[str]:
+        """Validate a DataFrame.
+
+        :param df: the DataFrame to validate
+        :return: the error messages, empty if the DataFrame is valid
+
+        >>> validator = SchemaValidator(
+        ...     [("country", np.dtype(object).type), ("rps", np.dtype(float).type)],
+        ...     {"rps": {"nullable": False, "min": 0}},
+        ... )
+        >>> validator.validate(DataFrame({"country": ["ID"], "rps": [0.1]}))
+        []
+        >>> df = DataFrame({"country": ["ID", "TW"], "rps": [-1, None]})
+        >>> print("\\n".join(validator.validate(df)))
+        column rps has 1 null values, e.g. rows [1]
+        column rps has 1 values < 0, e.g. rows [0]
+        >>> validator.validate(DataFrame({"country": ["ID"], "rps": ["0.1"]}))
+        ['column rps has a dtype of object which is not a subclass of float64']
+        """
+        if len(df.columns) != len(self.dtypes):
+            return [
+                "Invalid number of columns. The schema specifies %d, "
+                "but the data frame has %d" % (len(self.dtypes), len(df.columns))
+            ]
+        errors = []
+        for name, dtype in self.dtypes.items():
+            if name not in df:
+                errors += ["column %s exists in the schema but not in the data" % name]
+            elif not np.issubdtype(df[name].dtype, dtype):
+                errors += [
+                    "column %s has a dtype of %s which is not a subclass of %s"
+                    % (name, df[name].dtype, np.dtype(dtype))
+                ]
+        if errors:
+            return errors
+        for name, desc, check in self.checks:
+            invalid = check(df[name].to_numpy())
+            if invalid.any():
+                errors += [self.summarize(df[name], invalid, desc)]
+        return errors
+
+
+def check_table_schema(
+    table_schema: List[bigquery.SchemaField], schema: List[Tuple[str, np.generic]]
+) -> List[str]:
+    """Check an existing BigQuery table against the BigQuery schema of task schema.
+
+    Loading with an explicit schema is rejected if a field type mismatches,
+    e.g. a DATETIME column created by a query loaded as TIMESTAMP.
+
+    :rtype: list[str]
+    :param table_schema: the schema of the existing table
+    :param schema: list of tuples(column name, numpy data type),
+        see `configs/*.py`
+    :return: the error messages, empty if the table matches the schema
+
+    >>> table_schema = [bigquery.SchemaField("utc_datetime", "TIMESTAMP")]
+    >>> check_table_schema(table_schema, [("utc_datetime", np.datetime64)])
+    ['utc_datetime is TIMESTAMP in table, DATETIME in schema']
+    """
+    table_types = {
+        field.name: BQ_TYPE_ALIASES.get(field.field_type, field.field_type)
+        for field in table_schema
+    }
+    errors = []
+    for field in get_bq_schema(schema):
+        if field.name not in table_types:
+            continue
+        if table_types[field.name] != field.field_type:
+            errors += [
+                "%s is %s in table, %s in schema"
+                % (field.name, table_types[field.name], field.field_type)
+            ]
+    return errors